@@ -0,0 +1,574 @@
+from datetime import datetime
+import os
+
+from flask import (
+    Blueprint, request, render_template, redirect, url_for,
+    flash, session, jsonify, Response, stream_with_context
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+from models import db, Patient, Doctor, Admin, Appointment, DoctorAvailability, ArchivedAppointment
+from export import iter_rows, parse_export_filters, FORMATS
+from hashing import hash_password
+from pagination import (
+    keyset_paginate, keyset_paginate_union, page_size, Page, APPOINTMENT_KEYSET, ARCHIVED_APPOINTMENT_KEYSET,
+    DOCTOR_KEYSET, MAX_PAGE_SIZE
+)
+from search import search_doctor_ids, search_patient_ids, load_ranked
+from stats import admin_stats
+from reservations import reserve, SlotTaken
+from scheduling import availabilities_by_weekday
+from timeline import get_cache as get_timeline_cache
+from slot_table import booking_problem, rebuild_doctor_slots
+
+bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+
+# Admin dashboard + login
+@bp.route('/dashboard', methods=['GET', 'POST'])
+def dashboard():
+    # POST: admin login
+    if request.method == 'POST':
+        u_name = request.form.get('username', '').strip()
+        pwd = request.form.get('password', '')
+        admin_user = Admin.query.filter_by(username=u_name).first()
+
+        valid_login = admin_user and admin_user.check_password(pwd)
+        if not valid_login:
+            flash('Invalid admin credentials.', 'danger')
+            return render_template('admin_login.html'), 401
+
+        db.session.commit()  # persists a transparent rehash, if any
+        session['admin_id'] = admin_user.id
+        flash(f'Welcome, {admin_user.username}!', 'success')
+        return redirect(url_for('admin.dashboard'))
+
+    # dashboard
+    if 'admin_id' not in session:
+        flash('Please login as admin to access the admin dashboard.', 'warning')
+        return redirect(url_for('main.login', role='admin'))
+
+    # statistics (maintained counters, see stats.py)
+    dash_stats = admin_stats()
+
+    search_str = request.args.get('q', '').strip()
+    f_type = request.args.get('type', 'doctor')
+
+    docs_per_page = page_size(request.args.get('size'))
+    doc_cursor = request.args.get('doc_cursor')
+    pats_list = Patient.query.order_by(Patient.id.desc()).limit(20).all()
+
+#search logic (FTS5 ranked prefix search, LIKE when FTS5 is unavailable)
+    doc_query = Doctor.query
+    ranked_doctors = None
+    if search_str:
+        if f_type == 'doctor':
+            matched_ids = search_doctor_ids(search_str, limit=docs_per_page)
+            if matched_ids is not None:
+                ranked_doctors = load_ranked(Doctor, matched_ids)
+            else:
+                doc_query = Doctor.query.filter(
+                    (Doctor.name.ilike(f'%{search_str}%')) |
+                    (Doctor.specialization.ilike(f'%{search_str}%')) |
+                    (Doctor.username.ilike(f'%{search_str}%'))
+                )
+            final_patients = pats_list
+        else:
+            matched_ids = search_patient_ids(search_str, limit=MAX_PAGE_SIZE)
+            if matched_ids is not None:
+                filtered_pats = load_ranked(Patient, matched_ids)
+            else:
+                filtered_pats = Patient.query.filter(
+                    (Patient.name.ilike(f'%{search_str}%')) |
+                    (Patient.username.ilike(f'%{search_str}%')) |
+                    (Patient.contact.ilike(f'%{search_str}%'))
+                ).all()
+            final_patients = filtered_pats
+    else:
+        final_patients = pats_list
+
+    if ranked_doctors is not None:
+        # best matches first, top page only
+        final_doctors = Page(ranked_doctors)
+    else:
+        # doctors table is keyset-paginated (newest first)
+        final_doctors = keyset_paginate(doc_query, DOCTOR_KEYSET, doc_cursor, docs_per_page, descending=True)
+
+    # light-weight list for the doctor dropdowns (all doctors, no ORM objects)
+    doctor_choices = (Doctor.query
+                      .with_entities(Doctor.id, Doctor.name, Doctor.specialization)
+                      .order_by(Doctor.name)
+                      .all())
+
+    # patient and doctor loaded in the same query (template shows both per row)
+    recent_appts = (Appointment.query
+                    .options(joinedload(Appointment.patient), joinedload(Appointment.doctor))
+                    .order_by(Appointment.date.desc(), Appointment.time.desc())
+                    .limit(50)
+                    .all())
+
+    # weekly slots of every listed doctor in one query, grouped by weekday
+    weekly_slots = availabilities_by_weekday([d.id for d in final_doctors])
+
+    current_admin = Admin.query.get(session['admin_id'])
+
+    return render_template(
+        'admin_dashboard.html',
+        total_doctors=dash_stats['doctors'],
+        total_patients=dash_stats['patients'],
+        total_appointments=dash_stats['appointments'],
+        upcoming_appointments=dash_stats['upcoming'],
+        status_counts=dash_stats['by_status'],
+        doctors=final_doctors,
+        doctor_choices=doctor_choices,
+        patients=final_patients,
+        appointments=recent_appts,
+        weekly_slots=weekly_slots,
+        query=search_str,
+        filter_type=f_type,
+        admin=current_admin
+    )
+
+
+#add doctor to database
+@bp.route('/doctor/add', methods=['POST'])
+def add_doctor():
+    if 'admin_id' not in session:
+        flash('Unauthorized', 'danger')
+        return redirect(url_for('main.login', role='admin'))
+
+    d_name = request.form.get('name', '').strip()
+    d_spec = request.form.get('specialization', '').strip()
+    d_avail = request.form.get('availability', '').strip()
+    d_contact = request.form.get('contact', '').strip()
+    d_user = request.form.get('username', '').strip()
+    d_pass = request.form.get('password', '').strip()
+
+    if not (d_name and d_spec and d_user and d_pass):
+        flash('Name, specialization, username and password are required.', 'danger')
+        return redirect(url_for('admin.dashboard'))
+
+    try:
+        new_doc_obj = Doctor(
+            name=d_name,
+            specialization=d_spec,
+            availability=d_avail,
+            contact=d_contact,
+            username=d_user
+        )
+        new_doc_obj.set_password(d_pass)
+        db.session.add(new_doc_obj)
+        db.session.flush()  # to get new_doc.id
+
+        # doctor availability logic input
+        for day_idx in range(7):
+            is_enabled = request.form.get(f'day_{day_idx}_enabled')
+            str_start = request.form.get(f'day_{day_idx}_start', '').strip()
+            str_end = request.form.get(f'day_{day_idx}_end', '').strip()
+
+            if is_enabled:
+                try:
+                    time_start = datetime.strptime(str_start, '%H:%M').time()
+                    time_end = datetime.strptime(str_end, '%H:%M').time()
+                except Exception:
+                    db.session.rollback()
+                    flash(f'Invalid time for day {day_idx}. Use HH:MM.', 'danger')
+                    return redirect(url_for('admin.dashboard'))
+
+                if not (time_start < time_end):
+                    db.session.rollback()
+                    flash(f'Start time must be before end time for day {day_idx}.', 'danger')
+                    return redirect(url_for('admin.dashboard'))
+
+                av_entry = DoctorAvailability(
+                    doctor_id=new_doc_obj.id,
+                    day_of_week=day_idx,
+                    start_time=time_start,
+                    end_time=time_end
+                )
+                db.session.add(av_entry)
+
+        db.session.flush()
+        rebuild_doctor_slots(new_doc_obj.id)
+        db.session.commit()
+        flash('Doctor added successfully with availability.', 'success')
+    except IntegrityError:
+        db.session.rollback()
+        flash('Username already taken for doctor. Choose another username.', 'warning')
+    except Exception:
+        db.session.rollback()
+        flash('Failed to add doctor. Try again.', 'danger')
+
+    return redirect(url_for('admin.dashboard'))
+
+
+# edit doctor
+@bp.route('/doctor/edit/<int:doc_id>', methods=['POST'])
+def edit_doctor(doc_id):
+    if 'admin_id' not in session:
+        flash('Unauthorized', 'danger')
+        return redirect(url_for('main.login', role='admin'))
+
+    target_doc = Doctor.query.get_or_404(doc_id)
+
+    # Doctor registeration form
+    d_name = request.form.get('name', '').strip()
+    d_spec = request.form.get('specialization', '').strip()
+    d_notes = request.form.get('availability', '').strip()
+    d_contact = request.form.get('contact', '').strip()
+    d_user = request.form.get('username', '').strip()
+    d_pass = request.form.get('password', '').strip()
+
+    if not (d_name and d_spec and d_user):
+        flash('Name, specialization and username are required.', 'danger')
+        return redirect(url_for('admin.dashboard'))
+
+    target_doc.name = d_name
+    target_doc.specialization = d_spec
+    target_doc.availability = d_notes
+    target_doc.contact = d_contact
+    target_doc.username = d_user
+    if d_pass:
+        target_doc.set_password(d_pass)
+
+    try:
+        DoctorAvailability.query.filter_by(doctor_id=target_doc.id).delete()
+        for day_idx in range(7):
+            day_enabled = request.form.get(f'day_{day_idx}_enabled')
+            s_time_str = request.form.get(f'day_{day_idx}_start', '').strip()
+            e_time_str = request.form.get(f'day_{day_idx}_end', '').strip()
+
+            if day_enabled:
+                try:
+                    start_t = datetime.strptime(s_time_str, '%H:%M').time()
+                    end_t = datetime.strptime(e_time_str, '%H:%M').time()
+                except Exception:
+                    db.session.rollback()
+                    flash(f'Invalid time for day {day_idx}. Use HH:MM.', 'danger')
+                    return redirect(url_for('admin.dashboard'))
+
+                if not (start_t < end_t):
+                    db.session.rollback()
+                    flash(f'Start time must be before end time for day {day_idx}.', 'danger')
+                    return redirect(url_for('admin.dashboard'))
+
+                new_av = DoctorAvailability(
+                    doctor_id=target_doc.id,
+                    day_of_week=day_idx,
+                    start_time=start_t,
+                    end_time=end_t
+                )
+                db.session.add(new_av)
+
+        # regenerate this doctor's materialized slots from the new windows
+        db.session.flush()
+        rebuild_doctor_slots(target_doc.id)
+        db.session.commit()
+        flash('Doctor updated successfully.', 'success')
+    except IntegrityError:
+        db.session.rollback()
+        flash('Username already taken. Choose another username.', 'warning')
+    except Exception:
+        db.session.rollback()
+        flash('Failed to update doctor.', 'danger')
+
+    return redirect(url_for('admin.dashboard'))
+
+
+# Admin: delete doctor
+@bp.route('/doctor/delete/<int:doc_id>', methods=['POST'])
+def delete_doctor(doc_id):
+    if 'admin_id' not in session:
+        flash('Unauthorized', 'danger')
+        return redirect(url_for('main.login', role='admin'))
+
+    doc_to_del = Doctor.query.get_or_404(doc_id)
+    try:
+        db.session.delete(doc_to_del)
+        db.session.commit()
+        flash('Doctor removed successfully.', 'success')
+    except Exception:
+        db.session.rollback()
+        flash('Failed to remove doctor.', 'danger')
+
+    return redirect(url_for('admin.dashboard'))
+
+
+# Admin: appointment create/edit/delete/status
+@bp.route('/appointment/create', methods=['POST'])
+def create_appointment():
+    if 'admin_id' not in session:
+        flash('Unauthorized', 'danger')
+        return redirect(url_for('main.login', role='admin'))
+
+    try:
+        pat_id = int(request.form.get('patient_id'))
+        doc_id = int(request.form.get('doctor_id'))
+
+        raw_date = request.form.get('date', '').strip()
+        raw_time = request.form.get('time', '').strip()
+
+        a_date = datetime.strptime(raw_date, '%Y-%m-%d').date()
+        a_time = datetime.strptime(raw_time, '%H:%M').time()
+
+        doc_obj = Doctor.query.get(doc_id)
+        if not doc_obj:
+            flash('Selected doctor not found.', 'danger')
+            return redirect(url_for('admin.dashboard'))
+
+        # same booking rule as the patient routes (see slot_table.booking_problem)
+        problem = booking_problem(doc_obj, a_date, a_time)
+        if problem == 'unavailable':
+            flash('Doctor not available at chosen date/time. Please pick another slot.', 'warning')
+            return redirect(url_for('admin.dashboard'))
+
+        if problem == 'conflict':
+            flash('This doctor already has an appointment within 5 minutes of the selected time.', 'warning')
+            return redirect(url_for('admin.dashboard'))
+
+        reserve(lambda: db.session.add(
+            Appointment(patient_id=pat_id, doctor_id=doc_id, date=a_date, time=a_time, status='Booked')))
+        flash('Appointment created successfully.', 'success')
+    except SlotTaken:
+        flash('This doctor already has an appointment within 5 minutes of the selected time.', 'warning')
+    except ValueError:
+        db.session.rollback()
+        flash('Invalid date/time format. Use YYYY-MM-DD and HH:MM.', 'danger')
+    except Exception:
+        db.session.rollback()
+        flash('Failed to create appointment. Try again.', 'danger')
+
+    return redirect(url_for('admin.dashboard'))
+
+
+@bp.route('/appointment/edit/<int:appt_id>', methods=['POST'])
+def edit_appointment(appt_id):
+    if 'admin_id' not in session:
+        flash('Unauthorized', 'danger')
+        return redirect(url_for('main.login', role='admin'))
+
+    appt_record = Appointment.query.get_or_404(appt_id)
+    try:
+        pid_input = request.form.get('patient_id')
+        did_input = request.form.get('doctor_id')
+        date_input = request.form.get('date', '').strip()
+        time_input = request.form.get('time', '').strip()
+        stat_input = request.form.get('status', '').strip()
+
+        final_pid = int(pid_input) if pid_input else appt_record.patient_id
+        final_did = int(did_input) if did_input else appt_record.doctor_id
+        final_date = appt_record.date
+        final_time = appt_record.time
+
+        if date_input:
+            final_date = datetime.strptime(date_input, '%Y-%m-%d').date()
+        if time_input:
+            final_time = datetime.strptime(time_input, '%H:%M').time()
+
+        doc_check = Doctor.query.get(final_did)
+        if not doc_check:
+            flash('Selected doctor not found.', 'danger')
+            return redirect(url_for('admin.dashboard'))
+
+        problem = booking_problem(doc_check, final_date, final_time, exclude_appt_id=appt_record.id)
+        if problem == 'unavailable':
+            flash('Doctor not available at chosen date/time. Please pick another slot.', 'warning')
+            return redirect(url_for('admin.dashboard'))
+
+        if problem == 'conflict':
+            flash('Cannot reschedule—doctor has another appointment within 5 minutes.', 'warning')
+            return redirect(url_for('admin.dashboard'))
+
+        def stage():
+            appt_record.patient_id = final_pid
+            appt_record.doctor_id = final_did
+            appt_record.date = final_date
+            appt_record.time = final_time
+            if stat_input and stat_input in ('Booked', 'Completed', 'Cancelled'):
+                appt_record.status = stat_input
+
+        reserve(stage)
+        flash('Appointment updated successfully.', 'success')
+    except SlotTaken:
+        flash('Cannot reschedule—doctor has another appointment within 5 minutes.', 'warning')
+    except ValueError:
+        db.session.rollback()
+        flash('Invalid date/time format. Use YYYY-MM-DD and HH:MM.', 'danger')
+    except Exception:
+        db.session.rollback()
+        flash('Failed to update appointment.', 'danger')
+
+    return redirect(url_for('admin.dashboard'))
+
+
+@bp.route('/appointment/delete/<int:appt_id>', methods=['POST'])
+def delete_appointment(appt_id):
+    if 'admin_id' not in session:
+        flash('Unauthorized', 'danger')
+        return redirect(url_for('main.login', role='admin'))
+
+    target = Appointment.query.get_or_404(appt_id)
+    try:
+        db.session.delete(target)
+        db.session.commit()
+        flash('Appointment deleted.', 'success')
+    except Exception:
+        db.session.rollback()
+        flash('Failed to delete appointment.', 'danger')
+
+    return redirect(url_for('admin.dashboard'))
+
+
+@bp.route('/appointment/status/<int:appt_id>', methods=['POST'])
+def change_appointment_status(appt_id):
+    if 'admin_id' not in session:
+        flash('Unauthorized', 'danger')
+        return redirect(url_for('main.login', role='admin'))
+
+    appt_item = Appointment.query.get_or_404(appt_id)
+    status_val = request.form.get('status', '').strip()
+
+    valid_statuses = ('Booked', 'Completed', 'Cancelled')
+    if status_val not in valid_statuses:
+        flash('Invalid status value.', 'warning')
+        return redirect(url_for('admin.dashboard'))
+
+    try:
+        # re-activating a cancelled appointment claims its slot again
+        reserve(lambda: setattr(appt_item, 'status', status_val))
+        flash('Appointment status updated.', 'success')
+    except SlotTaken:
+        flash('Cannot reactivate—doctor has another appointment within 5 minutes.', 'warning')
+    except Exception:
+        db.session.rollback()
+        flash('Failed to update appointment status.', 'danger')
+
+    return redirect(url_for('admin.dashboard'))
+
+
+# Admin views for appointments by doctor/patient
+@bp.route('/doctor/<int:doc_id>/appointments', methods=['GET'])
+def view_doctor_appointments(doc_id):
+    if 'admin_id' not in session:
+        flash('Please login as admin to access this page.', 'warning')
+        return redirect(url_for('main.login', role='admin'))
+
+    doc_entity = Doctor.query.get_or_404(doc_id)
+    # hot and archived appointments, merged into one listing
+    doc_appts = keyset_paginate_union(
+        [(Appointment.query.filter_by(doctor_id=doc_id).options(joinedload(Appointment.patient)),
+          APPOINTMENT_KEYSET),
+         (ArchivedAppointment.query.filter_by(doctor_id=doc_id).options(joinedload(ArchivedAppointment.patient)),
+          ARCHIVED_APPOINTMENT_KEYSET)],
+        request.args.get('cursor'),
+        page_size(request.args.get('size')),
+        descending=True
+    )
+    return render_template('appointments_by_entity.html', entity_type='doctor', entity=doc_entity,
+                           appointments=doc_appts)
+
+
+@bp.route('/patient/<int:patient_id>/appointments', methods=['GET'])
+def view_patient_appointments(patient_id):
+    if 'admin_id' not in session:
+        flash('Please login as admin to access this page.', 'warning')
+        return redirect(url_for('main.login', role='admin'))
+
+    pat_entity = Patient.query.get_or_404(patient_id)
+    pat_appts = keyset_paginate_union(
+        [(Appointment.query.filter_by(patient_id=patient_id).options(joinedload(Appointment.doctor)),
+          APPOINTMENT_KEYSET),
+         (ArchivedAppointment.query.filter_by(patient_id=patient_id).options(joinedload(ArchivedAppointment.doctor)),
+          ARCHIVED_APPOINTMENT_KEYSET)],
+        request.args.get('cursor'),
+        page_size(request.args.get('size')),
+        descending=True
+    )
+    return render_template('appointments_by_entity.html', entity_type='patient', entity=pat_entity,
+                           appointments=pat_appts)
+
+
+# Admin can edit patient details
+@bp.route('/patient/edit/<int:patient_id>', methods=['POST'])
+def edit_patient(patient_id):
+    if 'admin_id' not in session:
+        flash('Unauthorized', 'danger')
+        return redirect(url_for('main.login', role='admin'))
+
+    pat_obj = Patient.query.get_or_404(patient_id)
+    try:
+        # Required fields in patient edit
+        new_name = request.form.get('name', pat_obj.name).strip()
+        raw_age = request.form.get('age', '')
+        new_gen = request.form.get('gender', pat_obj.gender)
+        new_cont = request.form.get('contact', pat_obj.contact).strip()
+        new_mail = request.form.get('email', pat_obj.email or '').strip()
+        new_user = request.form.get('username', pat_obj.username).strip()
+        new_pass = request.form.get('password', '').strip()
+
+        if not new_name or not new_user:
+            flash('Name and username are required for patients.', 'danger')
+            return redirect(url_for('admin.dashboard'))
+
+        # apply updates
+        pat_obj.name = new_name
+        pat_obj.age = int(raw_age) if raw_age != '' else None
+        pat_obj.gender = new_gen
+        pat_obj.contact = new_cont
+        pat_obj.email = new_mail
+        pat_obj.username = new_user
+        if new_pass:
+
+            try:
+                pat_obj.set_password(new_pass)
+            except Exception:
+                #in case password column is empty
+                pat_obj.password_hash = hash_password(new_pass)
+
+        db.session.commit()
+        flash('Patient updated successfully.', 'success')
+    except IntegrityError:
+        db.session.rollback()
+        flash('Username already taken. Choose another username.', 'warning')
+    except ValueError:
+        db.session.rollback()
+        flash('Invalid age value.', 'danger')
+    except Exception:
+        db.session.rollback()
+        flash('Failed to update patient. Try again.', 'danger')
+
+    return redirect(url_for('admin.dashboard'))
+
+
+@bp.route('/export/appointments', methods=['GET'])
+def export_appointments():
+    if 'admin_id' not in session:
+        flash('Please login as admin to access this page.', 'warning')
+        return redirect(url_for('main.login', role='admin'))
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify(error='format must be csv or ndjson.'), 400
+    try:
+        from_date, to_date, statuses = parse_export_filters(
+            request.args.get('from', '').strip(), request.args.get('to', '').strip(),
+            request.args.getlist('status'))
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+
+    serializer, mimetype = FORMATS[fmt]
+    stream = serializer(iter_rows(from_date, to_date, statuses))
+    return Response(
+        stream_with_context(stream),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=appointments.{fmt}'}
+    )
+
+
+# Admin: hit/miss counters of this process's treatment timeline cache
+@bp.route('/metrics/timeline-cache', methods=['GET'])
+def timeline_cache_metrics():
+    if 'admin_id' not in session:
+        return jsonify(error='Login required.'), 401
+    return jsonify(pid=os.getpid(), **get_timeline_cache().stats())
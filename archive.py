@@ -0,0 +1,95 @@
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, insert, literal, select, update
+
+from models import (
+    db, Appointment, Treatment, ArchivedAppointment, ArchivedTreatment, DoctorSlot, SlotClaim
+)
+from timeline import bump_timelines
+
+# appointments in these states never change again, so they can leave the hot table
+ARCHIVE_STATUSES = ('Completed', 'Cancelled')
+# ids per batch; IN (...) lists stay below SQLite's bound-parameter limit
+ARCHIVE_BATCH_SIZE = 500
+APPOINTMENT_COLUMNS = ('id', 'patient_id', 'doctor_id', 'date', 'time', 'status', 'created_at', 'updated_at')
+TREATMENT_COLUMNS = ('id', 'appointment_id', 'diagnosis', 'prescription', 'notes', 'created_at')
+
+
+class ArchiveReport:
+    def __init__(self, cutoff):
+        self.cutoff = cutoff
+        self.appointments = 0
+        self.treatments = 0
+        self.batches = 0
+        self.started = time.perf_counter()
+
+    def summary(self):
+        return (f'Archived {self.appointments} appointments and {self.treatments} treatments dated before '
+                f'{self.cutoff} in {self.batches} batches ({time.perf_counter() - self.started:.1f}s)')
+
+
+def archive_cutoff(older_than_days):
+    # at least one day back, so nothing in the booking horizon (doctor_slots) is touched
+    return date.today() - timedelta(days=max(1, older_than_days))
+
+
+def _archivable(cutoff):
+    return (select(Appointment.id)
+            .where(Appointment.date < cutoff, Appointment.status.in_(ARCHIVE_STATUSES))
+            .order_by(Appointment.id))
+
+
+def _copy(conn, source, target, columns, where, **extra):
+    cols = [getattr(source, name) for name in columns]
+    values = [literal(value) for value in extra.values()]
+    stmt = insert(target).from_select(list(columns) + list(extra), select(*cols, *values).where(where))
+    return conn.execute(stmt)
+
+
+def _move_batch(conn, ids):
+    """
+    Copies one batch of appointments (with their treatments) to the archive
+    tables and removes them from the hot ones. Returns the treatments moved.
+    """
+    patient_ids = conn.execute(select(Appointment.patient_id).where(Appointment.id.in_(ids))
+                               .distinct()).scalars().all()
+    _copy(conn, Appointment, ArchivedAppointment, APPOINTMENT_COLUMNS, Appointment.id.in_(ids),
+          archived_at=datetime.utcnow())
+    moved = _copy(conn, Treatment, ArchivedTreatment, TREATMENT_COLUMNS, Treatment.appointment_id.in_(ids))
+    # past appointments hold no slot that anyone could still book; drop what points at them
+    conn.execute(delete(SlotClaim).where(SlotClaim.appointment_id.in_(ids)))
+    conn.execute(update(DoctorSlot).where(DoctorSlot.appointment_id.in_(ids)).values(appointment_id=None))
+    conn.execute(delete(Treatment).where(Treatment.appointment_id.in_(ids)))
+    conn.execute(delete(Appointment).where(Appointment.id.in_(ids)))
+    # cached timelines show the moved treatments as hot ones
+    bump_timelines(conn, patient_ids)
+    return moved.rowcount
+
+
+def archive_appointments(older_than_days=365, batch_size=ARCHIVE_BATCH_SIZE, dry_run=False, max_batches=None):
+    """
+    Moves Completed/Cancelled appointments dated before today - older_than_days,
+    and their treatments, into the archive tables. Every batch is its own
+    transaction, so the job can be stopped and resumed. The dashboard counters
+    keep counting archived appointments, so they are left alone.
+    """
+    cutoff = archive_cutoff(older_than_days)
+    report = ArchiveReport(cutoff)
+    last_id = 0
+    while max_batches is None or report.batches < max_batches:
+        # walking by id also lets a dry run page past rows it does not move
+        ids = db.session.execute(_archivable(cutoff).where(Appointment.id > last_id)
+                                 .limit(batch_size)).scalars().all()
+        if not ids:
+            break
+        last_id = ids[-1]
+        report.batches += 1
+        report.appointments += len(ids)
+        if dry_run:
+            report.treatments += (db.session.query(Treatment)
+                                  .filter(Treatment.appointment_id.in_(ids)).count())
+            continue
+        report.treatments += _move_batch(db.session.connection(), ids)
+        db.session.commit()
+    return report
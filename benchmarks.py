@@ -0,0 +1,372 @@
+import itertools
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, time as dtime, timedelta
+
+import sqlalchemy
+from flask import Flask
+from sqlalchemy import insert, literal, select
+
+from models import db, Department, Doctor, Patient, Appointment, DoctorAvailability
+from directory import get_directory, bump_directory_version
+from scheduling import free_slots, time_to_seconds
+from slot_table import rebuild_slots
+
+# dataset grid: availability slots per day, windows they are split into, bookings that day
+SLOTS_PER_DAY = (8, 16, 32)
+WINDOWS = (1, 4)
+BOOKINGS = (0, 8, 32)
+SLOT_MINUTES = 30
+DAY_START = dtime(6, 0)
+# the same booking density on this many other days, so index range scans are realistic
+BACKGROUND_DAYS = 30
+# a Monday one to two weeks ahead, inside the doctor_slots rows the benchmark materializes
+BENCH_DATE = date.today() + timedelta(days=7 + (-date.today().weekday() % 7))
+BENCH_HORIZON_DAYS = 21
+# past that horizon get_available_slots takes the on-the-fly path; timed separately
+FALLBACK_DATE = BENCH_DATE + timedelta(weeks=4)
+# a case slower than baseline * (1 + tolerance) is reported as a regression
+DEFAULT_TOLERANCE = 0.25
+BASELINE_FILE = 'benchmarks_baseline.json'
+# the timed calls of a case are split into this many blocks, interleaved with the other cases
+DEFAULT_REPEATS = 10
+# calibration runs next to every block of timed calls
+CALIBRATION_ROUNDS = 3
+# timings are only comparable when these match the baseline's environment
+ENVIRONMENT_KEYS = ('python', 'implementation', 'machine', 'system', 'processor', 'cpu_count', 'sqlite',
+                    'sqlalchemy')
+
+
+def _windows(slots_per_day, windows):
+    # slots_per_day slots split into `windows` windows with one free slot between them
+    per_window = max(1, slots_per_day // windows)
+    start = datetime.combine(BENCH_DATE, DAY_START)
+    result = []
+    for _ in range(windows):
+        end = start + timedelta(minutes=per_window * SLOT_MINUTES)
+        result.append((start.time(), end.time()))
+        start = end + timedelta(minutes=SLOT_MINUTES)
+    return result
+
+
+def _booked_times(windows, bookings):
+    starts = []
+    for start, end in windows:
+        current = datetime.combine(BENCH_DATE, start)
+        while current.time() < end and current.date() == BENCH_DATE:
+            starts.append(current.time())
+            current += timedelta(minutes=SLOT_MINUTES)
+    if not bookings:
+        return []
+    # spread the bookings evenly over the day's slots
+    step = max(1, len(starts) // bookings)
+    return starts[::step][:bookings]
+
+
+def build_dataset():
+    """
+    One doctor per grid point, with weekly windows and bookings on BENCH_DATE,
+    FALLBACK_DATE and BACKGROUND_DAYS days around each; doctor_slots is
+    materialized for BENCH_HORIZON_DAYS. Returns {(slots, windows, bookings): doctor_id}.
+    """
+    busy_days = sorted({day + timedelta(days=offset) for day in (BENCH_DATE, FALLBACK_DATE)
+                        for offset in range(-BACKGROUND_DAYS // 2, BACKGROUND_DAYS // 2 + 1)})
+    patient = Patient(name='Bench Patient', username='bench-patient', password_hash='!')
+    db.session.add(patient)
+    db.session.flush()
+    cases = {}
+    for n, (slots, windows, bookings) in enumerate(itertools.product(SLOTS_PER_DAY, WINDOWS, BOOKINGS)):
+        doctor = Doctor(name=f'Bench {n}', specialization='bench', username=f'bench-doctor-{n}', password_hash='!')
+        db.session.add(doctor)
+        db.session.flush()
+        day_windows = _windows(slots, windows)
+        db.session.execute(insert(DoctorAvailability), [
+            {'doctor_id': doctor.id, 'day_of_week': dow, 'start_time': start, 'end_time': end}
+            for dow in range(7) for start, end in day_windows
+        ])
+        booked = _booked_times(day_windows, bookings)
+        if booked:
+            db.session.execute(insert(Appointment), [
+                {'patient_id': patient.id, 'doctor_id': doctor.id, 'date': day, 'time': appt_time,
+                 'status': 'Booked'}
+                for day in busy_days for appt_time in booked
+            ])
+        cases[(slots, windows, bookings)] = doctor.id
+    rebuild_slots(days=BENCH_HORIZON_DAYS)
+    db.session.commit()
+    return cases
+
+
+def _timed(fn, rounds):
+    fn()  # warm-up: statement cache, lazy loads
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return {
+        'median_us': round(statistics.median(samples) * 1e6, 2),
+        'min_us': round(min(samples) * 1e6, 2),
+        'ops_per_s': round(1 / statistics.median(samples), 1),
+    }
+
+
+def case_name(function, slots, windows, bookings):
+    return f'{function}[slots={slots},windows={windows},bookings={bookings}]'
+
+
+def run_benchmarks(functions, rounds=200, repeats=DEFAULT_REPEATS):
+    """
+    Times the scheduling functions on an in-memory SQLite dataset.
+    `functions` maps get_available_slots / doctor_has_conflict /
+    doctor_is_available to the implementations under test. Every case runs
+    `repeats` times (rounds split between them), interleaved with the other
+    cases and each time next to a calibration run (see calibrate), so a slow
+    patch of the machine neither lands on one case only nor reads as a regression.
+    Returns {case_name: timings}: median_us is the median over the repeats,
+    relative the median of the per-repeat medians divided by that repeat's calibration.
+    """
+    bench_app = Flask('benchmarks')
+    bench_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(bench_app)
+    per_repeat = max(1, rounds // repeats)
+    samples = {}
+    with bench_app.app_context():
+        db.create_all()
+        cases = build_dataset()
+        for _ in range(repeats):
+            for (slots, windows, bookings), doctor_id in cases.items():
+                doctor = db.session.get(Doctor, doctor_id)
+                day_windows = _windows(slots, windows)
+                # a time inside the first window, next to a booking when there is one
+                probe = (datetime.combine(BENCH_DATE, day_windows[0][0]) + timedelta(minutes=2)).time()
+                booked_secs = sorted(time_to_seconds(t) for t in _booked_times(day_windows, bookings))
+                calls = {
+                    # one indexed doctor_slots read
+                    'get_available_slots': lambda: functions['get_available_slots'](doctor, BENCH_DATE),
+                    # windows + appointments, as for dates past the horizon
+                    'get_available_slots_fallback':
+                        lambda: functions['get_available_slots'](doctor, FALLBACK_DATE),
+                    'doctor_has_conflict': lambda: functions['doctor_has_conflict'](doctor_id, BENCH_DATE, probe),
+                    'doctor_is_available': lambda: functions['doctor_is_available'](doctor, BENCH_DATE, probe),
+                    # the in-memory part of get_available_slots, without SQL
+                    'free_slots': lambda: free_slots(day_windows, booked_secs, BENCH_DATE, SLOT_MINUTES),
+                }
+                calibration_us = calibrate(CALIBRATION_ROUNDS)
+                for name, call in calls.items():
+                    timing = _timed(call, per_repeat)
+                    timing['relative'] = timing['median_us'] / calibration_us
+                    samples.setdefault(case_name(name, slots, windows, bookings), []).append(timing)
+        db.session.remove()
+        db.drop_all()
+    results = {}
+    for case, timings in samples.items():
+        median_us = statistics.median(t['median_us'] for t in timings)
+        results[case] = {
+            'median_us': round(median_us, 2),
+            'min_us': min(t['min_us'] for t in timings),
+            'ops_per_s': round(1e6 / median_us, 1) if median_us else 0.0,
+            'relative': round(statistics.median(t['relative'] for t in timings), 5),
+        }
+    return results
+
+
+def _uncached_directory(spec):
+    # what patient_dashboard did before the directory cache: DISTINCT + full Doctor rows
+    specs = [s for (s,) in Doctor.query.with_entities(Doctor.specialization).distinct()
+             .order_by(Doctor.specialization).all() if s]
+    query = Doctor.query.order_by(Doctor.id.desc())
+    if spec:
+        query = query.filter(Doctor.specialization.ilike(f'%{spec}%'))
+    return specs, query.all()
+
+
+def _cached_directory(spec):
+    directory = get_directory()
+    return directory.specializations, directory.search(spec)
+
+
+def _allocations(fn, rounds):
+    # bytes allocated at the peak of one call, the memory a request has to churn through
+    fn()
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(rounds):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            fn()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return round(statistics.median(peaks) / 1024, 1)
+
+
+def run_directory_benchmark(doctors=1000, rounds=50, spec='Cardio'):
+    """
+    Patient search form + doctor list, before and after the directory cache:
+    {variant: {'median_us', 'min_us', 'ops_per_s', 'peak_kib'}} for all doctors and one specialization.
+    """
+    bench_app = Flask('benchmarks')
+    bench_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(bench_app)
+    results = {}
+    with bench_app.app_context():
+        db.create_all()
+        departments = [Department(name=f'Bench dept {n}') for n in range(10)]
+        db.session.add_all(departments)
+        db.session.flush()
+        specs = ('Cardiology', 'Dermatology', 'Neurology', 'Pediatrics', 'Radiology')
+        db.session.execute(insert(Doctor), [
+            {'name': f'Bench {n}', 'specialization': specs[n % len(specs)], 'username': f'bench-doctor-{n}',
+             'password_hash': 'scrypt:32768:8:1$' + 'x' * 120, 'contact': f'555-{n:07d}',
+             'availability': 'Mon-Fri mornings', 'department_id': departments[n % 10].id}
+            for n in range(doctors)
+        ])
+        bump_directory_version()
+        db.session.commit()
+        for name, fn in (('uncached', _uncached_directory), ('cached', _cached_directory)):
+            for label, query in (('all', ''), ('spec', spec)):
+                # every request starts with an empty identity map
+                call = lambda: (db.session.expunge_all(), fn(query))
+                timing = _timed(call, rounds)
+                timing['peak_kib'] = _allocations(call, rounds)
+                results[f'{name}[{label}]'] = timing
+        db.session.remove()
+        db.drop_all()
+    return results
+
+
+# one worker start, run in a fresh interpreter; prints {phase: seconds} as JSON
+STARTUP_SCRIPT = """
+import contextlib, io, json, os, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+from models import init_db
+with contextlib.redirect_stdout(io.StringIO()):
+    init_db(app)
+bootstrapped = time.perf_counter()
+timings = {'import': imported - started, 'create_app': created - imported, 'init_db (per worker before)': bootstrapped - created}
+if hasattr(os, 'fork'):
+    # gunicorn --preload: the worker is a fork of the process that built the app
+    read_end, write_end = os.pipe()
+    forked = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        app.test_client().get('/auth/login')
+        os.write(write_end, str(time.perf_counter() - forked).encode())
+        os._exit(0)
+    os.waitpid(pid, 0)
+    timings['preloaded worker 1st req'] = float(os.read(read_end, 64))
+print(json.dumps(timings))
+"""
+
+
+def run_startup_benchmark(root_dir, rounds=5):
+    """
+    Starts `rounds` fresh interpreters against a scratch SQLite database (schema
+    created by an untimed first start) and returns {phase: {'median_ms', 'min_ms'}}.
+    """
+    with tempfile.TemporaryDirectory() as scratch:
+        env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(scratch, 'startup.db'),
+                   SLOT_REFRESH_SECONDS='0', HOSPITAL_SETTINGS='')
+        samples = {}
+        for run in range(rounds + 1):
+            out = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=root_dir, env=env,
+                                 capture_output=True, text=True, check=True).stdout
+            if not run:
+                continue
+            for phase, seconds in json.loads(out.strip().splitlines()[-1]).items():
+                samples.setdefault(phase, []).append(seconds * 1000)
+    return {phase: {'median_ms': round(statistics.median(values), 1), 'min_ms': round(min(values), 1)}
+            for phase, values in samples.items()}
+
+
+def calibrate(repeats=15):
+    """
+    Median time of a fixed Python + SQLite + SQLAlchemy workload, in
+    microseconds; needs an app context. Timings divided by it stay comparable
+    when the machine is faster or busier than when the baseline was recorded,
+    or than a moment ago. SQLAlchemy is pinned by the environment check, so
+    only the machine can move it.
+    """
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE t (k INTEGER PRIMARY KEY, v INTEGER)')
+    conn.executemany('INSERT INTO t VALUES (?, ?)', ((n, n * 7 % 1000) for n in range(2000)))
+    probe = select(literal(1).label('one'), literal('x').label('text'))
+
+    def workload():
+        total = 0
+        for lo in range(0, 2000, 100):
+            rows = conn.execute('SELECT v FROM t WHERE k BETWEEN ? AND ?', (lo, lo + 99)).fetchall()
+            total += sum(sorted(v for (v,) in rows)[:10])
+        for _ in range(10):
+            total += len(db.session.execute(probe).all())
+        return total
+
+    timing = _timed(workload, repeats)
+    conn.close()
+    return timing['median_us']
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'sqlite': sqlite3.sqlite_version,
+        'sqlalchemy': sqlalchemy.__version__,
+        'recorded_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+    }
+
+
+def environment_mismatch(baseline, current=None):
+    """
+    [(key, baseline value, current value)] for the environment fields that
+    differ; a baseline from another machine or interpreter says nothing about this one.
+    """
+    saved = baseline.get('environment', {})
+    current = current or environment()
+    return [(key, saved.get(key), current.get(key)) for key in ENVIRONMENT_KEYS
+            if saved.get(key) != current.get(key)]
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)
+
+
+def save_baseline(path, results):
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump({'environment': environment(), 'results': results}, fh, indent=2, sort_keys=True)
+        fh.write('\n')
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Returns [(case, baseline_us, current_us, ratio, regressed)] for cases in
+    both runs. The ratio compares the calibration-relative medians (see
+    run_benchmarks), the microseconds are shown for reference.
+    """
+    rows = []
+    for case, current in results.items():
+        before = baseline.get('results', {}).get(case)
+        if not before or not before.get('relative'):
+            continue
+        ratio = current['relative'] / before['relative']
+        rows.append((case, before['median_us'], current['median_us'], ratio, ratio > 1 + tolerance))
+    return rows
@@ -0,0 +1,341 @@
+import csv
+import json
+import time
+from bisect import insort
+from datetime import datetime
+
+from sqlalchemy import insert, tuple_
+
+from models import db, Doctor, Patient, Appointment, Treatment, DoctorAvailability, SlotClaim
+from hashing import hash_many
+from reservations import claim_rows, is_active
+from scheduling import is_clashing, time_to_seconds
+from timeline import bump_timelines
+
+BATCH_SIZE = 1000
+VALID_STATUSES = ('Booked', 'Completed', 'Cancelled')
+
+
+class RowError(Exception):
+    pass
+
+
+class ImportReport:
+    """
+    Counts and per-row errors of one import run.
+    """
+
+    def __init__(self, kind, path, on_error=None):
+        self.kind = kind
+        self.path = path
+        self.read = 0
+        self.imported = 0
+        self.errors = 0
+        self.on_error = on_error
+        self.started = time.perf_counter()
+
+    def fail(self, line_no, message):
+        # reported as they happen so memory stays flat on bad files
+        self.errors += 1
+        if self.on_error:
+            self.on_error(f'{self.path}:{line_no}: {message}')
+
+    def summary(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return (f'{self.kind}: {self.imported}/{self.read} rows imported, {self.errors} errors, '
+                f'{elapsed:.1f}s ({self.read / elapsed * 60:.0f} rows/min)')
+
+
+def read_rows(path):
+    """
+    Streams (line_no, dict) from a .csv or .jsonl/.ndjson file.
+    """
+    if path.endswith(('.jsonl', '.ndjson')):
+        with open(path, encoding='utf-8') as fh:
+            for line_no, line in enumerate(fh, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as exc:
+                    yield line_no, RowError(f'invalid JSON: {exc}')
+                    continue
+                yield line_no, row if isinstance(row, dict) else RowError('expected a JSON object')
+    else:
+        with open(path, encoding='utf-8', newline='') as fh:
+            # line 1 is the header
+            for line_no, row in enumerate(csv.DictReader(fh), start=2):
+                yield line_no, row
+
+
+def batches(rows, size):
+    batch = []
+    for item in rows:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _text(row, key, required=False):
+    value = row.get(key)
+    value = str(value).strip() if value is not None else ''
+    if required and not value:
+        raise RowError(f'"{key}" is required')
+    return value or None
+
+
+def _int(row, key):
+    value = _text(row, key)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise RowError(f'"{key}" must be a number')
+
+
+def _parse_window(raw, day_idx):
+    # "09:00-17:00"
+    try:
+        start_s, end_s = raw.split('-', 1)
+        start_t = datetime.strptime(start_s.strip(), '%H:%M').time()
+        end_t = datetime.strptime(end_s.strip(), '%H:%M').time()
+    except ValueError:
+        raise RowError(f'day_{day_idx} must look like HH:MM-HH:MM')
+    if not start_t < end_t:
+        raise RowError(f'day_{day_idx}: start time must be before end time')
+    return start_t, end_t
+
+
+def _parse_doctor(row):
+    fields = {
+        'name': _text(row, 'name', required=True),
+        'specialization': _text(row, 'specialization', required=True),
+        'availability': _text(row, 'availability'),
+        'contact': _text(row, 'contact'),
+        'username': _text(row, 'username', required=True),
+        'department_id': _int(row, 'department_id'),
+    }
+    # weekly slots as day_0 (Mon) .. day_6 (Sun) = "HH:MM-HH:MM"
+    windows = []
+    for day_idx in range(7):
+        raw = _text(row, f'day_{day_idx}')
+        if raw:
+            windows.append((day_idx,) + _parse_window(raw, day_idx))
+    return fields, windows
+
+
+def _parse_patient(row):
+    fields = {
+        'name': _text(row, 'name', required=True),
+        'age': _int(row, 'age'),
+        'gender': _text(row, 'gender'),
+        'contact': _text(row, 'contact'),
+        'email': _text(row, 'email'),
+        'username': _text(row, 'username', required=True),
+    }
+    return fields, None
+
+
+def _taken_usernames(model, usernames):
+    if not usernames:
+        return set()
+    rows = db.session.query(model.username).filter(model.username.in_(usernames)).all()
+    return {username for (username,) in rows}
+
+
+def import_accounts(model, parse_row, path, batch_size=BATCH_SIZE, hash_method=None,
+                    dry_run=False, on_error=None):
+    """
+    Doctors or patients: validates each batch, checks usernames against the
+    file and the database in one query, hashes passwords in parallel and
+    inserts the batch with one executemany.
+    """
+    report = ImportReport(model.__tablename__, path, on_error)
+    seen_usernames = set()
+
+    for batch in batches(read_rows(path), batch_size):
+        parsed = []
+        for line_no, row in batch:
+            report.read += 1
+            if isinstance(row, RowError):
+                report.fail(line_no, str(row))
+                continue
+            try:
+                fields, windows = parse_row(row)
+                pw_hash = _text(row, 'password_hash')
+                password = None if pw_hash else _text(row, 'password', required=True)
+            except RowError as exc:
+                report.fail(line_no, str(exc))
+                continue
+            if fields['username'] in seen_usernames:
+                report.fail(line_no, f'duplicate username "{fields["username"]}" in file')
+                continue
+            seen_usernames.add(fields['username'])
+            parsed.append((line_no, fields, windows, pw_hash, password))
+
+        taken = _taken_usernames(model, [item[1]['username'] for item in parsed])
+        accepted = []
+        for line_no, fields, windows, pw_hash, password in parsed:
+            if fields['username'] in taken:
+                report.fail(line_no, f'username "{fields["username"]}" already exists')
+            else:
+                accepted.append((fields, windows, pw_hash, password))
+
+        plain = [password for _, _, pw_hash, password in accepted if pw_hash is None]
+        hashed = iter(hash_many(plain, hash_method))
+        for fields, _, pw_hash, _ in accepted:
+            fields['password_hash'] = pw_hash or next(hashed)
+
+        if accepted and not dry_run:
+            db.session.execute(insert(model), [fields for fields, _, _, _ in accepted])
+            if model is Doctor:
+                _insert_windows(accepted)
+            db.session.commit()
+        report.imported += len(accepted)
+    return report
+
+
+def _insert_windows(accepted):
+    usernames = [fields['username'] for fields, windows, _, _ in accepted if windows]
+    if not usernames:
+        return
+    ids = dict(db.session.query(Doctor.username, Doctor.id).filter(Doctor.username.in_(usernames)).all())
+    rows = [
+        {'doctor_id': ids[fields['username']], 'day_of_week': day_idx, 'start_time': start_t, 'end_time': end_t}
+        for fields, windows, _, _ in accepted if windows
+        for day_idx, start_t, end_t in windows
+    ]
+    db.session.execute(insert(DoctorAvailability), rows)
+
+
+def _parse_appointment(row):
+    try:
+        appt_date = datetime.strptime(_text(row, 'date', required=True), '%Y-%m-%d').date()
+        appt_time = datetime.strptime(_text(row, 'time', required=True), '%H:%M').time()
+    except ValueError:
+        raise RowError('date/time must be YYYY-MM-DD and HH:MM')
+    status = _text(row, 'status') or 'Booked'
+    if status not in VALID_STATUSES:
+        raise RowError(f'status must be one of {", ".join(VALID_STATUSES)}')
+
+    patient_ref = _int(row, 'patient_id') or _text(row, 'patient_username')
+    doctor_ref = _int(row, 'doctor_id') or _text(row, 'doctor_username')
+    if patient_ref is None or doctor_ref is None:
+        raise RowError('patient_id/patient_username and doctor_id/doctor_username are required')
+
+    treatment = {key: _text(row, key) for key in ('diagnosis', 'prescription', 'notes')}
+    return {
+        'patient_ref': patient_ref, 'doctor_ref': doctor_ref,
+        'date': appt_date, 'time': appt_time, 'status': status,
+        'treatment': treatment if any(treatment.values()) else None,
+    }
+
+
+def _resolve(model, refs):
+    # ids and usernames of one batch -> {ref: id} in at most two queries
+    ids = {ref for ref in refs if isinstance(ref, int)}
+    names = {ref for ref in refs if isinstance(ref, str)}
+    resolved = {}
+    if ids:
+        resolved.update((i, i) for (i,) in db.session.query(model.id).filter(model.id.in_(ids)).all())
+    if names:
+        resolved.update(db.session.query(model.username, model.id).filter(model.username.in_(names)).all())
+    return resolved
+
+
+def _booked_times(pairs):
+    """
+    Existing times for (doctor_id, date) pairs, one query. Cancelled ones
+    included: conflict_query, and with it booking, counts them too.
+    """
+    booked = {}
+    if not pairs:
+        return booked
+    rows = (db.session.query(Appointment.doctor_id, Appointment.date, Appointment.time)
+            .filter(tuple_(Appointment.doctor_id, Appointment.date).in_(list(pairs)))
+            .all())
+    for doc_id, appt_date, appt_time in rows:
+        booked.setdefault((doc_id, appt_date), []).append(time_to_seconds(appt_time))
+    for times in booked.values():
+        times.sort()
+    return booked
+
+
+def import_appointments(path, batch_size=BATCH_SIZE, dry_run=False, on_error=None):
+    """
+    Historical appointments (+ optional treatment columns). Cancelled rows
+    need no free slot; all others go through the same ±5 minute conflict
+    rule as booking, checked per batch with bisect, and like there every
+    earlier appointment blocks, cancelled or not.
+    """
+    report = ImportReport('appointments', path, on_error)
+
+    for batch in batches(read_rows(path), batch_size):
+        parsed = []
+        for line_no, row in batch:
+            report.read += 1
+            if isinstance(row, RowError):
+                report.fail(line_no, str(row))
+                continue
+            try:
+                parsed.append((line_no, _parse_appointment(row)))
+            except RowError as exc:
+                report.fail(line_no, str(exc))
+
+        patients = _resolve(Patient, [item['patient_ref'] for _, item in parsed])
+        doctors = _resolve(Doctor, [item['doctor_ref'] for _, item in parsed])
+        resolved = []
+        for line_no, item in parsed:
+            if item['patient_ref'] not in patients:
+                report.fail(line_no, f'unknown patient "{item["patient_ref"]}"')
+            elif item['doctor_ref'] not in doctors:
+                report.fail(line_no, f'unknown doctor "{item["doctor_ref"]}"')
+            else:
+                item['patient_id'] = patients[item['patient_ref']]
+                item['doctor_id'] = doctors[item['doctor_ref']]
+                resolved.append((line_no, item))
+
+        booked = _booked_times({(item['doctor_id'], item['date']) for _, item in resolved})
+        accepted = []
+        for line_no, item in resolved:
+            times = booked.setdefault((item['doctor_id'], item['date']), [])
+            secs = time_to_seconds(item['time'])
+            if item['status'] != 'Cancelled' and is_clashing(times, secs):
+                report.fail(line_no, 'doctor has another appointment within 5 minutes')
+                continue
+            insort(times, secs)
+            accepted.append(item)
+
+        if accepted and not dry_run:
+            stmt = insert(Appointment).returning(Appointment.id, sort_by_parameter_order=True)
+            new_ids = db.session.execute(stmt, [
+                {'patient_id': item['patient_id'], 'doctor_id': item['doctor_id'],
+                 'date': item['date'], 'time': item['time'], 'status': item['status']}
+                for item in accepted
+            ]).scalars().all()
+            treatments = [dict(item['treatment'], appointment_id=appt_id)
+                          for appt_id, item in zip(new_ids, accepted) if item['treatment']]
+            if treatments:
+                db.session.execute(insert(Treatment), treatments)
+                bump_timelines(db.session.connection(),
+                               {item['patient_id'] for item in accepted if item['treatment']})
+            # core inserts bypass the ORM flush hook, so claim the slots here
+            claims = [row for appt_id, item in zip(new_ids, accepted) if is_active(item['status'])
+                      for row in claim_rows(appt_id, item['doctor_id'], item['date'], item['time'])]
+            if claims:
+                db.session.execute(insert(SlotClaim), claims)
+            db.session.commit()
+        report.imported += len(accepted)
+    return report
+
+
+def run_import(kind, path, batch_size=BATCH_SIZE, hash_method=None, dry_run=False, on_error=None):
+    if kind == 'doctors':
+        return import_accounts(Doctor, _parse_doctor, path, batch_size, hash_method, dry_run, on_error)
+    if kind == 'patients':
+        return import_accounts(Patient, _parse_patient, path, batch_size, hash_method, dry_run, on_error)
+    return import_appointments(path, batch_size, dry_run, on_error)
@@ -0,0 +1,321 @@
+from datetime import date, datetime, time as dtime
+import os
+import tempfile
+import time
+
+import click
+from flask import Blueprint, current_app
+
+from models import db, init_db, Appointment, DoctorAvailability, doctor_is_available
+from bulk_import import run_import, BATCH_SIZE
+from export import iter_rows, parse_export_filters, FORMATS
+from hashing import benchmark_logins
+from stats import recompute_counters
+from record_store import collect_garbage, recount_refs, adopt_legacy_records, move_uploads, LEGACY_UPLOAD_DIR
+from scheduling import conflict_query, doctor_has_conflict
+from directory import bump_directory_version
+from archive import archive_appointments, ARCHIVE_BATCH_SIZE
+from slot_table import rebuild_slots, extend_horizon, get_available_slots
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# `flask --app app <command>`; registered without a group, so the names stay top-level
+bp = Blueprint('commands', __name__, cli_group=None)
+
+
+@bp.cli.command('init-db')
+@click.option('--admin-username', default='admin')
+@click.option('--admin-password', default='admin123')
+def init_db_command(admin_username, admin_password):
+    """Create / upgrade the schema and the default admin; run once per deploy, before the workers start."""
+    init_db(current_app._get_current_object(), admin_username, admin_password)
+    # record files of older deploys still sit below static/, where anyone could fetch them
+    legacy_root = os.path.join(current_app.root_path, LEGACY_UPLOAD_DIR)
+    upload_root = current_app.config['UPLOAD_FOLDER']
+    if os.path.abspath(legacy_root) != os.path.abspath(upload_root):
+        moved = move_uploads(legacy_root, upload_root)
+        if moved:
+            print(f'Moved {moved} record files from {legacy_root} to {upload_root}.')
+    print('Database ready.')
+
+
+# Query plan check for the indexed hot paths
+def hot_path_queries():
+    sample_day = date.today()
+    sample_time = dtime(10, 0)
+    return {
+        'booking conflict check': conflict_query(1, sample_day, sample_time),
+        'slot lookup (booked times)': Appointment.query.filter_by(doctor_id=1, date=sample_day),
+        'doctor dashboard': Appointment.query.filter_by(doctor_id=1).order_by(Appointment.date.asc(),
+                                                                              Appointment.time.asc()),
+        'patient history': Appointment.query.filter_by(patient_id=1).order_by(Appointment.date.desc(),
+                                                                              Appointment.time.desc()),
+        'admin upcoming count': Appointment.query.filter(Appointment.date >= sample_day),
+        'admin recent appointments': Appointment.query.order_by(Appointment.date.desc(),
+                                                                Appointment.time.desc()).limit(50),
+        'weekday availability': DoctorAvailability.query.filter_by(doctor_id=1, day_of_week=0),
+        'admin change poll': Appointment.query.filter(Appointment.updated_at > datetime.combine(sample_day, sample_time))
+        .order_by(Appointment.updated_at),
+    }
+
+
+def explain_query_plan(query):
+    """
+    Returns the SQLite EXPLAIN QUERY PLAN detail lines for an ORM query.
+    """
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    params = tuple(str(compiled.params[name]) for name in compiled.positiontup)
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), params).all()
+    return [row[-1] for row in rows]
+
+
+@bp.cli.command('check-query-plans')
+def check_query_plans():
+    """Show that booking and dashboard queries use indexes (no full scans)."""
+    full_scans = 0
+    if db.engine.dialect.name != 'sqlite':
+        raise SystemExit('check-query-plans reads SQLite EXPLAIN QUERY PLAN output; use EXPLAIN on this server.')
+    for label, query in hot_path_queries().items():
+        plan = explain_query_plan(query)
+        print(f'{label}:')
+        for detail in plan:
+            print(f'    {detail}')
+            # "SCAN appointments" without an index means a full table scan
+            if detail.startswith('SCAN') and 'INDEX' not in detail:
+                full_scans += 1
+    if full_scans:
+        raise SystemExit(f'{full_scans} full table scan(s) found in hot path queries.')
+    print('All hot path queries use indexes.')
+
+
+@bp.cli.command('recompute-stats')
+def recompute_stats():
+    """Recount the admin dashboard counters from the tables and fix drift."""
+    report = recompute_counters()
+    for name, (stored, actual) in sorted(report.items()):
+        note = '' if stored == actual else f'  (was {stored})'
+        print(f'{name}: {actual}{note}')
+
+
+@bp.cli.command('materialize-slots')
+@click.option('--rebuild', is_flag=True, help='Recreate every row instead of only moving the horizon forward.')
+def materialize_slots(rebuild):
+    """Extend (or rebuild) the doctor_slots table for the booking horizon; suitable for cron."""
+    written = rebuild_slots() if rebuild else extend_horizon()
+    db.session.commit()
+    print(f'{written} slot rows written for the next {current_app.config["SLOT_HORIZON_DAYS"]} days.')
+
+
+@bp.cli.command('archive-appointments')
+@click.option('--older-than-days', default=None, type=int, help='Defaults to ARCHIVE_AFTER_DAYS.')
+@click.option('--batch-size', default=ARCHIVE_BATCH_SIZE, help='Appointments moved per transaction.')
+@click.option('--dry-run', is_flag=True, help='Only count what would be moved.')
+def archive_appointments_command(older_than_days, batch_size, dry_run):
+    """Move old Completed/Cancelled appointments and their treatments into the archive tables."""
+    if older_than_days is None:
+        older_than_days = current_app.config['ARCHIVE_AFTER_DAYS']
+    report = archive_appointments(older_than_days, batch_size, dry_run)
+    print(('[dry run] ' if dry_run else '') + report.summary())
+
+
+@bp.cli.command('bench-login')
+@click.option('--methods', default='pbkdf2:sha256:200000,pbkdf2:sha256:600000,scrypt:16384:8:1,scrypt:32768:8:1',
+              help='Comma separated werkzeug hash methods to compare.')
+@click.option('--logins', default=200, help='Password checks per method.')
+@click.option('--concurrency', default=8, help='Simultaneous login callers.')
+def bench_login(methods, logins, concurrency):
+    """Login (password check) throughput at different hashing costs."""
+    print(f'workers={current_app.config["PASSWORD_HASH_WORKERS"]} concurrency={concurrency} logins={logins}')
+    for method, per_second, avg_ms in benchmark_logins(methods.split(','), logins, concurrency):
+        print(f'{method:<28} {per_second:8.1f} logins/s  {avg_ms:8.2f} ms/login')
+
+
+@bp.cli.command('import-data')
+@click.argument('kind', type=click.Choice(['doctors', 'patients', 'appointments']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=BATCH_SIZE, help='Rows validated and inserted per batch.')
+@click.option('--hash-method', default=None,
+              help='Hash method for imported passwords (upgraded to the configured one at first login).')
+@click.option('--dry-run', is_flag=True, help='Validate only, insert nothing.')
+def import_data(kind, path, batch_size, hash_method, dry_run):
+    """Bulk import doctors, patients or appointments from CSV / JSONL."""
+    report = run_import(kind, path, batch_size, hash_method, dry_run,
+                        on_error=lambda msg: click.echo(msg, err=True))
+    if report.imported and not dry_run:
+        # bulk inserts bypass the ORM counter and slot hooks
+        recompute_counters()
+        if kind == 'doctors':
+            bump_directory_version()
+        if kind in ('doctors', 'appointments'):
+            rebuild_slots()
+            db.session.commit()
+    print(report.summary())
+
+
+@bp.cli.command('export-data')
+@click.option('--format', 'fmt', type=click.Choice(sorted(FORMATS)), default='csv')
+@click.option('--from', 'from_str', default='', help='First date (YYYY-MM-DD).')
+@click.option('--to', 'to_str', default='', help='Last date (YYYY-MM-DD).')
+@click.option('--status', 'status_values', multiple=True, help='Booked / Completed / Cancelled (repeatable).')
+@click.option('-o', '--output', type=click.File('w', encoding='utf-8'), default='-')
+def export_data(fmt, from_str, to_str, status_values, output):
+    """Stream appointments with treatment, patient and doctor as CSV / NDJSON."""
+    try:
+        from_date, to_date, statuses = parse_export_filters(from_str, to_str, status_values)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc))
+    serializer, _ = FORMATS[fmt]
+    for chunk in serializer(iter_rows(from_date, to_date, statuses)):
+        output.write(chunk)
+
+
+@bp.cli.command('gc-records')
+@click.option('--adopt-legacy', is_flag=True, help='Move pre-store upload files into the blob store first.')
+@click.option('--dry-run', is_flag=True, help='Only report what would be removed.')
+def gc_records(adopt_legacy, dry_run):
+    """Remove record blobs that no PatientRecord references any more."""
+    upload_root = current_app.config['UPLOAD_FOLDER']
+    if adopt_legacy and not dry_run:
+        adopted, saved = adopt_legacy_records(upload_root)
+        print(f'Adopted {adopted} legacy files ({saved} bytes deduplicated).')
+    fixed = recount_refs() if not dry_run else 0
+    removed, freed = collect_garbage(upload_root, dry_run=dry_run)
+    print(f'Reference counts corrected: {fixed}. Removed {removed} blobs/files, {freed} bytes freed.')
+
+
+@bp.cli.command('stress-bookings')
+@click.option('--threads', default=16, help='Patients booking at the same moment.')
+@click.option('--rounds', default=20, help='Contested slots.')
+@click.option('--without-claims', is_flag=True, help='Disable slot claims to show the race they prevent.')
+def stress_bookings_command(threads, rounds, without_claims):
+    """Book contested slots from parallel threads (scratch SQLite database) and check for double bookings."""
+    from tests.stress import stress_bookings
+    from tests.support import scratch_app
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        attempts, booked, clashes = stress_bookings(scratch_app(scratch_dir), threads, rounds,
+                                                    with_claims=not without_claims)
+    print(f'{attempts} booking attempts in {time.perf_counter() - started:.1f}s: '
+          f'{booked} booked, {clashes} double bookings')
+    if clashes:
+        raise SystemExit(1)
+
+
+@bp.cli.command('seed-data')
+@click.option('--departments', default=10)
+@click.option('--doctors', default=100)
+@click.option('--patients', default=2000)
+@click.option('--appointments', default=50000)
+@click.option('--years', default=2.0, help='History length; appointments run up to 30 days ahead.')
+@click.option('--records', default=1000, help='Patient records (sharing a few files).')
+@click.option('--password', default='loadtest', help='Password of every seeded doctor and patient.')
+@click.option('--prefix', default='seed', help='Username prefix, e.g. seed-doctor-0.')
+@click.option('--random-seed', default=42)
+def seed_data(departments, doctors, patients, appointments, years, records, password, prefix, random_seed):
+    """Fill the database with synthetic departments, doctors, patients and history."""
+    from seed import seed_database  # tooling modules load per command, not with the app
+    try:
+        report = seed_database(current_app.config['UPLOAD_FOLDER'], departments, doctors, patients, appointments,
+                               years, records, password, prefix, random_seed)
+    except ValueError as exc:
+        raise click.ClickException(str(exc))
+    print(report.summary())
+
+
+@bp.cli.command('load-test')
+@click.option('--duration', default=30.0, help='Seconds to run.')
+@click.option('--concurrency', default=8, help='Simultaneous virtual users.')
+@click.option('--url', default=None, help='Base URL of a running server (default: in-process test client).')
+@click.option('--prefix', default='seed', help='Username prefix used by seed-data.')
+@click.option('--password', default='loadtest')
+@click.option('--admin-user', default='admin')
+@click.option('--admin-password', default='admin123')
+@click.option('--output', '-o', default=None, help='Also write the JSON report to this file.')
+def load_test(duration, concurrency, url, prefix, password, admin_user, admin_password, output):
+    """Drive login, dashboards, date search and booking; report latency percentiles as JSON."""
+    from loadtest import run_load, write_report
+    try:
+        report = run_load(current_app._get_current_object(), duration, concurrency, url, prefix, password,
+                          (admin_user, admin_password))
+    except ValueError as exc:
+        raise click.ClickException(str(exc))
+    print(write_report(report, output))
+
+
+@bp.cli.command('bench-scheduling')
+@click.option('--rounds', default=200, help='Timed calls per case.')
+@click.option('--repeats', default=None, type=int,
+              help='Interleaved, separately calibrated blocks the rounds are split into; defaults to DEFAULT_REPEATS.')
+@click.option('--baseline', 'baseline_path', default=None, help='Baseline JSON file; defaults to BASELINE_FILE.')
+@click.option('--save-baseline', is_flag=True, help='Store this run as the new baseline.')
+@click.option('--tolerance', default=None, type=float,
+              help='Allowed slowdown vs. baseline (0.25 = 25%); defaults to DEFAULT_TOLERANCE.')
+@click.option('--ignore-environment', is_flag=True,
+              help='Compare even when the baseline was recorded on another machine or interpreter.')
+def bench_scheduling(rounds, repeats, baseline_path, save_baseline, tolerance, ignore_environment):
+    """Micro-benchmark the scheduling checks on in-memory datasets and compare with the baseline."""
+    from benchmarks import (
+        run_benchmarks, compare, environment_mismatch, load_baseline, save_baseline as save_baseline_file,
+        BASELINE_FILE, DEFAULT_REPEATS, DEFAULT_TOLERANCE
+    )
+    repeats = repeats or DEFAULT_REPEATS
+    baseline_path = baseline_path or os.path.join(ROOT_DIR, BASELINE_FILE)
+    tolerance = DEFAULT_TOLERANCE if tolerance is None else tolerance
+    baseline = None
+    if not save_baseline and os.path.exists(baseline_path):
+        baseline = load_baseline(baseline_path)
+        mismatch = environment_mismatch(baseline)
+        for key, saved, current in mismatch:
+            print(f'Environment differs from the baseline: {key} {saved!r} -> {current!r}')
+        if mismatch and not ignore_environment:
+            raise SystemExit('Not comparing against a baseline from another environment; '
+                             'record one here with --save-baseline (or pass --ignore-environment).')
+
+    results = run_benchmarks({
+        'get_available_slots': get_available_slots,
+        'doctor_has_conflict': doctor_has_conflict,
+        'doctor_is_available': doctor_is_available,
+    }, rounds, repeats)
+    if baseline is None:
+        for case, timing in results.items():
+            print(f'{case:<70} {timing["median_us"]:>10.1f} us (min {timing["min_us"]:.1f})')
+        if save_baseline:
+            save_baseline_file(baseline_path, results)
+            print(f'Baseline written to {baseline_path}')
+        else:
+            print('No baseline yet; run with --save-baseline to store one.')
+        return
+
+    regressions = 0
+    for case, before, now, ratio, regressed in compare(results, baseline, tolerance):
+        regressions += regressed
+        print(f'{case:<70} {before:>10.1f} -> {now:>10.1f} us  x{ratio:.2f}{"  REGRESSION" if regressed else ""}')
+    if regressions:
+        raise SystemExit(f'{regressions} case(s) slower than baseline by more than {tolerance:.0%}.')
+    print('No regressions against the baseline.')
+
+
+@bp.cli.command('bench-directory')
+@click.option('--doctors', default=1000, help='Doctors in the in-memory dataset.')
+@click.option('--rounds', default=50, help='Timed calls per variant.')
+def bench_directory(doctors, rounds):
+    """Compare time and peak allocations of the patient search listing with and without the directory cache."""
+    from benchmarks import run_directory_benchmark
+    results = run_directory_benchmark(doctors, rounds)
+    for case, timing in results.items():
+        print(f'{case:<16} {timing["median_us"]:>10.1f} us (min {timing["min_us"]:.1f})  '
+              f'{timing["peak_kib"]:>9.1f} KiB peak per call')
+
+
+@bp.cli.command('bench-startup')
+@click.option('--rounds', default=5, help='Fresh interpreters started.')
+@click.option('--max-ms', default=None, type=float, help='Fail when building the app takes longer (median).')
+def bench_startup(rounds, max_ms):
+    """Time import, create_app, schema bootstrap and a preforked worker's first request in fresh processes."""
+    from benchmarks import run_startup_benchmark
+    results = run_startup_benchmark(ROOT_DIR, rounds)
+    for phase, timing in results.items():
+        print(f'{phase:<28} {timing["median_ms"]:>9.1f} ms (min {timing["min_ms"]:.1f})')
+    if max_ms is not None and results['create_app']['median_ms'] > max_ms:
+        raise SystemExit(f'create_app took {results["create_app"]["median_ms"]:.1f} ms, budget {max_ms:.0f} ms.')
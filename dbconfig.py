@@ -0,0 +1,82 @@
+import os
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# every key can be set in the environment or in the HOSPITAL_SETTINGS file
+DEFAULTS = {
+    'DATABASE_URL': 'sqlite:///hospital.db',
+    # SQLite, applied to every new connection
+    'SQLITE_JOURNAL_MODE': 'WAL',          # readers no longer wait for writers
+    'SQLITE_BUSY_TIMEOUT_MS': 5000,        # wait for a lock instead of failing at once
+    'SQLITE_SYNCHRONOUS': 'NORMAL',        # safe with WAL, far fewer fsyncs than FULL
+    'SQLITE_CACHE_SIZE_KB': 20000,         # page cache per connection
+    # server databases (PostgreSQL, MySQL, ...)
+    'DB_POOL_SIZE': 10,
+    'DB_MAX_OVERFLOW': 20,
+    'DB_POOL_TIMEOUT': 30,
+    'DB_POOL_RECYCLE': 1800,
+}
+INT_KEYS = {key for key, value in DEFAULTS.items() if isinstance(value, int)}
+
+_pragmas = {}
+
+
+def _setting(app, key):
+    value = app.config.get(key, os.environ.get(key, DEFAULTS[key]))
+    return int(value) if key in INT_KEYS else value
+
+
+def database_uri(url):
+    # "postgres://" as handed out by many hosts is not accepted by SQLAlchemy
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def is_sqlite(uri):
+    return uri.startswith('sqlite')
+
+
+def sqlite_pragmas(app):
+    return [
+        ('journal_mode', _setting(app, 'SQLITE_JOURNAL_MODE')),
+        ('busy_timeout', _setting(app, 'SQLITE_BUSY_TIMEOUT_MS')),
+        ('synchronous', _setting(app, 'SQLITE_SYNCHRONOUS')),
+        # negative = size in KiB rather than pages
+        ('cache_size', -_setting(app, 'SQLITE_CACHE_SIZE_KB')),
+    ]
+
+
+def configure_database(app):
+    """
+    Fills SQLALCHEMY_DATABASE_URI and SQLALCHEMY_ENGINE_OPTIONS from the
+    settings above. Must run before db.init_app().
+    """
+    uri = database_uri(_setting(app, 'DATABASE_URL'))
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if is_sqlite(uri):
+        _pragmas.clear()
+        _pragmas.update(sqlite_pragmas(app))
+    else:
+        options.setdefault('pool_size', _setting(app, 'DB_POOL_SIZE'))
+        options.setdefault('max_overflow', _setting(app, 'DB_MAX_OVERFLOW'))
+        options.setdefault('pool_timeout', _setting(app, 'DB_POOL_TIMEOUT'))
+        options.setdefault('pool_recycle', _setting(app, 'DB_POOL_RECYCLE'))
+        # drop connections the server closed while idle instead of failing a request
+        options.setdefault('pool_pre_ping', True)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+@event.listens_for(Engine, 'connect')
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    if not _pragmas or not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in _pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
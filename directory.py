@@ -0,0 +1,99 @@
+import threading
+from collections import namedtuple
+
+from sqlalchemy import event, inspect, insert, select, update
+from sqlalchemy.orm import Session
+
+from models import db, Department, Doctor, StatCounter
+
+# shared by every worker process: bumped in the transaction that changes a doctor
+VERSION_COUNTER = 'doctor_directory_version'
+# columns shown in the patient search; other changes (password, contact) keep the snapshot
+LISTED_FIELDS = ('name', 'specialization', 'department_id')
+
+# read-only rows for the patient search: no ORM state, no password hash
+DoctorEntry = namedtuple('DoctorEntry', 'id name specialization department')
+
+
+class Directory:
+    __slots__ = ('version', 'doctors', 'specializations')
+
+    def __init__(self, version, doctors, specializations):
+        self.version = version
+        self.doctors = doctors                  # DoctorEntry tuple, newest doctor first
+        self.specializations = specializations  # sorted, distinct
+
+    def search(self, spec=''):
+        """
+        Doctors whose specialization contains `spec` (case-insensitive), like the ILIKE search.
+        """
+        if not spec:
+            return list(self.doctors)
+        needle = spec.lower()
+        return [d for d in self.doctors if needle in d.specialization.lower()]
+
+
+_cache = {'directory': None}
+_lock = threading.Lock()
+
+
+def directory_version(conn=None):
+    conn = conn if conn is not None else db.session.connection()
+    return conn.execute(select(StatCounter.value).where(StatCounter.name == VERSION_COUNTER)).scalar() or 0
+
+
+def bump_directory_version(conn=None):
+    """
+    Makes every process reload its snapshot. Call after core inserts/updates of doctors.
+    """
+    conn = conn if conn is not None else db.session.connection()
+    bumped = conn.execute(update(StatCounter).where(StatCounter.name == VERSION_COUNTER)
+                          .values(value=StatCounter.value + 1)).rowcount
+    if not bumped:
+        conn.execute(insert(StatCounter).values(name=VERSION_COUNTER, value=1))
+
+
+def _load(version):
+    rows = (db.session.query(Doctor.id, Doctor.name, Doctor.specialization, Department.name)
+            .outerjoin(Department, Department.id == Doctor.department_id)
+            .order_by(Doctor.id.desc())
+            .all())
+    doctors = tuple(DoctorEntry(*row) for row in rows)
+    specializations = tuple(sorted({d.specialization for d in doctors if d.specialization}))
+    return Directory(version, doctors, specializations)
+
+
+def get_directory():
+    """
+    The cached snapshot; one primary-key read checks it is still current.
+    """
+    version = directory_version()
+    current = _cache['directory']
+    if current is not None and current.version == version:
+        return current
+    with _lock:
+        current = _cache['directory']
+        if current is None or current.version != version:
+            current = _cache['directory'] = _load(version)
+    return current
+
+
+def _changes_listing(session):
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, (Doctor, Department)):
+            return True
+    for obj in session.dirty:
+        if isinstance(obj, Doctor):
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in LISTED_FIELDS):
+                return True
+        elif isinstance(obj, Department) and inspect(obj).attrs.name.history.has_changes():
+            return True
+    return False
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_on_doctor_change(session, flush_context):
+    # admin add/edit/delete doctor (and department renames) invalidate every process's snapshot
+    if _changes_listing(session):
+        bump_directory_version(session.connection())
@@ -0,0 +1,108 @@
+from datetime import date, time as dtime
+
+from flask import Blueprint, current_app, request, render_template, redirect, url_for, flash, session
+from sqlalchemy.orm import joinedload
+
+from models import db, Patient, Doctor, Appointment, Treatment, PatientRecord
+from pagination import keyset_paginate, page_size, APPOINTMENT_KEYSET
+from previews import has_preview
+from timeline import get_timeline
+
+bp = Blueprint('doctor', __name__, url_prefix='/doctor')
+
+
+# Doctor dashboard and login
+@bp.route('/dashboard', methods=['GET', 'POST'])
+def dashboard():
+    if request.method == 'POST':
+        login_user = request.form.get('username', '').strip()
+        login_pass = request.form.get('password', '')
+
+        doc_obj = Doctor.query.filter_by(username=login_user).first()
+        if not doc_obj or not doc_obj.check_password(login_pass):
+            flash('Invalid doctor credentials.', 'danger')
+            return render_template('doc_login.html'), 401
+
+        db.session.commit()  # persists a transparent rehash, if any
+        session['doctor_id'] = doc_obj.id
+        flash(f'Welcome Dr. {doc_obj.name}!', 'success')
+        return redirect(url_for('doctor.dashboard'))
+
+    if 'doctor_id' not in session:
+        flash('Please login as doctor to access the doctor dashboard.', 'warning')
+        return redirect(url_for('main.login', role='doctor'))
+
+    current_doctor = Doctor.query.get_or_404(session['doctor_id'])
+    # paginated from today onwards; "previous" walks back into history
+    my_appts = keyset_paginate(
+        Appointment.query.filter_by(doctor_id=current_doctor.id)
+        .options(joinedload(Appointment.patient), joinedload(Appointment.treatment)),
+        APPOINTMENT_KEYSET,
+        request.args.get('cursor'),
+        page_size(request.args.get('size')),
+        start=(date.today(), dtime(0, 0), 0)
+    )
+    return render_template('doctor_dashboard.html', doctor=current_doctor, appointments=my_appts)
+
+
+# Doctor completes appointment and saves treatment
+@bp.route('/appointment/complete/<int:appt_id>', methods=['POST'])
+def complete_appointment(appt_id):
+    if 'doctor_id' not in session:
+        flash('Unauthorized', 'danger')
+        return redirect(url_for('main.login', role='doctor'))
+
+    active_appt = Appointment.query.get_or_404(appt_id)
+    if active_appt.doctor_id != session['doctor_id']:
+        flash('You are not allowed to modify this appointment.', 'danger')
+        return redirect(url_for('doctor.dashboard'))
+
+    diag_text = request.form.get('diagnosis', '').strip()
+    rx_text = request.form.get('prescription', '').strip()
+    note_text = request.form.get('notes', '').strip()
+
+    try:
+        if active_appt.treatment:
+            existing_t = active_appt.treatment
+            existing_t.diagnosis = diag_text or existing_t.diagnosis
+            existing_t.prescription = rx_text or existing_t.prescription
+            existing_t.notes = note_text or existing_t.notes
+        else:
+            new_t = Treatment(appointment_id=active_appt.id, diagnosis=diag_text, prescription=rx_text, notes=note_text)
+            db.session.add(new_t)
+
+        active_appt.status = 'Completed'
+        db.session.commit()
+        flash('Appointment marked completed and treatment saved.', 'success')
+    except Exception:
+        db.session.rollback()
+        flash('Failed to save treatment. Try again.', 'danger')
+
+    return redirect(url_for('doctor.dashboard'))
+
+
+#  view patient history (treatments)
+@bp.route('/patient/<int:patient_id>/history', methods=['GET'])
+def view_patient_history(patient_id):
+    if 'doctor_id' not in session:
+        flash('Please login as doctor to view patient history.', 'warning')
+        return redirect(url_for('main.login', role='doctor'))
+
+    target_pat = Patient.query.get_or_404(patient_id)
+    # hot and archived treatments, newest first; kept current by the save in doctor_complete_appointment
+    history_list = get_timeline(patient_id)
+    return render_template('patient_history.html', patient=target_pat, treatments=history_list)
+
+
+# view patient records medical uploaded files
+@bp.route('/patient/<int:patient_id>/records', methods=['GET'])
+def view_patient_records(patient_id):
+    if 'doctor_id' not in session:
+        flash('Please login as doctor to view patient records.', 'warning')
+        return redirect(url_for('main.login', role='doctor'))
+
+    p_record = Patient.query.get_or_404(patient_id)
+    file_list = p_record.records.order_by(PatientRecord.uploaded_at.desc()).all()
+    upload_root = current_app.config['UPLOAD_FOLDER']
+    previews = {r.id for r in file_list if has_preview(upload_root, r.filename)}
+    return render_template('patient_records.html', patient=p_record, records=file_list, previews=previews)
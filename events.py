@@ -0,0 +1,283 @@
+import json
+import queue
+import threading
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, joinedload
+
+from models import Appointment, Doctor, Patient
+
+ADMIN_CHANNEL = 'admin'
+# a comment line this often keeps proxies from closing an idle stream
+KEEPALIVE_SECONDS = 15
+# how long the browser waits before reconnecting a dropped stream
+RETRY_MS = 3000
+# events buffered per connected client; a client that falls behind is told to reload
+QUEUE_SIZE = 100
+RESYNC = {'type': 'resync'}
+PENDING_KEY = 'appointment_events'
+# pages that get no stream poll for changes this often (see changes_since)
+POLL_SECONDS = 15
+# changes one poll returns at most; beyond that the page reloads instead
+POLL_LIMIT = 200
+# polls look this far behind the previous one, for rows written but not yet committed back then
+POLL_OVERLAP_SECONDS = 5
+
+
+def doctor_channel(doctor_id):
+    return f'doctor:{doctor_id}'
+
+
+class Subscription:
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = channels
+        self.queue = queue.Queue(QUEUE_SIZE)
+
+    def push(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            # drop the backlog; the page reloads once instead of replaying it
+            with self.queue.mutex:
+                self.queue.queue.clear()
+            self.queue.put_nowait(RESYNC)
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """
+    In-process fan-out. Only reaches clients connected to the same process;
+    use RedisBroker when running several workers.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels):
+        sub = Subscription(self, channels)
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            for channel in sub.channels:
+                subs = self._subscribers.get(channel)
+                if subs:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._subscribers[channel]
+
+    def publish(self, channel, message):
+        with self._lock:
+            subs = list(self._subscribers.get(channel, ()))
+        for sub in subs:
+            sub.push(message)
+
+
+class RedisSubscription:
+    def __init__(self, pubsub, channels):
+        self.pubsub = pubsub
+        self.pubsub.subscribe(*channels)
+
+    def get(self, timeout):
+        message = self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        return json.loads(message['data']) if message else None
+
+    def close(self):
+        self.pubsub.close()
+
+
+class RedisBroker:
+    """
+    Redis pub/sub, so events reach clients of every worker process.
+    """
+
+    def __init__(self, url, prefix='hms:'):
+        import redis  # optional dependency, only needed for this broker
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def subscribe(self, channels):
+        return RedisSubscription(self.client.pubsub(), [self.prefix + c for c in channels])
+
+    def publish(self, channel, message):
+        self.client.publish(self.prefix + channel, json.dumps(message))
+
+
+_state = {'broker': LocalBroker()}
+# open streams of this process; each one occupies a worker thread for as long as the page is open
+_streams = {'open': 0, 'max': 8}
+_streams_lock = threading.Lock()
+
+
+def get_broker():
+    return _state['broker']
+
+
+def set_broker(broker):
+    _state['broker'] = broker
+
+
+def init_events(app):
+    """
+    EVENT_BROKER_URL = '' (in-process) or 'redis://host:6379/0'.
+    SSE_MAX_CONNECTIONS: streams per process, 0 = every page polls.
+    """
+    _streams['max'] = int(app.config.get('SSE_MAX_CONNECTIONS', 8))
+    url = app.config.get('EVENT_BROKER_URL', '')
+    if url.startswith(('redis://', 'rediss://')):
+        set_broker(RedisBroker(url))
+
+
+def _value(appt, name):
+    # the value before this flush, for changed attributes
+    history = inspect(appt).attrs[name].history
+    return history.deleted[0] if history.deleted else getattr(appt, name)
+
+
+def _name(session, model, pk):
+    # new rows have no relationship loaded yet during the flush
+    obj = session.get(model, pk) if pk else None
+    return obj.name if obj else None
+
+
+def _message(session, kind, appt):
+    return {
+        'type': kind,
+        'id': appt.id,
+        'doctor_id': appt.doctor_id,
+        'previous_doctor_id': _value(appt, 'doctor_id'),
+        'patient_id': appt.patient_id,
+        'patient_name': _name(session, Patient, appt.patient_id),
+        'doctor_name': _name(session, Doctor, appt.doctor_id),
+        'date': appt.date.isoformat() if appt.date else None,
+        'time': appt.time.strftime('%H:%M') if appt.time else None,
+        'status': appt.status,
+    }
+
+
+def _change_kind(appt):
+    state = inspect(appt)
+    status = state.attrs.status.history
+    if status.has_changes() and appt.status in ('Cancelled', 'Completed'):
+        return appt.status.lower()
+    if any(state.attrs[name].history.has_changes() for name in ('doctor_id', 'date', 'time')):
+        return 'rescheduled'
+    if status.has_changes() or state.attrs.patient_id.history.has_changes():
+        return 'updated'
+    return None
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_appointment_events(session, flush_context):
+    # collected per flush, published only once the transaction commits
+    pending = session.info.setdefault(PENDING_KEY, [])
+    for obj in session.new:
+        if isinstance(obj, Appointment):
+            pending.append(_message(session, 'created', obj))
+    for obj in session.dirty:
+        if isinstance(obj, Appointment):
+            kind = _change_kind(obj)
+            if kind:
+                pending.append(_message(session, kind, obj))
+    for obj in session.deleted:
+        if isinstance(obj, Appointment):
+            pending.append({'type': 'deleted', 'id': obj.id, 'doctor_id': obj.doctor_id,
+                            'previous_doctor_id': obj.doctor_id})
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_appointment_events(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+    broker = get_broker()
+    for message in pending:
+        broker.publish(ADMIN_CHANNEL, message)
+        for doctor_id in {message['doctor_id'], message['previous_doctor_id']}:
+            broker.publish(doctor_channel(doctor_id), message)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_appointment_events(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+def open_stream():
+    """
+    Counts one more stream in; False when this process already serves
+    SSE_MAX_CONNECTIONS of them. Every True needs a close_stream().
+    """
+    with _streams_lock:
+        if _streams['open'] >= _streams['max']:
+            return False
+        _streams['open'] += 1
+        return True
+
+
+def close_stream():
+    with _streams_lock:
+        _streams['open'] -= 1
+
+
+def stream_stats():
+    with _streams_lock:
+        return dict(_streams)
+
+
+def changes_since(since, doctor_id=None):
+    """
+    Appointment messages (same shape as the streamed ones) for rows created
+    or changed after `since`, of one doctor or all. None when there are more
+    than POLL_LIMIT; deletions are not seen, the next reload drops those rows.
+    """
+    query = (Appointment.query.options(joinedload(Appointment.patient), joinedload(Appointment.doctor))
+             .filter(Appointment.updated_at > since))
+    if doctor_id is not None:
+        query = query.filter(Appointment.doctor_id == doctor_id)
+    rows = query.order_by(Appointment.updated_at).limit(POLL_LIMIT + 1).all()
+    if len(rows) > POLL_LIMIT:
+        return None
+    return [{
+        'type': 'updated',
+        'id': appt.id,
+        'doctor_id': appt.doctor_id,
+        'previous_doctor_id': appt.doctor_id,
+        'patient_id': appt.patient_id,
+        'patient_name': appt.patient.name if appt.patient else None,
+        'doctor_name': appt.doctor.name if appt.doctor else None,
+        'date': appt.date.isoformat() if appt.date else None,
+        'time': appt.time.strftime('%H:%M') if appt.time else None,
+        'status': appt.status,
+    } for appt in rows]
+
+
+def stream(subscription):
+    """
+    text/event-stream body for one client; closes the subscription when the
+    client goes away.
+    """
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        while True:
+            message = subscription.get(KEEPALIVE_SECONDS)
+            if message is None:
+                yield ': keepalive\n\n'
+            elif message['type'] == 'resync':
+                yield 'event: resync\ndata: {}\n\n'
+            else:
+                yield f'event: appointment\ndata: {json.dumps(message)}\n\n'
+    finally:
+        subscription.close()
@@ -0,0 +1,129 @@
+import csv
+import heapq
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import select
+
+from models import db, Appointment, Treatment, Patient, Doctor, ArchivedAppointment, ArchivedTreatment
+
+# rows fetched from the cursor at a time; memory stays flat for any table size
+YIELD_PER = 1000
+
+# (name, attribute of the appointment / treatment / patient / doctor row)
+EXPORT_COLUMNS = (
+    ('appointment_id', 'appointment', 'id'),
+    ('date', 'appointment', 'date'),
+    ('time', 'appointment', 'time'),
+    ('status', 'appointment', 'status'),
+    ('patient_id', 'patient', 'id'),
+    ('patient_name', 'patient', 'name'),
+    ('doctor_id', 'doctor', 'id'),
+    ('doctor_name', 'doctor', 'name'),
+    ('specialization', 'doctor', 'specialization'),
+    ('diagnosis', 'treatment', 'diagnosis'),
+    ('prescription', 'treatment', 'prescription'),
+    ('notes', 'treatment', 'notes'),
+    ('created_at', 'appointment', 'created_at'),
+    ('updated_at', 'appointment', 'updated_at'),
+)
+FIELD_NAMES = [name for name, _, _ in EXPORT_COLUMNS]
+
+
+def _select(appointment, treatment, from_date, to_date, statuses):
+    tables = {'appointment': appointment, 'treatment': treatment, 'patient': Patient, 'doctor': Doctor}
+    stmt = (select(*[getattr(tables[table], attr).label(name) for name, table, attr in EXPORT_COLUMNS])
+            .select_from(appointment)
+            .join(Patient, Patient.id == appointment.patient_id)
+            .join(Doctor, Doctor.id == appointment.doctor_id)
+            .outerjoin(treatment, treatment.appointment_id == appointment.id))
+    if from_date:
+        stmt = stmt.where(appointment.date >= from_date)
+    if to_date:
+        stmt = stmt.where(appointment.date <= to_date)
+    if statuses:
+        stmt = stmt.where(appointment.status.in_(statuses))
+    return stmt
+
+
+def export_statement(from_date=None, to_date=None, statuses=None, archived=False):
+    if archived:
+        stmt = _select(ArchivedAppointment, ArchivedTreatment, from_date, to_date, statuses)
+        return stmt.order_by(ArchivedAppointment.date, ArchivedAppointment.time, ArchivedAppointment.id)
+    stmt = _select(Appointment, Treatment, from_date, to_date, statuses)
+    return stmt.order_by(Appointment.date, Appointment.time, Appointment.id)
+
+
+def _sort_key(row):
+    return row['date'], row['time'], row['appointment_id']
+
+
+def iter_rows(from_date=None, to_date=None, statuses=None):
+    """
+    Streams export rows as dicts using server-side cursors; hot and archived
+    appointments (archive.py) are merged in date order as they stream.
+    """
+    streams = []
+    for archived in (False, True):
+        stmt = export_statement(from_date, to_date, statuses, archived).execution_options(yield_per=YIELD_PER)
+        streams.append(dict(zip(FIELD_NAMES, row)) for row in db.session.execute(stmt))
+    yield from heapq.merge(*streams, key=_sort_key)
+
+
+def _plain(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(rows):
+    """
+    CSV text in chunks of YIELD_PER rows.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELD_NAMES)
+    pending = 0
+    for row in rows:
+        writer.writerow([_plain(row[name]) for name in FIELD_NAMES])
+        pending += 1
+        if pending >= YIELD_PER:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def iter_ndjson(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps({name: _plain(value) if value is not None else None
+                                 for name, value in row.items()}))
+        if len(chunk) >= YIELD_PER:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+
+FORMATS = {
+    'csv': (iter_csv, 'text/csv'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+}
+
+
+def parse_export_filters(from_str, to_str, status_values):
+    """
+    Returns (from_date, to_date, statuses); raises ValueError on bad input.
+    """
+    from_date = datetime.strptime(from_str, '%Y-%m-%d').date() if from_str else None
+    to_date = datetime.strptime(to_str, '%Y-%m-%d').date() if to_str else None
+    statuses = [s.strip() for value in status_values for s in value.split(',') if s.strip()]
+    for status in statuses:
+        if status not in ('Booked', 'Completed', 'Cancelled'):
+            raise ValueError(f'Invalid status: {status}')
+    return from_date, to_date, statuses
@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import (
+    generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+)
+
+# werkzeug method string, e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+DEFAULT_WORKERS = max(1, min(4, os.cpu_count() or 1))
+# callers waiting for a hash beyond workers * this factor block (back-pressure)
+QUEUE_FACTOR = 4
+
+_settings = {'method': DEFAULT_METHOD, 'workers': DEFAULT_WORKERS}
+_pool_state = {'pool': None, 'pid': None, 'slots': None}
+_pool_lock = threading.Lock()
+
+
+def normalize_method(method):
+    """
+    Expands shorthand methods to the full string werkzeug stores in hashes.
+    """
+    name, *args = method.split(':')
+    if name == 'scrypt' and not args:
+        return 'scrypt:32768:8:1'
+    if name == 'pbkdf2':
+        if not args:
+            return f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}'
+        if len(args) == 1:
+            return f'pbkdf2:{args[0]}:{DEFAULT_PBKDF2_ITERATIONS}'
+    return method
+
+
+def configure(method=None, workers=None):
+    with _pool_lock:
+        if method:
+            _settings['method'] = normalize_method(method)
+        if workers:
+            _settings['workers'] = int(workers)
+        _shutdown_locked()
+
+
+def init_hashing(app):
+    """
+    Reads PASSWORD_HASH_METHOD and PASSWORD_HASH_WORKERS from the app config.
+    """
+    configure(app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+              app.config.get('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS))
+
+
+def _shutdown_locked():
+    pool = _pool_state['pool']
+    if pool is not None and _pool_state['pid'] == os.getpid():
+        pool.shutdown(wait=False)
+    _pool_state.update(pool=None, pid=None, slots=None)
+
+
+def _get_pool():
+    # created lazily and per process, so forked workers never share threads
+    with _pool_lock:
+        if _pool_state['pool'] is None or _pool_state['pid'] != os.getpid():
+            workers = _settings['workers']
+            _pool_state.update(
+                pool=ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pwhash'),
+                pid=os.getpid(),
+                slots=threading.BoundedSemaphore(workers * QUEUE_FACTOR),
+            )
+        return _pool_state['pool'], _pool_state['slots']
+
+
+def _run(fn, *args):
+    pool, slots = _get_pool()
+    slots.acquire()
+    try:
+        return pool.submit(fn, *args).result()
+    finally:
+        slots.release()
+
+
+def hash_password(password, method=None):
+    return _run(generate_password_hash, password, method or _settings['method'])
+
+
+def hash_many(passwords, method=None):
+    """
+    Hashes a batch of passwords in parallel on the pool (bulk imports).
+    """
+    pool, _ = _get_pool()
+    method = normalize_method(method) if method else _settings['method']
+    return list(pool.map(lambda pw: generate_password_hash(pw, method), passwords))
+
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """
+    True when a stored hash was made with other parameters than configured.
+    """
+    stored_method = (password_hash or '').split('$', 1)[0]
+    return stored_method != _settings['method']
+
+
+def check_and_upgrade(user, password):
+    """
+    Verifies a password; on success with outdated parameters the user gets
+    a fresh hash (the caller commits).
+    """
+    if not user.password_hash or not verify_password(user.password_hash, password):
+        return False
+    if needs_rehash(user.password_hash):
+        user.password_hash = hash_password(password)
+    return True
+
+
+def benchmark_logins(methods, logins=200, concurrency=8, password='s3cret-passw0rd'):
+    """
+    Verifies `logins` passwords from `concurrency` caller threads per method.
+    Returns [(method, logins_per_second, avg_ms)].
+    """
+    results = []
+    for method in methods:
+        method = normalize_method(method)
+        stored = generate_password_hash(password, method)
+        per_caller = max(1, logins // concurrency)
+
+        def caller():
+            for _ in range(per_caller):
+                verify_password(stored, password)
+
+        threads = [threading.Thread(target=caller) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        elapsed = time.perf_counter() - started
+        total = per_caller * concurrency
+        results.append((method, total / elapsed, elapsed * 1000 / total))
+    return results
@@ -0,0 +1,228 @@
+import http.cookiejar
+import json
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, datetime, timedelta
+
+from models import db, Doctor, Patient
+
+# share of virtual users per role
+ROLE_WEIGHTS = (('patient', 70), ('doctor', 20), ('admin', 10))
+# lazy patient dashboard sections besides the search results
+PATIENT_FRAGMENTS = ('upcoming', 'history', 'records', 'treatments')
+# requests a virtual user makes before logging in again
+REQUESTS_PER_LOGIN = 10
+BOOKING_TIMES = [f'{h:02d}:{m:02d}' for h in range(8, 20) for m in (0, 30)]
+
+
+class TestClientSession:
+    """
+    Drives the app in-process through Flask's test client.
+    """
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        resp = self.client.open(path, method=method, data=data)
+        return resp.status_code
+
+
+class HttpSession:
+    """
+    Drives a running server over HTTP, keeping the session cookie.
+    """
+
+    class _NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), self._NoRedirect)
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(req) as resp:
+                resp.read()
+                return resp.status
+        except urllib.error.HTTPError as exc:
+            # redirects (login, booking) arrive here as well
+            return exc.code
+
+
+class RouteStats:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def record(self, route, elapsed, status):
+        with self.lock:
+            self.samples.setdefault(route, []).append(elapsed)
+            if status >= 400:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+
+def percentile(sorted_values, pct):
+    # nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples, errors, elapsed):
+    values = sorted(samples)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'rps': round(len(values) / elapsed, 2),
+        'mean_ms': round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 2),
+        'p95_ms': round(percentile(values, 95) * 1000, 2),
+        'p99_ms': round(percentile(values, 99) * 1000, 2),
+        'max_ms': round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+def _current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class VirtualUser:
+    def __init__(self, role, session, credentials, doctor_ids, specializations, stats, rng):
+        self.role = role
+        self.session = session
+        self.username, self.password = credentials
+        self.doctor_ids = doctor_ids
+        self.specializations = specializations
+        self.stats = stats
+        self.rng = rng
+
+    def call(self, route, method, path, data=None):
+        started = time.perf_counter()
+        status = self.session.request(method, path, data)
+        self.stats.record(route, time.perf_counter() - started, status)
+        return status
+
+    def login(self):
+        self.call(f'{self.role} login', 'POST', f'/{self.role}/dashboard',
+                  {'username': self.username, 'password': self.password})
+
+    def step(self):
+        if self.role == 'admin':
+            self.call('admin dashboard', 'GET', '/admin/dashboard')
+        elif self.role == 'doctor':
+            self.call('doctor dashboard', 'GET', '/doctor/dashboard')
+        else:
+            day = date.today() + timedelta(days=self.rng.randint(1, 30))
+            query = urllib.parse.urlencode({'spec': self.rng.choice(self.specializations), 'date': day.isoformat()})
+            # what the browser fetches: the page shell, then its lazy sections (static/js/fragments.js)
+            self.call('patient dashboard', 'GET', f'/patient/dashboard?{query}')
+            self.call('patient dashboard search', 'GET', f'/patient/dashboard/search?{query}')
+            for section in PATIENT_FRAGMENTS:
+                self.call(f'patient dashboard {section}', 'GET', f'/patient/dashboard/{section}')
+            self.call('patient booking', 'POST', '/patient/appointment/book', {
+                'doctor_id': self.rng.choice(self.doctor_ids), 'date': day.isoformat(),
+                'time': self.rng.choice(BOOKING_TIMES),
+            })
+
+    def run(self, deadline):
+        done = 0
+        while time.perf_counter() < deadline:
+            if done % REQUESTS_PER_LOGIN == 0:
+                self.login()
+            self.step()
+            done += 1
+
+
+def _role_for(index, concurrency):
+    # spreads roles by ROLE_WEIGHTS deterministically, so runs stay comparable
+    position = (index + 0.5) / concurrency * sum(weight for _, weight in ROLE_WEIGHTS)
+    for role, weight in ROLE_WEIGHTS:
+        if position < weight:
+            return role
+        position -= weight
+    return ROLE_WEIGHTS[-1][0]
+
+
+def _accounts(model, prefix):
+    return [u for (u,) in db.session.query(model.username).filter(model.username.like(f'{prefix}-%'))
+            .order_by(model.id).limit(1000)]
+
+
+def run_load(app, duration=30, concurrency=8, base_url=None, prefix='seed', password='loadtest',
+             admin=('admin', 'admin123'), random_seed=1):
+    """
+    Runs `concurrency` virtual users (patients, doctors, admins) against the
+    real routes for `duration` seconds. Returns a JSON-serialisable report with
+    per-route p50/p95/p99 latency and throughput.
+    """
+    with app.app_context():
+        doctors = _accounts(Doctor, f'{prefix}-doctor')
+        patients = _accounts(Patient, f'{prefix}-patient')
+        doctor_ids = [i for (i,) in db.session.query(Doctor.id).filter(Doctor.username.in_(doctors))]
+        specializations = sorted({s for (s,) in db.session.query(Doctor.specialization)
+                                  .filter(Doctor.id.in_(doctor_ids))})
+    if not (doctors and patients):
+        raise ValueError(f'No seeded accounts with prefix "{prefix}"; run seed-data first.')
+
+    rng = random.Random(random_seed)
+    roles = [role for role, _ in ROLE_WEIGHTS]
+    stats = RouteStats()
+    users = []
+    for n in range(concurrency):
+        role = _role_for(n, concurrency)
+        if role == 'admin':
+            credentials = admin
+        else:
+            credentials = (rng.choice(doctors if role == 'doctor' else patients), password)
+        session = HttpSession(base_url) if base_url else TestClientSession(app)
+        users.append(VirtualUser(role, session, credentials, doctor_ids, specializations, stats,
+                                 random.Random(rng.random())))
+
+    started = time.perf_counter()
+    deadline = started + duration
+    threads = [threading.Thread(target=user.run, args=(deadline,)) for user in users]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    elapsed = time.perf_counter() - started
+
+    all_samples = [v for values in stats.samples.values() for v in values]
+    return {
+        'meta': {
+            'commit': _current_commit(),
+            'started_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'target': base_url or 'test-client',
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split('@')[-1],
+            'concurrency': concurrency,
+            'duration_s': round(elapsed, 2),
+            'users': {role: sum(1 for u in users if u.role == role) for role in roles},
+        },
+        'routes': {route: summarize(values, stats.errors.get(route, 0), elapsed)
+                   for route, values in sorted(stats.samples.items())},
+        'total': summarize(all_samples, sum(stats.errors.values()), elapsed),
+    }
+
+
+def write_report(report, path=None):
+    text = json.dumps(report, indent=2)
+    if path:
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write(text + '\n')
+    return text
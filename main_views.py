@@ -0,0 +1,297 @@
+from datetime import date, datetime, timedelta
+import hashlib
+import mimetypes
+import os
+import posixpath
+from urllib.parse import quote, unquote
+
+from flask import (
+    Blueprint, current_app, request, render_template, redirect, url_for,
+    flash, session, abort, jsonify, Response, send_file
+)
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+from models import db, Patient, Doctor, Appointment, DoctorAvailability, PatientRecord
+from previews import queue_preview, has_preview, preview_relpath
+from events import (
+    get_broker, doctor_channel, open_stream, close_stream, changes_since, ADMIN_CHANNEL, POLL_SECONDS,
+    POLL_OVERLAP_SECONDS, stream as event_stream
+)
+from slot_table import available_slots_range
+
+SLOTS_API_MAX_DAYS = 31
+
+# home, login/registration, record downloads, live events and the JSON API
+bp = Blueprint('main', __name__)
+
+
+@bp.route('/')
+def home():
+    return render_template('login.html')
+#home page
+
+# Render login pages
+@bp.route('/auth/login', methods=['GET'])
+def login():
+    target_role = request.args.get('role', 'patient')
+    if target_role == 'doctor':
+        return render_template('doc_login.html')
+    elif target_role == 'admin':
+        return render_template('admin_login.html')
+    else:
+        return render_template('patient_login.html')
+#login page
+
+# Patient registration
+@bp.route('/auth/register', methods=['GET', 'POST'])
+def register():
+    if request.method == 'GET':
+        return render_template('patient_register.html')
+
+    # POST: registeration of patient
+    form_data = request.form
+    p_name = form_data.get('name', '').strip()
+    p_age = form_data.get('age')
+    p_gender = form_data.get('gender')
+    p_contact = form_data.get('contact', '').strip()
+    p_username = form_data.get('username', '').strip()
+    p_pass = form_data.get('password', '')
+
+    valid_req = p_name and p_username and p_pass
+
+    if not valid_req:
+        flash('Name, username and password are required.', 'danger')
+        return render_template('patient_register.html'), 400
+
+    try:
+        new_patient = Patient(
+            name=p_name,
+            age=int(p_age) if p_age else None,
+            gender=p_gender,
+            contact=p_contact,
+            username=p_username
+        )
+        new_patient.set_password(p_pass)
+        db.session.add(new_patient)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        flash('Username already taken — choose another username.', 'warning')
+        return render_template('patient_register.html'), 409
+    # unique username
+    except Exception:
+        db.session.rollback()
+        flash('An unexpected error occurred. Try again.', 'danger')
+        return render_template('patient_register.html'), 500
+
+    flash('Registration successful. Please login.', 'success')
+    return redirect(url_for('main.login', role='patient'))
+
+
+# JSON API: free slots of a doctor across a date range
+@bp.route('/api/doctors/<int:doc_id>/slots', methods=['GET'])
+def api_doctor_slots(doc_id):
+    if not ('patient_id' in session or 'doctor_id' in session or 'admin_id' in session):
+        return jsonify(error='Login required.'), 401
+
+    try:
+        from_str = request.args.get('from', '').strip()
+        to_str = request.args.get('to', '').strip()
+        from_date = datetime.strptime(from_str, '%Y-%m-%d').date() if from_str else date.today()
+        to_date = datetime.strptime(to_str, '%Y-%m-%d').date() if to_str else from_date + timedelta(days=6)
+    except ValueError:
+        return jsonify(error='Invalid date format. Use YYYY-MM-DD.'), 400
+
+    if to_date < from_date:
+        return jsonify(error='"to" must not be before "from".'), 400
+    if (to_date - from_date).days >= SLOTS_API_MAX_DAYS:
+        return jsonify(error=f'Date range is limited to {SLOTS_API_MAX_DAYS} days.'), 400
+
+    if not db.session.get(Doctor, doc_id):
+        return jsonify(error='Doctor not found.'), 404
+
+    # ETag from the doctor's latest appointment change (count catches deletes)
+    last_change, appt_total = (Appointment.query
+                               .with_entities(func.max(Appointment.updated_at), func.count(Appointment.id))
+                               .filter(Appointment.doctor_id == doc_id)
+                               .one())
+    avail_state = (DoctorAvailability.query
+                   .with_entities(func.max(DoctorAvailability.id), func.count(DoctorAvailability.id))
+                   .filter(DoctorAvailability.doctor_id == doc_id)
+                   .one())
+    etag_src = f'{doc_id}|{from_date}|{to_date}|{last_change}|{appt_total}|{avail_state[0]}|{avail_state[1]}'
+    etag = hashlib.sha1(etag_src.encode()).hexdigest()
+
+    if request.if_none_match.contains(etag):
+        not_modified = current_app.response_class(status=304)
+        not_modified.set_etag(etag)
+        not_modified.headers['Cache-Control'] = 'private, no-cache'
+        return not_modified
+
+    by_day = available_slots_range(doc_id, from_date, to_date)
+    resp = jsonify({
+        'doctor_id': doc_id,
+        'from': from_date.isoformat(),
+        'to': to_date.isoformat(),
+        'slot_minutes': 30,
+        'slots': {day.isoformat(): [s.strftime('%H:%M') for s in found] for day, found in by_day.items()},
+    })
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+
+# Record downloads (access checked, Range / conditional requests, sendfile offload)
+@bp.before_app_request
+def block_direct_upload_access():
+    # UPLOAD_FOLDER is outside static/ now; files of older deploys stay hidden until init-db moved them.
+    # Normalized first, so /static/js/../uploads/... and %2F tricks land on the same path.
+    if request.endpoint == 'static':
+        filename = posixpath.normpath(unquote((request.view_args or {}).get('filename', '')))
+        if filename == 'uploads' or filename.startswith('uploads/'):
+            abort(404)
+
+
+def can_access_record(rec):
+    if 'admin_id' in session or 'doctor_id' in session:
+        return True
+    return session.get('patient_id') == rec.patient_id
+
+
+@bp.route('/records/<int:record_id>/download', methods=['GET'])
+def download_record(record_id):
+    if not ('patient_id' in session or 'doctor_id' in session or 'admin_id' in session):
+        flash('Please login to view records.', 'warning')
+        return redirect(url_for('main.login', role='patient'))
+
+    rec = PatientRecord.query.get_or_404(record_id)
+    if not can_access_record(rec):
+        abort(403)
+
+    upload_root = current_app.config['UPLOAD_FOLDER']
+    file_path = os.path.join(upload_root, rec.filename)
+    if not os.path.isfile(file_path):
+        abort(404)
+
+    download_name = rec.original_name or os.path.basename(rec.filename)
+    # blob digest is a strong validator: same ETag means same bytes
+    etag = rec.blob_digest
+
+    offload = current_app.config.get('RECORDS_SENDFILE')
+    if offload in ('x-sendfile', 'x-accel-redirect'):
+        if etag and request.if_none_match.contains(etag):
+            not_modified = current_app.response_class(status=304)
+            not_modified.set_etag(etag)
+            return not_modified
+        # the front-end server streams the file (and answers Range requests)
+        resp = current_app.response_class(mimetype=mimetypes.guess_type(download_name)[0] or 'application/octet-stream')
+        resp.headers['Content-Disposition'] = f"inline; filename*=UTF-8''{quote(download_name)}"
+        if etag:
+            resp.set_etag(etag)
+        if offload == 'x-sendfile':
+            resp.headers['X-Sendfile'] = os.path.abspath(file_path)
+        else:
+            resp.headers['X-Accel-Redirect'] = current_app.config['RECORDS_ACCEL_PREFIX'].rstrip('/') + '/' + rec.filename
+        resp.headers['Cache-Control'] = 'private, no-cache'
+        return resp
+
+    resp = send_file(file_path, download_name=download_name, conditional=True, etag=etag or True, max_age=0)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+
+@bp.route('/records/<int:record_id>/preview', methods=['GET'])
+def preview_record(record_id):
+    if not ('patient_id' in session or 'doctor_id' in session or 'admin_id' in session):
+        abort(401)
+    rec = PatientRecord.query.get_or_404(record_id)
+    if not can_access_record(rec):
+        abort(403)
+
+    upload_root = current_app.config['UPLOAD_FOLDER']
+    if not has_preview(upload_root, rec.filename):
+        # not generated yet (or unsupported type): queue it for next time
+        queue_preview(upload_root, rec.filename, current_app.logger)
+        abort(404)
+    resp = send_file(os.path.join(upload_root, preview_relpath(rec.filename)), mimetype='image/jpeg',
+                     conditional=True, max_age=3600)
+    resp.headers['Cache-Control'] = 'private, max-age=3600'
+    return resp
+
+
+# Live dashboard updates (server-sent events)
+@bp.route('/events/appointments', methods=['GET'])
+def appointment_events():
+    if 'doctor_id' in session:
+        channels = [doctor_channel(session['doctor_id'])]
+    elif 'admin_id' in session:
+        channels = [ADMIN_CHANNEL]
+    else:
+        abort(401)
+    if not open_stream():
+        # every stream this worker may hold is open (SSE_MAX_CONNECTIONS): the page polls instead
+        return Response('Too many live connections, poll /events/appointments/changes.', status=503,
+                        headers={'Retry-After': str(POLL_SECONDS)})
+    try:
+        subscription = get_broker().subscribe(channels)
+    except Exception:
+        close_stream()
+        raise
+    resp = Response(event_stream(subscription), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # runs however the response ends, even if the stream never started
+    resp.call_on_close(close_stream)
+    return resp
+
+
+@bp.route('/events/appointments/changes', methods=['GET'])
+def appointment_changes():
+    # polling fallback of the stream: ?since=<cursor from the previous answer>
+    if 'doctor_id' in session:
+        doctor_id = session['doctor_id']
+    elif 'admin_id' in session:
+        doctor_id = None
+    else:
+        abort(401)
+    cursor = datetime.utcnow() - timedelta(seconds=POLL_OVERLAP_SECONDS)
+    since_str = request.args.get('since', '').strip()
+    if not since_str:
+        return jsonify(since=cursor.isoformat(), poll_seconds=POLL_SECONDS, events=[])
+    try:
+        since = datetime.fromisoformat(since_str)
+    except ValueError:
+        return jsonify(error='Invalid "since".'), 400
+    events = changes_since(since, doctor_id)
+    if events is None:
+        return jsonify(resync=True)
+    return jsonify(since=cursor.isoformat(), poll_seconds=POLL_SECONDS, events=events)
+
+
+@bp.route('/appointments/<int:appt_id>/row', methods=['GET'])
+def appointment_row(appt_id):
+    # a single dashboard row, fetched by the page when an event announces a new appointment
+    appt = (Appointment.query.options(joinedload(Appointment.patient), joinedload(Appointment.doctor))
+            .filter_by(id=appt_id).first_or_404())
+    if 'doctor_id' in session:
+        if appt.doctor_id != session['doctor_id']:
+            abort(404)
+        return render_template('doctor_appointment_row.html', a=appt)
+    if 'admin_id' in session:
+        doctor_choices = (Doctor.query.with_entities(Doctor.id, Doctor.name, Doctor.specialization)
+                          .order_by(Doctor.name).all())
+        patients = Patient.query.order_by(Patient.id.desc()).limit(20).all()
+        return render_template('admin_appointment_row.html', a=appt, doctor_choices=doctor_choices,
+                               patients=patients)
+    abort(401)
+
+
+# Logout
+@bp.route('/logout')
+def logout():
+    session.pop('admin_id', None)
+    session.pop('doctor_id', None)
+    session.pop('patient_id', None)
+    flash('You have been logged out successfully.', 'info')
+    return redirect(url_for('main.home'))
@@ -1,7 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
-#to verify and handle password
+from hashing import hash_password, check_and_upgrade
+#to verify and handle password (hashed on a bounded worker pool, rehashed on login)
 
 db = SQLAlchemy()
 
@@ -16,10 +16,10 @@ class Admin(db.Model):
     # defines admin table
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return check_and_upgrade(self, password)
 # helper function used in flow in app.py for admin class
 
 class Department(db.Model):
@@ -51,10 +51,10 @@ class Doctor(db.Model):
     appointments = db.relationship('Appointment', backref='doctor', lazy='dynamic')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return check_and_upgrade(self, password)
 
 
 class Patient(db.Model):
@@ -74,10 +74,10 @@ class Patient(db.Model):
     appointments = db.relationship('Appointment', backref='patient', lazy='dynamic')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return check_and_upgrade(self, password)
 
 
 class Appointment(db.Model):
@@ -97,6 +97,19 @@ class Appointment(db.Model):
 
     treatment = db.relationship('Treatment', backref='appointment', uselist=False)
 
+    archived = False  # see ArchivedAppointment
+
+    # composite indexes for conflict checks, slot lookup and dashboard listings
+    __table_args__ = (
+        db.Index('ix_appointments_doctor_date_time', 'doctor_id', 'date', 'time'),
+        db.Index('ix_appointments_patient_date_time', 'patient_id', 'date', 'time'),
+        db.Index('ix_appointments_status_date', 'status', 'date'),
+        db.Index('ix_appointments_date_time', 'date', 'time'),
+        db.Index('ix_appointments_updated_at', 'updated_at'),  # dashboards polling for changes
+        # archived rows keep their ids: SQLite must never hand them out again
+        {'sqlite_autoincrement': True},
+    )
+
 
 class Treatment(db.Model):
     __tablename__ = 'treatments'
@@ -107,6 +120,8 @@ class Treatment(db.Model):
     notes = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = {'sqlite_autoincrement': True}  # see Appointment
+
 class DoctorAvailability(db.Model):
     __tablename__ = 'doctor_availabilities'
     id = db.Column(db.Integer, primary_key=True)
@@ -118,6 +133,10 @@ class DoctorAvailability(db.Model):
 
     doctor = db.relationship('Doctor', backref=db.backref('availabilities', cascade='all, delete-orphan', lazy='dynamic'))
 
+    __table_args__ = (
+        db.Index('ix_doctor_availabilities_doctor_dow', 'doctor_id', 'day_of_week'),
+    )
+
     def __repr__(self):
         return f"<Avail doc={self.doctor_id} dow={self.day_of_week} {self.start_time}-{self.end_time}>"
 
@@ -137,16 +156,243 @@ class PatientRecord(db.Model):
     filename = db.Column(db.String(255), nullable=False)           # server filename
     original_name = db.Column(db.String(255), nullable=True)       # original uploaded name
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # shared content-addressed blob (NULL for files uploaded before the record store)
+    blob_digest = db.Column(db.String(64), db.ForeignKey('record_blobs.digest'), nullable=True)
 
     patient = db.relationship('Patient', backref=db.backref('records', cascade='all, delete-orphan', lazy='dynamic'))
 
+    __table_args__ = (
+        db.Index('ix_patient_records_patient_uploaded', 'patient_id', 'uploaded_at'),
+        db.Index('ix_patient_records_blob_digest', 'blob_digest'),
+    )
+
+
+class RecordBlob(db.Model):
+    __tablename__ = 'record_blobs'
+    digest = db.Column(db.String(64), primary_key=True)            # sha256 hex of the content
+    filename = db.Column(db.String(255), nullable=False)           # path under UPLOAD_FOLDER
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)   # PatientRecord rows pointing here
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ArchivedAppointment(db.Model):
+    __tablename__ = 'archived_appointments'
+    # old Completed/Cancelled appointments moved out of the hot table by archive.py;
+    # same columns and ids as in appointments
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    time = db.Column(db.Time, nullable=False)
+    status = db.Column(db.String(30), nullable=False)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    patient = db.relationship('Patient')
+    doctor = db.relationship('Doctor')
+    treatment = db.relationship('ArchivedTreatment', backref='appointment', uselist=False)
+
+    archived = True
+
+    __table_args__ = (
+        db.Index('ix_archived_appointments_patient_date_time', 'patient_id', 'date', 'time'),
+        db.Index('ix_archived_appointments_doctor_date_time', 'doctor_id', 'date', 'time'),
+    )
+
+
+class ArchivedTreatment(db.Model):
+    __tablename__ = 'archived_treatments'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    appointment_id = db.Column(db.Integer, db.ForeignKey('archived_appointments.id'), nullable=False, unique=True)
+    diagnosis = db.Column(db.Text, nullable=True)
+    prescription = db.Column(db.Text, nullable=True)
+    notes = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime)
+
+
+class StatCounter(db.Model):
+    __tablename__ = 'stat_counters'
+    name = db.Column(db.String(60), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    # admin dashboard totals as of the last fold; pending changes are in stat_deltas (see stats.py)
+
+
+class StatDelta(db.Model):
+    __tablename__ = 'stat_deltas'
+    # append-only: every flush adds its counter changes here instead of updating
+    # the shared stat_counters rows, which would serialize all writers
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(60), nullable=False)
+    amount = db.Column(db.Integer, nullable=False)
+
+
+class SlotClaim(db.Model):
+    __tablename__ = 'slot_claims'
+    # one row per minute an active appointment occupies; the primary key makes
+    # two clashing bookings fail at insert time (see reservations.py)
+    doctor_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    date = db.Column(db.Date, primary_key=True)
+    minute = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    appointment_id = db.Column(db.Integer, db.ForeignKey('appointments.id'), nullable=False, index=True)
+
+
+class DoctorSlot(db.Model):
+    __tablename__ = 'doctor_slots'
+    # the bookable slots of the next SLOT_HORIZON_DAYS days (see slot_table.py);
+    # appointment_id is the appointment blocking the slot, NULL while it is free
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id', ondelete='CASCADE'), primary_key=True,
+                          autoincrement=False)
+    date = db.Column(db.Date, primary_key=True)
+    time = db.Column(db.Time, primary_key=True)
+    appointment_id = db.Column(db.Integer, db.ForeignKey('appointments.id', ondelete='SET NULL'), nullable=True)
+
+    __table_args__ = (
+        # "free slots on date X" for a set of doctors is one range scan
+        db.Index('ix_doctor_slots_date_doctor_free', 'date', 'doctor_id', 'appointment_id', 'time'),
+    )
+
+
+class SlotHorizon(db.Model):
+    __tablename__ = 'slot_horizon'
+    id = db.Column(db.Integer, primary_key=True)
+    first_day = db.Column(db.Date, nullable=False)
+    last_day = db.Column(db.Date, nullable=False)
+    # single row (id=1): the days doctor_slots currently covers
+
+
+class TimelineVersion(db.Model):
+    __tablename__ = 'timeline_versions'
+    # bumped with every change to a patient's treatments; cached timelines
+    # (timeline.py) of an older version are rebuilt
+    patient_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class SchemaVersion(db.Model):
+    __tablename__ = 'schema_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    # single row (id=1) holding the last applied migration step
+
+
+# Migration steps: (version, function(connection)). Append new steps, never edit old ones.
+def _migrate_v1_indexes(conn):
+    # existing hospital.db files were created without the composite indexes
+    for table in (Appointment.__table__, DoctorAvailability.__table__, PatientRecord.__table__):
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _migrate_v2_search_index(conn):
+    # FTS5 search over doctors/patients; skipped when FTS5 is unavailable
+    from search import install_search_index
+    install_search_index(conn)
+
+
+def _migrate_v3_stat_counters(conn):
+    # seed the counters from the existing rows
+    from stats import recompute_counters
+    recompute_counters(conn)
+
+
+def _migrate_v4_record_blobs(conn):
+    # record_blobs itself comes from create_all; older patient_records lack the link column
+    columns = {col['name'] for col in db.inspect(conn).get_columns('patient_records')}
+    if 'blob_digest' not in columns:
+        conn.exec_driver_sql('ALTER TABLE patient_records ADD COLUMN blob_digest VARCHAR(64)')
+    for index in PatientRecord.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _migrate_v5_slot_claims(conn):
+    # slot_claims comes from create_all; claim the slots of existing appointments
+    from reservations import rebuild_claims
+    rebuild_claims(conn)
+
+
+def _migrate_v6_doctor_slots(conn):
+    # doctor_slots comes from create_all; materialize the booking horizon
+    from slot_table import rebuild_slots
+    rebuild_slots(conn)
+
+
+def _migrate_v7_autoincrement_ids(conn):
+    # without AUTOINCREMENT SQLite reuses the highest id once archive.py moved that row out;
+    # the keyword cannot be added in place, so older tables are rebuilt (foreign_keys is off)
+    if conn.dialect.name != 'sqlite':
+        return
+    from sqlalchemy import func, select
+    from sqlalchemy.schema import CreateTable
+    for model, archived in ((Appointment, ArchivedAppointment), (Treatment, ArchivedTreatment)):
+        table = model.__table__
+        ddl = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                   (table.name,)).scalar()
+        if 'AUTOINCREMENT' not in ddl.upper():
+            rebuilt = f'{table.name}__autoincrement'
+            create = str(CreateTable(table).compile(dialect=conn.dialect))
+            conn.exec_driver_sql(create.replace(f'CREATE TABLE {table.name} ', f'CREATE TABLE {rebuilt} ', 1))
+            columns = ', '.join(column.name for column in table.columns)
+            conn.exec_driver_sql(f'INSERT INTO {rebuilt} ({columns}) SELECT {columns} FROM {table.name}')
+            conn.exec_driver_sql(f'DROP TABLE {table.name}')
+            conn.exec_driver_sql(f'ALTER TABLE {rebuilt} RENAME TO {table.name}')
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        # continue above every id handed out so far, archived ones included
+        high = max(conn.execute(select(func.max(model.id))).scalar() or 0,
+                   conn.execute(select(func.max(archived.id))).scalar() or 0)
+        conn.exec_driver_sql('DELETE FROM sqlite_sequence WHERE name = ?', (table.name,))
+        conn.exec_driver_sql('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (table.name, high))
+
+
+def _migrate_v8_updated_at_index(conn):
+    # dashboards without a live stream poll appointments by updated_at
+    for index in Appointment.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+MIGRATIONS = [
+    (1, _migrate_v1_indexes),
+    (2, _migrate_v2_search_index),
+    (3, _migrate_v3_stat_counters),
+    (4, _migrate_v4_record_blobs),
+    (5, _migrate_v5_slot_claims),
+    (6, _migrate_v6_doctor_slots),
+    (7, _migrate_v7_autoincrement_ids),
+    (8, _migrate_v8_updated_at_index),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def upgrade_schema():
+    """
+    Applies pending migration steps in order and records the new version.
+    Safe to call on every start; fresh databases just get stamped.
+    """
+    state = db.session.get(SchemaVersion, 1)
+    if state is None:
+        state = SchemaVersion(id=1, version=0)
+        db.session.add(state)
+
+    conn = db.session.connection()
+    for version, step in MIGRATIONS:
+        if version > state.version:
+            step(conn)
+            state.version = version
+            print(f'Applied schema migration {version}: {step.__name__}')
+    db.session.commit()
+
 
 def init_db(app, admin_username='admin', admin_password='admin123'):
 
 #calls create_all() to create all tables if do not exists
-    db.init_app(app)
+    if 'sqlalchemy' not in app.extensions:
+        db.init_app(app)
     with app.app_context():
         db.create_all()
+        # upgrade existing databases in place (indexes etc.)
+        upgrade_schema()
 
 # admin exists is ensured
         if not Admin.query.filter_by(username=admin_username).first():
@@ -0,0 +1,162 @@
+import base64
+import json
+from datetime import date, time
+
+from sqlalchemy import tuple_
+
+from models import Appointment, ArchivedAppointment, Doctor
+
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+class Page:
+    """
+    One keyset page: items plus opaque cursors for the neighbouring pages
+    (None when there is nothing in that direction).
+    """
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class Keyset:
+    """
+    Sort key of a listing: the columns, how to read them from a row and how
+    to rebuild them from a decoded cursor.
+    """
+
+    def __init__(self, columns, key_of, parse_key):
+        self.columns = columns
+        self.key_of = key_of
+        self.parse_key = parse_key
+
+
+APPOINTMENT_KEYSET = Keyset(
+    (Appointment.date, Appointment.time, Appointment.id),
+    lambda a: (a.date.isoformat(), a.time.isoformat(), a.id),
+    lambda raw: (date.fromisoformat(raw[0]), time.fromisoformat(raw[1]), int(raw[2])),
+)
+
+ARCHIVED_APPOINTMENT_KEYSET = Keyset(
+    (ArchivedAppointment.date, ArchivedAppointment.time, ArchivedAppointment.id),
+    APPOINTMENT_KEYSET.key_of,
+    APPOINTMENT_KEYSET.parse_key,
+)
+
+DOCTOR_KEYSET = Keyset(
+    (Doctor.id,),
+    lambda d: (d.id,),
+    lambda raw: (int(raw[0]),),
+)
+
+
+def encode_cursor(direction, key):
+    raw = json.dumps([direction, list(key)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, keyset):
+    """
+    Returns (direction, key) or (None, None) for a missing/invalid cursor.
+    """
+    if not cursor:
+        return None, None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, raw_key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if direction not in ('next', 'prev'):
+            return None, None
+        return direction, keyset.parse_key(raw_key)
+    except (ValueError, TypeError, IndexError):
+        return None, None
+
+
+def page_size(raw_size, default=PAGE_SIZE):
+    try:
+        size = int(raw_size)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def keyset_paginate(query, keyset, cursor=None, size=PAGE_SIZE, descending=False, start=None):
+    """
+    Cursor pagination on (keyset columns) without OFFSET.
+    start: optional key the first page begins at (inclusive), e.g. today.
+    """
+    cols = tuple_(*keyset.columns)
+    direction, key = decode_cursor(cursor, keyset)
+
+    # walking backwards = flipped comparison and order, then reverse the rows
+    backwards = direction == 'prev'
+    ascending = descending == backwards
+    order = [c.asc() if ascending else c.desc() for c in keyset.columns]
+
+    base_query = query
+    if key is not None:
+        query = query.filter(cols > tuple_(*key) if ascending else cols < tuple_(*key))
+    elif start is not None:
+        query = query.filter(cols >= tuple_(*start) if ascending else cols <= tuple_(*start))
+
+    rows = query.order_by(None).order_by(*order).limit(size + 1).all()
+    has_more = len(rows) > size
+    rows = rows[:size]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        first_key = keyset.key_of(rows[0])
+        last_key = keyset.key_of(rows[-1])
+        if backwards:
+            prev_cursor = encode_cursor('prev', first_key) if has_more else None
+            next_cursor = encode_cursor('next', last_key)
+        else:
+            next_cursor = encode_cursor('next', last_key) if has_more else None
+            if key is not None:
+                prev_cursor = encode_cursor('prev', first_key)
+            elif start is not None:
+                # first page began at `start`: only link back if older rows exist
+                first = keyset.parse_key(first_key)
+                older = base_query.filter(cols < tuple_(*first) if ascending else cols > tuple_(*first))
+                if older.order_by(None).limit(1).first() is not None:
+                    prev_cursor = encode_cursor('prev', first_key)
+    return Page(rows, next_cursor, prev_cursor)
+
+
+def keyset_paginate_union(sources, cursor=None, size=PAGE_SIZE, descending=False):
+    """
+    keyset_paginate over several (query, keyset) sources sharing one sort key,
+    e.g. hot and archived appointments, merged into a single page.
+    """
+    direction, key = decode_cursor(cursor, sources[0][1])
+    backwards = direction == 'prev'
+    pages = [keyset_paginate(query, keyset, cursor, size, descending) for query, keyset in sources]
+    key_of = sources[0][1].key_of
+
+    rows = sorted((row for page in pages for row in page), key=key_of, reverse=descending)
+    # more rows beyond this page in the walking direction, in the merge or in any source
+    has_more = len(rows) > size or any(page.prev_cursor if backwards else page.next_cursor for page in pages)
+    rows = rows[-size:] if backwards else rows[:size]
+
+    next_cursor = prev_cursor = None
+    if rows:
+        first_key = key_of(rows[0])
+        last_key = key_of(rows[-1])
+        if backwards:
+            prev_cursor = encode_cursor('prev', first_key) if has_more else None
+            next_cursor = encode_cursor('next', last_key)
+        else:
+            next_cursor = encode_cursor('next', last_key) if has_more else None
+            if key is not None:
+                prev_cursor = encode_cursor('prev', first_key)
+    return Page(rows, next_cursor, prev_cursor)
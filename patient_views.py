@@ -0,0 +1,329 @@
+from datetime import date, datetime
+
+from flask import Blueprint, current_app, request, render_template, redirect, url_for, flash, session
+from werkzeug.utils import secure_filename
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+
+from models import db, Patient, Doctor, Appointment, Treatment, PatientRecord
+from pagination import keyset_paginate, page_size, APPOINTMENT_KEYSET
+from previews import queue_preview, has_preview
+from reservations import reserve, SlotTaken
+from record_store import store_upload
+from directory import get_directory
+from slot_table import available_slots_bulk, booking_problem
+
+#patient record upload
+ALLOWED_EXT = {'pdf', 'png', 'jpg', 'jpeg', 'gif'}
+# characters of each treatment text shown in the patient's treatment list
+TREATMENT_PREVIEW_CHARS = 80
+
+bp = Blueprint('patient', __name__, url_prefix='/patient')
+
+
+def allowed_file(filename):
+    has_dot = '.' in filename
+    valid_ext = filename.rsplit('.', 1)[1].lower() in ALLOWED_EXT
+    return has_dot and valid_ext
+
+
+# Patient dashboard and login
+@bp.route('/dashboard', methods=['GET', 'POST'])
+def dashboard():
+    # POST: patient login
+    if request.method == 'POST':
+        u_val = request.form.get('username', '').strip()
+        p_val = request.form.get('password', '')
+
+        pat_entry = Patient.query.filter_by(username=u_val).first()
+        if not pat_entry or not pat_entry.check_password(p_val):
+            flash('Invalid patient credentials.', 'danger')
+            return render_template('patient_login.html'), 401
+
+        db.session.commit()  # persists a transparent rehash, if any
+        session['patient_id'] = pat_entry.id
+        flash(f'Welcome {pat_entry.name}!', 'success')
+        return redirect(url_for('patient.dashboard'))
+
+    if 'patient_id' not in session:
+        flash('Please login to access the patient dashboard.', 'warning')
+        return redirect(url_for('main.login', role='patient'))
+
+    current_patient = Patient.query.get_or_404(session['patient_id'])
+
+    # first paint: profile, search form and upcoming appointments; search results,
+    # history, records and treatments are fragments fetched by static/js/fragments.js
+    return render_template(
+        'patient_dashboard.html',
+        patient=current_patient,
+        query_spec=request.args.get('spec', '').strip(),
+        query_date=request.args.get('date', '').strip(),
+        appointments=patient_appointments(current_patient.id).filter(Appointment.date >= date.today())
+        .order_by(Appointment.date, Appointment.time).all(),
+        specializations=get_directory().specializations
+    )
+
+
+def patient_appointments(patient_id):
+    # doctor names only; the treatment texts are left for the treatments fragment
+    return (Appointment.query.filter_by(patient_id=patient_id)
+            .options(joinedload(Appointment.doctor).load_only(Doctor.name)))
+
+
+def fragment_login_required():
+    # fragments answer 401 instead of redirecting, the page reloads into the login form
+    if 'patient_id' not in session:
+        return 'Login required.', 401
+    return None
+
+
+@bp.route('/dashboard/search', methods=['GET'])
+def search_fragment():
+    denied = fragment_login_required()
+    if denied:
+        return denied
+
+    spec_search = request.args.get('spec', '').strip()
+    date_search_str = request.args.get('date', '').strip()
+    parsed_date = None
+    if date_search_str:
+        try:
+            parsed_date = datetime.strptime(date_search_str, '%Y-%m-%d').date()
+        except Exception:
+            parsed_date = None
+
+    # doctor search from the cached directory snapshot (case-insensitive)
+    found_doctors = get_directory().search(spec_search)
+
+    #show available slots of chosen date (batched for all doctors)
+    slots_data = {}
+    if parsed_date:
+        slots_data = available_slots_bulk(found_doctors, parsed_date)
+
+    return render_template('patient_search_fragment.html', doctors=found_doctors, query_spec=spec_search,
+                           query_date=date_search_str, available_map=slots_data)
+
+
+@bp.route('/dashboard/upcoming', methods=['GET'])
+def upcoming_fragment():
+    denied = fragment_login_required()
+    if denied:
+        return denied
+    upcoming = (patient_appointments(session['patient_id']).filter(Appointment.date >= date.today())
+                .order_by(Appointment.date, Appointment.time).all())
+    return render_template('patient_appointments_fragment.html', appointments=upcoming)
+
+
+@bp.route('/dashboard/history', methods=['GET'])
+def history_fragment():
+    denied = fragment_login_required()
+    if denied:
+        return denied
+    past = keyset_paginate(
+        patient_appointments(session['patient_id']).filter(Appointment.date < date.today()),
+        APPOINTMENT_KEYSET,
+        request.args.get('cursor'),
+        page_size(request.args.get('size')),
+        descending=True
+    )
+    return render_template('patient_appointments_fragment.html', appointments=past,
+                           empty_text='No past appointments.')
+
+
+@bp.route('/dashboard/records', methods=['GET'])
+def records_fragment():
+    denied = fragment_login_required()
+    if denied:
+        return denied
+    uploaded_records = (PatientRecord.query.filter_by(patient_id=session['patient_id'])
+                        .order_by(PatientRecord.uploaded_at.desc()).all())
+    record_previews = {r.id for r in uploaded_records if has_preview(current_app.config['UPLOAD_FOLDER'], r.filename)}
+    return render_template('patient_records_fragment.html', records=uploaded_records, previews=record_previews)
+
+
+@bp.route('/dashboard/treatments', methods=['GET'])
+def treatments_fragment():
+    denied = fragment_login_required()
+    if denied:
+        return denied
+    # short previews of the text columns; the full texts load per treatment when opened
+    preview = lambda col: func.substr(col, 1, TREATMENT_PREVIEW_CHARS).label(col.key)
+    treatments = keyset_paginate(
+        db.session.query(Appointment.id, Appointment.date, Appointment.time, Appointment.doctor_id,
+                         Doctor.name.label('doctor_name'), Treatment.id.label('treatment_id'),
+                         preview(Treatment.diagnosis), preview(Treatment.prescription), preview(Treatment.notes))
+        .join(Treatment, Treatment.appointment_id == Appointment.id)
+        .outerjoin(Doctor, Doctor.id == Appointment.doctor_id)
+        .filter(Appointment.patient_id == session['patient_id']),
+        APPOINTMENT_KEYSET,
+        request.args.get('cursor'),
+        page_size(request.args.get('size')),
+        descending=True
+    )
+    return render_template('patient_treatments_fragment.html', treatments=treatments)
+
+
+@bp.route('/treatments/<int:treatment_id>', methods=['GET'])
+def treatment_details(treatment_id):
+    denied = fragment_login_required()
+    if denied:
+        return denied
+    treatment = (Treatment.query.join(Appointment, Appointment.id == Treatment.appointment_id)
+                 .filter(Treatment.id == treatment_id, Appointment.patient_id == session['patient_id'])
+                 .first_or_404())
+    return render_template('patient_treatment_details.html', treatment=treatment)
+
+
+# Book appointment by patient
+@bp.route('/appointment/book', methods=['POST'])
+def book_appointment():
+    if 'patient_id' not in session:
+        flash('Please login to book appointments.', 'warning')
+        return redirect(url_for('main.login', role='patient'))
+
+    try:
+        pid = session['patient_id']
+        did = int(request.form.get('doctor_id'))
+        d_str = request.form.get('date', '').strip()
+        t_str = request.form.get('time', '').strip()
+
+        chosen_date = datetime.strptime(d_str, '%Y-%m-%d').date()
+        chosen_time = datetime.strptime(t_str, '%H:%M').time()
+
+        doc_ref = Doctor.query.get(did)
+        if not doc_ref:
+            flash('Selected doctor not found.', 'danger')
+            return redirect(url_for('patient.dashboard'))
+
+        # same rule inside and beyond the doctor_slots horizon (see slot_table.booking_problem)
+        problem = booking_problem(doc_ref, chosen_date, chosen_time)
+        if problem == 'unavailable':
+            flash('Doctor not available at the selected slot.', 'warning')
+            return redirect(url_for('patient.dashboard', spec=request.form.get('spec', ''), date=d_str))
+
+        if problem == 'conflict':
+            flash('Doctor has another appointment near this time.', 'warning')
+            return redirect(url_for('patient.dashboard', spec=request.form.get('spec', ''), date=d_str))
+
+        # optional medical history file upload
+        uploaded_file = request.files.get('record')
+        if uploaded_file and uploaded_file.filename and not allowed_file(uploaded_file.filename):
+            flash('File type not allowed. Use PDF or images.', 'warning')
+            return redirect(url_for('patient.dashboard', date=d_str))
+
+        def stage():
+            stored = None
+            if uploaded_file and uploaded_file.filename:
+                # hashed while streaming to disk; identical content is stored once
+                file_ext = secure_filename(uploaded_file.filename).rsplit('.', 1)[-1].lower()
+                uploaded_file.stream.seek(0)
+                stored = store_upload(uploaded_file.stream, current_app.config['UPLOAD_FOLDER'], file_ext)
+                db.session.add(PatientRecord(patient_id=pid, filename=stored.filename,
+                                             original_name=uploaded_file.filename, blob_digest=stored.digest))
+            db.session.add(Appointment(patient_id=pid, doctor_id=did, date=chosen_date, time=chosen_time,
+                                       status='Booked'))
+            return stored
+
+        # the slot claim makes check + insert atomic against concurrent bookings
+        stored = reserve(stage)
+        if stored:
+            # thumbnail / first-page preview is made in the background
+            queue_preview(current_app.config['UPLOAD_FOLDER'], stored.filename, current_app.logger)
+        flash('Appointment booked successfully.', 'success')
+    except SlotTaken:
+        flash('Doctor has another appointment near this time.', 'warning')
+        return redirect(url_for('patient.dashboard', spec=request.form.get('spec', ''), date=d_str))
+    except ValueError:
+        db.session.rollback()
+        flash('Invalid date/time format.', 'danger')
+    except Exception:
+        db.session.rollback()
+        flash('Failed to book appointment. Try again.', 'danger')
+
+    return redirect(url_for('patient.dashboard'))
+
+
+# Reschedule appointment by patient
+@bp.route('/appointment/reschedule/<int:appt_id>', methods=['POST'])
+def reschedule_appointment(appt_id):
+    if 'patient_id' not in session:
+        flash('Please login to reschedule appointments.', 'warning')
+        return redirect(url_for('main.login', role='patient'))
+
+    target_appt = Appointment.query.get_or_404(appt_id)
+    if target_appt.patient_id != session['patient_id']:
+        flash('You are not authorized to reschedule this appointment.', 'danger')
+        return redirect(url_for('patient.dashboard'))
+
+    try:
+        new_d_str = request.form.get('date', '').strip()
+        new_t_str = request.form.get('time', '').strip()
+        updated_date = datetime.strptime(new_d_str, '%Y-%m-%d').date()
+        updated_time = datetime.strptime(new_t_str, '%H:%M').time()
+
+        problem = booking_problem(target_appt.doctor, updated_date, updated_time, exclude_appt_id=target_appt.id)
+        if problem == 'unavailable':
+            flash('Doctor not available at the chosen time.', 'warning')
+            return redirect(url_for('patient.dashboard'))
+
+        if problem == 'conflict':
+            flash('Doctor has another appointment near this time.', 'warning')
+            return redirect(url_for('patient.dashboard'))
+
+        def stage():
+            target_appt.date = updated_date
+            target_appt.time = updated_time
+
+        reserve(stage)
+        flash('Appointment rescheduled.', 'success')
+    except SlotTaken:
+        flash('Doctor has another appointment near this time.', 'warning')
+    except Exception:
+        db.session.rollback()
+        flash('Failed to reschedule. Use correct date/time format.', 'danger')
+
+    return redirect(url_for('patient.dashboard'))
+
+
+# Cancel appointment by patient
+@bp.route('/appointment/cancel/<int:appt_id>', methods=['POST'])
+def cancel_appointment(appt_id):
+    if 'patient_id' not in session:
+        flash('Please login to cancel appointments.', 'warning')
+        return redirect(url_for('main.login', role='patient'))
+
+    appt_obj = Appointment.query.get_or_404(appt_id)
+    if appt_obj.patient_id != session['patient_id']:
+        flash('You are not authorized to cancel this appointment.', 'danger')
+        return redirect(url_for('patient.dashboard'))
+
+    try:
+        appt_obj.status = 'Cancelled'
+        db.session.commit()
+        flash('Appointment cancelled.', 'success')
+    except Exception:
+        db.session.rollback()
+        flash('Failed to cancel appointment.', 'danger')
+
+    return redirect(url_for('patient.dashboard'))
+
+
+# Patient update profile area
+@bp.route('/profile/update', methods=['POST'])
+def update_profile():
+    if 'patient_id' not in session:
+        flash('Please login to update profile.', 'warning')
+        return redirect(url_for('main.login', role='patient'))
+
+    my_profile = Patient.query.get_or_404(session['patient_id'])
+    try:
+        my_profile.name = request.form.get('name', my_profile.name).strip()
+        val_age = request.form.get('age')
+        my_profile.age = int(val_age) if val_age else None
+        my_profile.contact = request.form.get('contact', my_profile.contact).strip()
+        db.session.commit()
+        flash('Profile updated.', 'success')
+    except Exception:
+        db.session.rollback()
+        flash('Failed to update profile.', 'danger')
+    return redirect(url_for('patient.dashboard'))
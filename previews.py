@@ -0,0 +1,126 @@
+import importlib.util
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# optional dependencies: without them records simply have no preview. They are
+# imported by the first preview job, not with the app (see _imaging)
+HAS_PILLOW = importlib.util.find_spec('PIL') is not None
+_modules = {}
+
+THUMB_SIZE = (240, 240)
+PREVIEW_SUFFIX = '.preview.jpg'
+IMAGE_EXT = {'png', 'jpg', 'jpeg', 'gif'}
+# jobs waiting beyond this are dropped; a preview can be generated again later
+MAX_PENDING = 200
+
+_pool_state = {'pool': None, 'pid': None, 'workers': 2}
+_pending = {'count': 0}
+_lock = threading.Lock()
+
+
+def init_previews(app):
+    _pool_state['workers'] = int(app.config.get('PREVIEW_WORKERS', 2))
+
+
+def preview_relpath(blob_filename):
+    # blobs/ab/<digest>.pdf -> blobs/ab/<digest>.preview.jpg
+    return blob_filename.rsplit('.', 1)[0] + PREVIEW_SUFFIX
+
+
+def has_preview(upload_root, blob_filename):
+    return os.path.isfile(os.path.join(upload_root, preview_relpath(blob_filename)))
+
+
+def _get_pool():
+    # per process: worker threads do not survive a fork
+    with _lock:
+        if _pool_state['pool'] is None or _pool_state['pid'] != os.getpid():
+            _pool_state['pool'] = ThreadPoolExecutor(max_workers=_pool_state['workers'],
+                                                     thread_name_prefix='preview')
+            _pool_state['pid'] = os.getpid()
+            _pending['count'] = 0
+        return _pool_state['pool']
+
+
+def _imaging():
+    # (PIL.Image, pymupdf), None for what is missing; ~150 ms of imports paid by the worker
+    if 'Image' not in _modules:
+        try:
+            from PIL import Image
+        except ImportError:  # pragma: no cover
+            Image = None
+        try:
+            import pymupdf
+        except ImportError:  # pragma: no cover
+            try:
+                import fitz as pymupdf
+            except ImportError:
+                pymupdf = None
+        _modules.update(Image=Image, pymupdf=pymupdf)
+    return _modules['Image'], _modules['pymupdf']
+
+
+def _save_thumbnail(img, out_path):
+    img.thumbnail(THUMB_SIZE)
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    tmp_path = out_path + '.tmp'
+    img.save(tmp_path, 'JPEG', quality=80)
+    os.replace(tmp_path, out_path)
+
+
+def generate_preview(upload_root, blob_filename):
+    """
+    Writes the preview next to the blob. Returns True if one exists afterwards.
+    """
+    src_path = os.path.join(upload_root, blob_filename)
+    out_path = os.path.join(upload_root, preview_relpath(blob_filename))
+    if os.path.isfile(out_path):
+        return True
+    Image, pymupdf = _imaging()
+    if Image is None or not os.path.isfile(src_path):
+        return False
+
+    ext = blob_filename.rsplit('.', 1)[-1].lower()
+    if ext in IMAGE_EXT:
+        with Image.open(src_path) as img:
+            img.seek(0)  # first frame of animated GIFs
+            _save_thumbnail(img.copy(), out_path)
+        return True
+    if ext == 'pdf' and pymupdf is not None:
+        with pymupdf.open(src_path) as doc:
+            if doc.page_count == 0:
+                return False
+            pix = doc[0].get_pixmap(dpi=50, alpha=False)
+            img = Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+            _save_thumbnail(img, out_path)
+        return True
+    return False
+
+
+def _run_job(upload_root, blob_filename, logger):
+    try:
+        generate_preview(upload_root, blob_filename)
+    except Exception:
+        # a broken upload must not take the worker down
+        if logger:
+            logger.exception('Preview generation failed for %s', blob_filename)
+    finally:
+        with _lock:
+            _pending['count'] -= 1
+
+
+def queue_preview(upload_root, blob_filename, logger=None):
+    """
+    Schedules preview generation on the worker pool and returns at once.
+    """
+    if not HAS_PILLOW or has_preview(upload_root, blob_filename):
+        return False
+    pool = _get_pool()
+    with _lock:
+        if _pending['count'] >= MAX_PENDING:
+            return False
+        _pending['count'] += 1
+    pool.submit(_run_job, upload_root, blob_filename, logger)
+    return True
@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# the same statement shape this many times in one request looks like an N+1
+REPEAT_THRESHOLD = 5
+
+_local = threading.local()
+
+
+class QueryStats:
+    """
+    Queries seen while active: count, total SQL time and statement shapes.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total_seconds += elapsed
+        # statements are parameterised, so equal text means equal shape
+        self.shapes[' '.join(statement.split())] += 1
+
+    def repeated(self, threshold=REPEAT_THRESHOLD):
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+    def summary(self, threshold=REPEAT_THRESHOLD):
+        lines = [f'{self.count} queries in {self.total_seconds * 1000:.1f} ms']
+        for shape, n in self.repeated(threshold):
+            lines.append(f'  {n}x {shape}')
+        return '\n'.join(lines)
+
+
+def _active():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active():
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = _active()
+    starts = conn.info.get('query_start')
+    if not stack or not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    for stats in stack:
+        stats.record(statement, elapsed)
+
+
+@contextmanager
+def capture_queries():
+    """
+    Collects QueryStats for every statement run inside the block.
+    """
+    stats = QueryStats()
+    _active().append(stats)
+    try:
+        yield stats
+    finally:
+        _active().remove(stats)
+
+
+@contextmanager
+def assert_query_budget(max_queries, max_repeats=None):
+    """
+    Test helper: fails if the block runs more than max_queries statements,
+    or (when max_repeats is given) any statement shape more often than that.
+
+        with assert_query_budget(10):
+            client.get('/admin/dashboard')
+    """
+    with capture_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        raise AssertionError(f'Query budget of {max_queries} exceeded: {stats.summary()}')
+    if max_repeats is not None and stats.repeated(max_repeats + 1):
+        raise AssertionError(f'Statement repeated more than {max_repeats} times: {stats.summary(max_repeats + 1)}')
+
+
+def init_query_counter(app):
+    """
+    Counts queries per request; in debug mode the numbers go into response
+    headers and repeated statement shapes are logged as N+1 suspects.
+    """
+    threshold = app.config.get('QUERY_REPEAT_THRESHOLD', REPEAT_THRESHOLD)
+
+    @app.before_request
+    def _start_query_count():
+        g.query_stats = QueryStats()
+        _active().append(g.query_stats)
+
+    @app.after_request
+    def _report_query_count(response):
+        stats = g.pop('query_stats', None)
+        if stats is None:
+            return response
+        if stats in _active():
+            _active().remove(stats)
+        if app.debug:
+            repeats = stats.repeated(threshold)
+            response.headers['X-Query-Count'] = str(stats.count)
+            response.headers['X-Query-Time-Ms'] = f'{stats.total_seconds * 1000:.1f}'
+            response.headers['X-Query-Repeats'] = str(len(repeats))
+            if repeats:
+                app.logger.warning('Possible N+1 in %s %s: %s', request.method, request.path,
+                                   stats.summary(threshold))
+        return response
+
+    @app.teardown_request
+    def _drop_query_count(exc):
+        # after_request is skipped on unhandled errors
+        stats = g.pop('query_stats', None)
+        if stats is not None and stats in _active():
+            _active().remove(stats)
@@ -0,0 +1,222 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session
+
+from models import db, PatientRecord, RecordBlob
+from previews import preview_relpath
+
+# where uploads lived before UPLOAD_FOLDER moved out of static/ (relative to the app root)
+LEGACY_UPLOAD_DIR = os.path.join('static', 'uploads')
+# tracked placeholder that kept the old directory in git
+LEGACY_PLACEHOLDER = 'initialization'
+
+BLOB_DIR = 'blobs'
+CHUNK_SIZE = 64 * 1024
+# unreferenced blobs/files younger than this may belong to an upload still in flight
+GC_GRACE = timedelta(hours=1)
+
+
+class StoredBlob:
+    def __init__(self, digest, filename, size, is_new):
+        self.digest = digest
+        self.filename = filename
+        self.size = size
+        self.is_new = is_new
+
+
+def blob_relpath(digest, ext):
+    # fan out over 256 directories: blobs/ab/abcdef....pdf
+    return '/'.join((BLOB_DIR, digest[:2], f'{digest}.{ext}' if ext else digest))
+
+
+def _hash_to_temp(stream, upload_root):
+    """
+    Copies the stream into a temp file while hashing it.
+    Returns (temp_path, sha256 hex, size).
+    """
+    tmp_dir = os.path.join(upload_root, BLOB_DIR, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest(), size
+
+
+def store_upload(stream, upload_root, ext):
+    """
+    Streams an upload to disk once per unique content and adds its RecordBlob
+    row if there is none yet. The caller adds the PatientRecord (which takes
+    the reference) and commits; if a concurrent upload of the same content
+    registered it first, that commit fails (is_blob_conflict) and a retry of
+    the whole transaction finds the row.
+    """
+    tmp_path, digest, size = _hash_to_temp(stream, upload_root)
+
+    blob = db.session.get(RecordBlob, digest)
+    if blob is not None and os.path.exists(os.path.join(upload_root, blob.filename)):
+        os.unlink(tmp_path)
+        return StoredBlob(digest, blob.filename, size, is_new=False)
+
+    relpath = blob.filename if blob is not None else blob_relpath(digest, ext)
+    final_path = os.path.join(upload_root, relpath)
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    # same digest = same bytes, so a concurrent writer replacing it is harmless
+    os.replace(tmp_path, final_path)
+
+    if blob is None:
+        # in the caller's transaction: SAVEPOINTs are unreliable with pysqlite's transaction handling
+        db.session.add(RecordBlob(digest=digest, filename=relpath, size=size, ref_count=0))
+    return StoredBlob(digest, relpath, size, is_new=blob is None)
+
+
+def is_blob_conflict(exc):
+    return 'record_blobs' in str(exc.orig)
+
+
+@event.listens_for(Session, 'after_flush')
+def _count_blob_refs(session, flush_context):
+    # ref_count follows PatientRecord inserts/deletes (incl. patient cascades)
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, PatientRecord) and obj.blob_digest:
+            deltas[obj.blob_digest] = deltas.get(obj.blob_digest, 0) + 1
+    for obj in session.deleted:
+        if isinstance(obj, PatientRecord) and obj.blob_digest:
+            deltas[obj.blob_digest] = deltas.get(obj.blob_digest, 0) - 1
+    if not deltas:
+        return
+    conn = session.connection()
+    for digest, amount in deltas.items():
+        if amount:
+            conn.execute(update(RecordBlob).where(RecordBlob.digest == digest)
+                         .values(ref_count=RecordBlob.ref_count + amount))
+
+
+def recount_refs():
+    """
+    Recomputes every ref_count from patient_records; returns how many changed.
+    """
+    actual = dict(db.session.execute(
+        select(PatientRecord.blob_digest, func.count())
+        .where(PatientRecord.blob_digest.isnot(None))
+        .group_by(PatientRecord.blob_digest)
+    ).all())
+    changed = 0
+    for digest, stored in db.session.execute(select(RecordBlob.digest, RecordBlob.ref_count)).all():
+        if stored != actual.get(digest, 0):
+            db.session.execute(update(RecordBlob).where(RecordBlob.digest == digest)
+                               .values(ref_count=actual.get(digest, 0)))
+            changed += 1
+    db.session.commit()
+    return changed
+
+
+def adopt_legacy_records(upload_root):
+    """
+    Moves files of pre-store records ({pid}_{ts}_{name}) into the blob store,
+    deduplicating identical content. Returns (adopted, bytes_freed).
+    """
+    adopted = freed = 0
+    legacy = PatientRecord.query.filter(PatientRecord.blob_digest.is_(None)).all()
+    for rec in legacy:
+        path = os.path.join(upload_root, rec.filename)
+        if not os.path.isfile(path):
+            continue
+        ext = rec.filename.rsplit('.', 1)[1].lower() if '.' in rec.filename else ''
+        with open(path, 'rb') as fh:
+            stored = store_upload(fh, upload_root, ext)
+        rec.blob_digest = stored.digest
+        rec.filename = stored.filename
+        db.session.flush()
+        db.session.execute(update(RecordBlob).where(RecordBlob.digest == stored.digest)
+                           .values(ref_count=RecordBlob.ref_count + 1))
+        db.session.commit()
+        if not stored.is_new:
+            freed += os.path.getsize(path)
+        os.unlink(path)
+        adopted += 1
+    return adopted, freed
+
+
+def move_uploads(old_root, new_root):
+    """
+    Moves every file below old_root to the same relative path below new_root
+    (identical blob names mean identical bytes, so an existing copy wins).
+    Returns the number of files moved.
+    """
+    moved = 0
+    for dirpath, _, filenames in os.walk(old_root):
+        for name in filenames:
+            src = os.path.join(dirpath, name)
+            rel = os.path.relpath(src, old_root)
+            if rel == LEGACY_PLACEHOLDER:
+                continue
+            dest = os.path.join(new_root, rel)
+            if os.path.exists(dest):
+                os.unlink(src)
+                continue
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.move(src, dest)
+            moved += 1
+    return moved
+
+
+def collect_garbage(upload_root, grace=GC_GRACE, dry_run=False):
+    """
+    Deletes blobs nobody references any more (rows and files), plus stray
+    files in the blob directory without a row. Returns (blobs, bytes).
+    """
+    cutoff = datetime.utcnow() - grace
+    removed = freed = 0
+
+    dead = RecordBlob.query.filter(RecordBlob.ref_count <= 0, RecordBlob.created_at < cutoff).all()
+    for blob in dead:
+        path = os.path.join(upload_root, blob.filename)
+        if not dry_run:
+            # re-check under the delete so a record added meanwhile keeps the blob
+            still_used = db.session.query(PatientRecord.id).filter_by(blob_digest=blob.digest).first()
+            if still_used:
+                continue
+            db.session.delete(blob)
+            db.session.commit()
+            for dead_path in (path, os.path.join(upload_root, preview_relpath(blob.filename))):
+                if os.path.exists(dead_path):
+                    freed += os.path.getsize(dead_path)
+                    os.unlink(dead_path)
+        removed += 1
+
+    # files left behind by uploads whose transaction rolled back
+    known = set()
+    for (name,) in db.session.query(RecordBlob.filename).all():
+        known.update((name, preview_relpath(name)))
+    blob_root = os.path.join(upload_root, BLOB_DIR)
+    cutoff_ts = time.time() - grace.total_seconds()
+    for dirpath, _, files in os.walk(blob_root):
+        for name in files:
+            path = os.path.join(dirpath, name)
+            relpath = os.path.relpath(path, upload_root)
+            if relpath in known or os.path.getmtime(path) > cutoff_ts:
+                continue
+            if not dry_run:
+                freed += os.path.getsize(path)
+                os.unlink(path)
+            removed += 1
+    return removed, freed
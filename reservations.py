@@ -0,0 +1,136 @@
+import random
+import time
+
+from sqlalchemy import delete, event, inspect, insert, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+from models import db, Appointment, SlotClaim
+from record_store import is_blob_conflict
+from scheduling import CLASH_SECONDS
+
+# an appointment at minute m claims minutes m .. m+4, so two active
+# appointments of a doctor share a claim exactly when they are < 5 minutes apart
+CLAIM_MINUTES = CLASH_SECONDS // 60
+# lock timeouts / serialization failures are retried, claim collisions are not
+RETRIES = 3
+RETRY_DELAY = 0.05
+SLOT_FIELDS = ('doctor_id', 'date', 'time', 'status')
+
+
+class SlotTaken(Exception):
+    """
+    Another booking claimed an overlapping slot first.
+    """
+
+
+def is_active(status):
+    return status != 'Cancelled'
+
+
+def claim_rows(appt_id, doctor_id, appt_date, appt_time):
+    start = appt_time.hour * 60 + appt_time.minute
+    return [{'doctor_id': doctor_id, 'date': appt_date, 'minute': minute, 'appointment_id': appt_id}
+            for minute in range(start, start + CLAIM_MINUTES)]
+
+
+def _moves_slot(appt):
+    state = inspect(appt)
+    return any(state.attrs[name].history.has_changes() for name in SLOT_FIELDS)
+
+
+@event.listens_for(Session, 'before_flush')
+def _release_deleted_claims(session, flush_context, instances):
+    # before the appointments go: where foreign keys are enforced, deleting an
+    # appointment that still holds claims would fail
+    release = [obj.id for obj in session.deleted if isinstance(obj, Appointment) and obj.id is not None]
+    if release:
+        session.connection().execute(delete(SlotClaim).where(SlotClaim.appointment_id.in_(release)))
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_slot_claims(session, flush_context):
+    # claims are written in the flushing transaction: a clash makes the flush
+    # (and with it the whole booking) fail with an IntegrityError
+    release, claim = [], []
+    for obj in session.new:
+        if isinstance(obj, Appointment) and is_active(obj.status):
+            claim.append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Appointment) and _moves_slot(obj):
+            release.append(obj.id)
+            if is_active(obj.status):
+                claim.append(obj)
+    if not (release or claim):
+        return
+
+    conn = session.connection()
+    if release:
+        conn.execute(delete(SlotClaim).where(SlotClaim.appointment_id.in_(release)))
+    if claim:
+        conn.execute(insert(SlotClaim), [row for appt in claim
+                                         for row in claim_rows(appt.id, appt.doctor_id, appt.date, appt.time)])
+
+
+def is_claim_conflict(exc):
+    return 'slot_claims' in str(exc.orig)
+
+
+def _is_retryable(exc):
+    message = str(exc.orig).lower()
+    return 'locked' in message or 'deadlock' in message or 'could not serialize' in message
+
+
+def reserve(stage, retries=RETRIES):
+    """
+    Runs stage() -- which adds or moves appointments on db.session -- and
+    commits. Raises SlotTaken if a slot claim collides; lock timeouts and
+    record blobs registered concurrently (see store_upload) are retried.
+    Returns what stage() returned.
+    """
+    for attempt in range(retries + 1):
+        try:
+            result = stage()
+            db.session.commit()
+            return result
+        except IntegrityError as exc:
+            db.session.rollback()
+            if is_claim_conflict(exc):
+                raise SlotTaken() from exc
+            # the same file uploaded at the same moment: the next attempt reuses its blob
+            if attempt == retries or not is_blob_conflict(exc):
+                raise
+        except OperationalError as exc:
+            db.session.rollback()
+            if attempt == retries or not _is_retryable(exc):
+                raise
+            time.sleep(RETRY_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+def rebuild_claims(conn=None):
+    """
+    Recreates slot_claims from the active appointments. Appointments that
+    already clash with an earlier one keep no claim. Returns (claimed, clashing).
+    """
+    conn = conn if conn is not None else db.session.connection()
+    conn.execute(delete(SlotClaim))
+    rows = conn.execute(
+        select(Appointment.id, Appointment.doctor_id, Appointment.date, Appointment.time)
+        .where(Appointment.status != 'Cancelled')
+        .order_by(Appointment.doctor_id, Appointment.date, Appointment.time, Appointment.id)
+    )
+    taken = set()
+    claimed = clashing = 0
+    pending = []
+    for appt_id, doctor_id, appt_date, appt_time in rows:
+        cells = claim_rows(appt_id, doctor_id, appt_date, appt_time)
+        keys = {(doctor_id, appt_date, cell['minute']) for cell in cells}
+        if keys & taken:
+            clashing += 1
+            continue
+        taken |= keys
+        pending.extend(cells)
+        claimed += 1
+    for start in range(0, len(pending), 1000):
+        conn.execute(insert(SlotClaim), pending[start:start + 1000])
+    return claimed, clashing
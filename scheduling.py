@@ -0,0 +1,187 @@
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+from models import Appointment, DoctorAvailability
+
+# appointments closer than this (in seconds) to a slot make it unavailable
+CLASH_SECONDS = 300
+# keep IN (...) lists well below SQLite's bound-parameter limit
+ID_CHUNK = 500
+
+
+def time_to_seconds(t):
+    return t.hour * 3600 + t.minute * 60 + t.second + t.microsecond / 1e6
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), ID_CHUNK):
+        yield ids[start:start + ID_CHUNK]
+
+
+def booked_times_by_doctor(doctor_ids, appt_date):
+    """
+    One grouped query: {doctor_id: sorted booked times in seconds} for a date.
+    """
+    booked = {}
+    for chunk in _chunks(doctor_ids):
+        rows = (Appointment.query
+                .with_entities(Appointment.doctor_id, Appointment.time)
+                .filter(Appointment.doctor_id.in_(chunk), Appointment.date == appt_date)
+                .all())
+        for doc_id, appt_time in rows:
+            booked.setdefault(doc_id, []).append(time_to_seconds(appt_time))
+    for times in booked.values():
+        times.sort()
+    return booked
+
+
+def windows_by_doctor(doctor_ids, weekday_idx):
+    """
+    One grouped query: {doctor_id: [(start_time, end_time), ...]} for a weekday.
+    """
+    windows = {}
+    for chunk in _chunks(doctor_ids):
+        rows = (DoctorAvailability.query
+                .with_entities(DoctorAvailability.doctor_id,
+                               DoctorAvailability.start_time,
+                               DoctorAvailability.end_time)
+                .filter(DoctorAvailability.doctor_id.in_(chunk),
+                        DoctorAvailability.day_of_week == weekday_idx)
+                .order_by(DoctorAvailability.doctor_id, DoctorAvailability.id)
+                .all())
+        for doc_id, start_t, end_t in rows:
+            windows.setdefault(doc_id, []).append((start_t, end_t))
+    return windows
+
+
+def availabilities_by_weekday(doctor_ids):
+    """
+    One grouped query: {doctor_id: [[DoctorAvailability, ...] for Mon..Sun]}.
+    Doctors without any availability are absent from the map.
+    """
+    week_map = {}
+    for chunk in _chunks(doctor_ids):
+        rows = (DoctorAvailability.query
+                .filter(DoctorAvailability.doctor_id.in_(chunk))
+                .order_by(DoctorAvailability.doctor_id, DoctorAvailability.day_of_week,
+                          DoctorAvailability.start_time)
+                .all())
+        for av in rows:
+            week = week_map.setdefault(av.doctor_id, [[] for _ in range(7)])
+            week[av.day_of_week].append(av)
+    return week_map
+
+
+def is_clashing(booked_secs, candidate_secs):
+    """
+    True if a sorted list of booked seconds has an entry within ±5 minutes (exclusive).
+    """
+    idx = bisect_right(booked_secs, candidate_secs - CLASH_SECONDS)
+    return idx < len(booked_secs) and booked_secs[idx] < candidate_secs + CLASH_SECONDS
+
+
+def free_slots(windows, booked_secs, appt_date, slot_minutes=30):
+    """
+    Steps through availability windows and keeps slots with no nearby booking.
+    """
+    valid_slots = []
+    step = timedelta(minutes=slot_minutes)
+    for start_t, end_t in windows:
+        current_step = datetime.combine(appt_date, start_t)
+        shift_end = datetime.combine(appt_date, end_t)
+        while current_step + step <= shift_end:
+            time_candidate = current_step.time()
+            if not is_clashing(booked_secs, time_to_seconds(time_candidate)):
+                valid_slots.append(time_candidate)
+            current_step += step
+    return valid_slots
+
+
+def get_available_slots_bulk(doctors, appt_date, slot_minutes=30):
+    """
+    Returns {doctor_id: [slots]} for every doctor with at least one free slot,
+    using two grouped queries for the whole doctor set.
+    """
+    doctor_ids = [doc.id for doc in doctors]
+    if not doctor_ids:
+        return {}
+
+    windows = windows_by_doctor(doctor_ids, appt_date.weekday())
+    if not windows:
+        return {}
+    booked = booked_times_by_doctor(windows.keys(), appt_date)
+
+    slots_data = {}
+    for doc_id in doctor_ids:
+        if doc_id not in windows:
+            continue
+        found_slots = free_slots(windows[doc_id], booked.get(doc_id, []), appt_date, slot_minutes)
+        if found_slots:
+            slots_data[doc_id] = found_slots
+    return slots_data
+
+
+def slots_for_range(doctor_id, from_date, to_date, slot_minutes=30):
+    """
+    Free slots per day ({date: [slots]}) for one doctor across a date range.
+    Loads the weekly windows and the booked times of the whole range once.
+    """
+    weekly = {}
+    for dow, start_t, end_t in (DoctorAvailability.query
+                                .with_entities(DoctorAvailability.day_of_week,
+                                               DoctorAvailability.start_time,
+                                               DoctorAvailability.end_time)
+                                .filter(DoctorAvailability.doctor_id == doctor_id)
+                                .order_by(DoctorAvailability.id)
+                                .all()):
+        weekly.setdefault(dow, []).append((start_t, end_t))
+
+    booked = {}
+    if weekly:
+        for appt_date, appt_time in (Appointment.query
+                                     .with_entities(Appointment.date, Appointment.time)
+                                     .filter(Appointment.doctor_id == doctor_id,
+                                             Appointment.date >= from_date,
+                                             Appointment.date <= to_date)
+                                     .all()):
+            booked.setdefault(appt_date, []).append(time_to_seconds(appt_time))
+        for times in booked.values():
+            times.sort()
+
+    by_day = {}
+    current_day = from_date
+    while current_day <= to_date:
+        windows = weekly.get(current_day.weekday())
+        by_day[current_day] = (free_slots(windows, booked.get(current_day, []), current_day, slot_minutes)
+                               if windows else [])
+        current_day += timedelta(days=1)
+    return by_day
+
+
+def conflict_query(doctor_id, appt_date, appt_time, exclude_appt_id=None):
+    """
+    Appointments of a doctor less than 5 minutes away (served by ix_appointments_doctor_date_time).
+    Exclusive like is_clashing and the slot claims, so 5 minutes apart is allowed everywhere.
+    """
+    reference_dt = datetime.combine(appt_date, appt_time)
+    lower_bound = reference_dt - timedelta(seconds=CLASH_SECONDS)
+    upper_bound = reference_dt + timedelta(seconds=CLASH_SECONDS)
+
+    query_check = Appointment.query.filter(
+        Appointment.doctor_id == doctor_id,
+        Appointment.date == appt_date,
+        Appointment.time > lower_bound.time(),
+        Appointment.time < upper_bound.time()
+    )
+    if exclude_appt_id:
+        query_check = query_check.filter(Appointment.id != exclude_appt_id)
+    return query_check
+
+
+def doctor_has_conflict(doctor_id, appt_date, appt_time, exclude_appt_id=None):
+    """
+    Returns True if a doctor already has an appointment less than 5 minutes away.
+    """
+    match_count = conflict_query(doctor_id, appt_date, appt_time, exclude_appt_id).count()
+    return match_count > 0
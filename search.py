@@ -0,0 +1,127 @@
+import re
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from models import db
+
+# FTS5 indexes mirror these tables through triggers (external content tables)
+FTS_TABLES = {
+    'doctors_fts': ('doctors', ('name', 'specialization', 'username')),
+    'patients_fts': ('patients', ('name', 'username', 'contact')),
+}
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# database url -> whether the FTS tables exist there
+_fts_state = {}
+
+
+def _fts_ddl(fts_table, source, columns):
+    cols = ', '.join(columns)
+    new_vals = ', '.join(f'new.{c}' for c in columns)
+    old_vals = ', '.join(f'old.{c}' for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+        f"{cols}, content='{source}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {source} BEGIN "
+        f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_vals}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {source} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_vals}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE ON {source} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_vals}); "
+        f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_vals}); END",
+        # index rows that existed before the triggers
+        f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')",
+    ]
+
+
+def install_search_index(conn):
+    """
+    Creates the FTS5 tables + sync triggers. Returns False (and changes
+    nothing) when the database is not SQLite or lacks FTS5.
+    """
+    if conn.dialect.name != 'sqlite':
+        return False
+    try:
+        with conn.begin_nested():
+            for fts_table, (source, columns) in FTS_TABLES.items():
+                for statement in _fts_ddl(fts_table, source, columns):
+                    conn.exec_driver_sql(statement)
+    except OperationalError:
+        # e.g. "no such module: fts5"
+        return False
+    _fts_state.clear()
+    return True
+
+
+def fts_available():
+    """
+    True when the search tables exist in the current database.
+    """
+    engine = db.engine
+    key = str(engine.url)
+    if key not in _fts_state:
+        available = False
+        if engine.dialect.name == 'sqlite':
+            with engine.connect() as conn:
+                found = conn.execute(text(
+                    "SELECT count(*) FROM sqlite_master WHERE type='table' AND name IN ('doctors_fts', 'patients_fts')"
+                )).scalar()
+            available = found == len(FTS_TABLES)
+        _fts_state[key] = available
+    return _fts_state[key]
+
+
+def match_expression(raw_query, columns=None):
+    """
+    Turns free text into a safe FTS5 query: every word is a quoted prefix
+    term and all words must match. Returns None if nothing searchable is left.
+    """
+    tokens = _TOKEN_RE.findall(raw_query or '')
+    if not tokens:
+        return None
+    terms = ' '.join(f'"{tok}"*' for tok in tokens)
+    if columns:
+        return '{' + ' '.join(columns) + '} : (' + terms + ')'
+    return terms
+
+
+def ranked_ids(fts_table, raw_query, columns=None, limit=None):
+    """
+    Row ids matching raw_query, best match (bm25) first, or None when FTS5
+    cannot be used so callers fall back to LIKE.
+    """
+    if not fts_available():
+        return None
+    expression = match_expression(raw_query, columns)
+    if expression is None:
+        return []
+    sql = f'SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH :q ORDER BY rank'
+    params = {'q': expression}
+    if limit:
+        sql += ' LIMIT :limit'
+        params['limit'] = limit
+    try:
+        return [row[0] for row in db.session.execute(text(sql), params)]
+    except OperationalError:
+        return None
+
+
+def search_doctor_ids(raw_query, columns=None, limit=None):
+    return ranked_ids('doctors_fts', raw_query, columns, limit)
+
+
+def search_patient_ids(raw_query, columns=None, limit=None):
+    return ranked_ids('patients_fts', raw_query, columns, limit)
+
+
+def load_ranked(model, ids):
+    """
+    Loads model rows for ids in one query, keeping the ranking order.
+    """
+    if not ids:
+        return []
+    by_id = {obj.id: obj for obj in model.query.filter(model.id.in_(ids)).all()}
+    return [by_id[i] for i in ids if i in by_id]
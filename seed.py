@@ -0,0 +1,203 @@
+import io
+import random
+import time
+from datetime import date, datetime, time as dtime, timedelta
+
+from sqlalchemy import insert
+
+from models import (
+    db, Department, Doctor, Patient, Appointment, Treatment, DoctorAvailability,
+    PatientRecord, SlotClaim
+)
+from bulk_import import batches, BATCH_SIZE
+from hashing import hash_password
+from record_store import store_upload, recount_refs
+from reservations import claim_rows
+from slot_table import rebuild_slots
+from directory import bump_directory_version
+from stats import recompute_counters
+
+SPECIALIZATIONS = (
+    'Cardiology', 'Dermatology', 'Neurology', 'Orthopedics', 'Pediatrics',
+    'Psychiatry', 'Radiology', 'Oncology', 'Ophthalmology', 'General Medicine',
+)
+FIRST_NAMES = ('Asha', 'Ben', 'Chen', 'Dara', 'Eli', 'Farah', 'Gopal', 'Hana', 'Ivan', 'Jaya',
+               'Kofi', 'Lena', 'Mateo', 'Nia', 'Omar', 'Priya', 'Quinn', 'Ravi', 'Sara', 'Tomas')
+LAST_NAMES = ('Iyer', 'Khan', 'Lopez', 'Mensah', 'Novak', 'Okafor', 'Patel', 'Rossi', 'Sato', 'Weber')
+DIAGNOSES = ('Hypertension', 'Migraine', 'Seasonal allergy', 'Lower back pain', 'Type 2 diabetes',
+             'Dermatitis', 'Anxiety', 'Sprained ankle', 'Bronchitis', 'Routine check-up')
+# weekly shapes a doctor can get: (weekdays, [(start, end), ...])
+SHIFTS = (
+    (range(0, 5), [(dtime(9), dtime(13)), (dtime(14), dtime(17))]),
+    (range(0, 6), [(dtime(8), dtime(12))]),
+    ((0, 2, 4), [(dtime(10), dtime(18))]),
+    ((1, 3, 5), [(dtime(12), dtime(16)), (dtime(17), dtime(20))]),
+)
+SLOT_MINUTES = 30
+# distinct record files; records share them like real re-uploads do
+RECORD_FILES = 25
+
+
+class SeedReport:
+    def __init__(self):
+        self.counts = {}
+        self.started = time.perf_counter()
+
+    def add(self, kind, amount):
+        self.counts[kind] = self.counts.get(kind, 0) + amount
+
+    def summary(self):
+        parts = ', '.join(f'{n} {kind}' for kind, n in self.counts.items())
+        return f'Seeded {parts} in {time.perf_counter() - self.started:.1f}s'
+
+
+def _name(rng):
+    return f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+
+
+def _insert(model, rows, report, kind=None):
+    for batch in batches(rows, BATCH_SIZE):
+        db.session.execute(insert(model), batch)
+        report.add(kind or model.__tablename__, len(batch))
+
+
+def _seed_accounts(prefix, departments, doctors, patients, password_hash, rng, report):
+    spec_count = len(SPECIALIZATIONS)
+    _insert(Department, ({
+        'name': f'{prefix} {SPECIALIZATIONS[n % spec_count]}' + (f' {n // spec_count + 1}' if n >= spec_count else ''),
+        'description': f'{SPECIALIZATIONS[n % spec_count]} department',
+    } for n in range(departments)), report)
+    dept_ids = [i for (i,) in db.session.query(Department.id).filter(Department.name.like(f'{prefix} %'))]
+
+    _insert(Doctor, ({
+        'name': f'Dr. {_name(rng)}', 'specialization': rng.choice(SPECIALIZATIONS),
+        'contact': f'555-{n:07d}', 'username': f'{prefix}-doctor-{n}', 'password_hash': password_hash,
+        'department_id': rng.choice(dept_ids) if dept_ids else None,
+    } for n in range(doctors)), report)
+    _insert(Patient, ({
+        'name': _name(rng), 'age': rng.randint(1, 95), 'gender': rng.choice(('Male', 'Female', 'Other')),
+        'contact': f'555-{n:07d}', 'email': f'{prefix}-patient-{n}@example.org',
+        'username': f'{prefix}-patient-{n}', 'password_hash': password_hash,
+    } for n in range(patients)), report)
+
+    doctor_ids = [i for (i,) in db.session.query(Doctor.id).filter(Doctor.username.like(f'{prefix}-doctor-%'))
+                  .order_by(Doctor.id)]
+    patient_ids = [i for (i,) in db.session.query(Patient.id).filter(Patient.username.like(f'{prefix}-patient-%'))
+                   .order_by(Patient.id)]
+    return doctor_ids, patient_ids
+
+
+def _seed_availability(doctor_ids, rng, report):
+    shifts = {}
+    rows = []
+    for doc_id in doctor_ids:
+        weekdays, windows = rng.choice(SHIFTS)
+        shifts[doc_id] = {dow: windows for dow in weekdays}
+        rows.extend({'doctor_id': doc_id, 'day_of_week': dow, 'start_time': start, 'end_time': end}
+                    for dow in weekdays for start, end in windows)
+    _insert(DoctorAvailability, rows, report)
+    return shifts
+
+
+def _slot_starts(windows):
+    starts = []
+    for start, end in windows:
+        minute = start.hour * 60 + start.minute
+        while minute + SLOT_MINUTES <= end.hour * 60 + end.minute:
+            starts.append(dtime(minute // 60, minute % 60))
+            minute += SLOT_MINUTES
+    return starts
+
+
+def _appointment_rows(appointments, years, doctor_ids, patient_ids, shifts, rng):
+    """
+    Yields appointment dicts on free, aligned slots between `years` ago and
+    30 days ahead. Past ones are mostly Completed (with a treatment).
+    """
+    today = date.today()
+    first_day = today - timedelta(days=int(365 * years))
+    span = (today + timedelta(days=30) - first_day).days
+    taken = set()
+    made = attempts = 0
+    while made < appointments and attempts < appointments * 5:
+        attempts += 1
+        doc_id = rng.choice(doctor_ids)
+        day = first_day + timedelta(days=rng.randrange(span))
+        windows = shifts[doc_id].get(day.weekday())
+        if not windows:
+            continue
+        slot = rng.choice(_slot_starts(windows))
+        if (doc_id, day, slot) in taken:
+            continue
+        taken.add((doc_id, day, slot))
+        if day < today:
+            status = rng.choices(('Completed', 'Cancelled', 'Booked'), (85, 10, 5))[0]
+        else:
+            status = rng.choices(('Booked', 'Cancelled'), (95, 5))[0]
+        made += 1
+        yield {'patient_id': rng.choice(patient_ids), 'doctor_id': doc_id, 'date': day, 'time': slot,
+               'status': status}
+
+
+def _seed_appointments(rows, rng, report):
+    for batch in batches(rows, BATCH_SIZE):
+        stmt = insert(Appointment).returning(Appointment.id, sort_by_parameter_order=True)
+        new_ids = db.session.execute(stmt, batch).scalars().all()
+        report.add('appointments', len(batch))
+        treatments = [{
+            'appointment_id': appt_id, 'diagnosis': rng.choice(DIAGNOSES),
+            'prescription': f'Rx #{appt_id}: follow the usual regimen for {rng.randint(3, 30)} days',
+            'notes': 'Seeded treatment note. ' * rng.randint(1, 8),
+        } for appt_id, row in zip(new_ids, batch) if row['status'] == 'Completed']
+        if treatments:
+            db.session.execute(insert(Treatment), treatments)
+            report.add('treatments', len(treatments))
+        claims = [cell for appt_id, row in zip(new_ids, batch) if row['status'] != 'Cancelled'
+                  for cell in claim_rows(appt_id, row['doctor_id'], row['date'], row['time'])]
+        if claims:
+            db.session.execute(insert(SlotClaim), claims)
+        db.session.commit()
+
+
+def _seed_records(records, patient_ids, upload_root, rng, report):
+    if not records:
+        return
+    blobs = []
+    for n in range(min(RECORD_FILES, records)):
+        body = f'%PDF-1.4\n% seeded record {n}\n'.encode() + bytes(rng.getrandbits(8) for _ in range(2048))
+        blobs.append(store_upload(io.BytesIO(body), upload_root, 'pdf'))
+    db.session.commit()
+    now = datetime.utcnow()
+    _insert(PatientRecord, ({
+        'patient_id': rng.choice(patient_ids), 'filename': blob.filename,
+        'original_name': f'report-{n}.pdf', 'blob_digest': blob.digest,
+        'uploaded_at': now - timedelta(minutes=rng.randrange(60 * 24 * 365)),
+    } for n, blob in ((n, rng.choice(blobs)) for n in range(records))), report)
+    db.session.commit()
+    recount_refs()
+
+
+def seed_database(upload_root, departments=10, doctors=100, patients=2000, appointments=50000,
+                  years=2, records=1000, password='loadtest', prefix='seed', random_seed=42):
+    """
+    Fills the database with synthetic but consistent data (free slots only,
+    treatments for completed visits, shared record files). Returns a SeedReport.
+    """
+    if Doctor.query.filter(Doctor.username.like(f'{prefix}-doctor-%')).first():
+        raise ValueError(f'Data with prefix "{prefix}" exists already; pick another prefix.')
+    rng = random.Random(random_seed)
+    report = SeedReport()
+    # every seeded account shares one hash: seeding stays fast, logins cost what they cost
+    password_hash = hash_password(password)
+
+    doctor_ids, patient_ids = _seed_accounts(prefix, departments, doctors, patients, password_hash, rng, report)
+    shifts = _seed_availability(doctor_ids, rng, report)
+    db.session.commit()
+    _seed_appointments(_appointment_rows(appointments, years, doctor_ids, patient_ids, shifts, rng), rng, report)
+    _seed_records(records, patient_ids, upload_root, rng, report)
+    # core inserts skip the ORM hooks that keep the dashboard counters and slots current
+    recompute_counters()
+    rebuild_slots()
+    bump_directory_version()
+    db.session.commit()
+    return report
@@ -0,0 +1,340 @@
+import os
+import threading
+import time
+from bisect import bisect_right
+from datetime import date, timedelta
+
+from sqlalchemy import bindparam, delete, event, inspect, insert, select, update
+from sqlalchemy.orm import Session
+
+from models import (
+    db, Appointment, Doctor, DoctorAvailability, DoctorSlot, SlotHorizon, doctor_is_available
+)
+from scheduling import (
+    CLASH_SECONDS, ID_CHUNK, doctor_has_conflict, free_slots, time_to_seconds, get_available_slots_bulk,
+    slots_for_range
+)
+
+SLOT_MINUTES = 30
+# a change to one of these moves the appointment to another doctor/day/slot
+SLOT_FIELDS = ('doctor_id', 'date', 'time')
+INSERT_CHUNK = 1000
+# the horizon only moves once a day; reads reuse it for this long instead of querying it
+HORIZON_TTL = 30
+
+_state = {'days': 60, 'interval': 3600, 'pid': None}
+_horizon_cache = {'value': None, 'expires': 0.0}
+_lock = threading.Lock()
+
+
+def init_slot_table(app):
+    """
+    SLOT_HORIZON_DAYS: days ahead kept in doctor_slots.
+    SLOT_REFRESH_SECONDS: how often each process moves the horizon forward (0 = never,
+    e.g. when `flask materialize-slots` runs from cron instead).
+    """
+    _state['days'] = int(app.config.get('SLOT_HORIZON_DAYS', 60))
+    _state['interval'] = int(app.config.get('SLOT_REFRESH_SECONDS', 3600))
+    app.before_request(lambda: _ensure_refresher(app))
+
+
+def _ensure_refresher(app):
+    # per process: the thread does not survive a fork
+    if not _state['interval'] or _state['pid'] == os.getpid():
+        return
+    with _lock:
+        if _state['pid'] == os.getpid():
+            return
+        _state['pid'] = os.getpid()
+        threading.Thread(target=_refresh_loop, args=(app,), name='slot-horizon', daemon=True).start()
+
+
+def _refresh_loop(app):
+    while True:
+        with app.app_context():
+            try:
+                extend_horizon()
+                db.session.commit()
+            except Exception:
+                # another process extending at the same moment, or a locked db; retried next round
+                db.session.rollback()
+                app.logger.exception('Extending the slot horizon failed')
+            finally:
+                db.session.remove()
+        time.sleep(_state['interval'])
+
+
+def get_horizon(conn=None):
+    conn = conn if conn is not None else db.session.connection()
+    row = conn.execute(select(SlotHorizon.first_day, SlotHorizon.last_day).where(SlotHorizon.id == 1)).first()
+    return (row.first_day, row.last_day) if row else None
+
+
+def _cached_horizon():
+    # a stale value is safe: rows inside it are only ever replaced within one
+    # transaction, and days added since then fall back to the on-the-fly path
+    now = time.monotonic()
+    if now >= _horizon_cache['expires']:
+        _horizon_cache['value'] = get_horizon()
+        _horizon_cache['expires'] = now + HORIZON_TTL
+    return _horizon_cache['value']
+
+
+def _set_horizon(conn, first_day, last_day):
+    _horizon_cache['expires'] = 0.0
+    values = {'first_day': first_day, 'last_day': last_day}
+    if not conn.execute(update(SlotHorizon).where(SlotHorizon.id == 1).values(**values)).rowcount:
+        conn.execute(insert(SlotHorizon).values(id=1, **values))
+
+
+def _covers(horizon, first_day, last_day=None):
+    # past days are dropped by the next refresh, so they never count as covered
+    if horizon is None:
+        return False
+    return max(horizon[0], date.today()) <= first_day and (last_day or first_day) <= horizon[1]
+
+
+def _blocker(appt_secs, appt_ids, slot_secs):
+    # same ±5 minute rule as scheduling.is_clashing, but returns who blocks the slot
+    idx = bisect_right(appt_secs, slot_secs - CLASH_SECONDS)
+    if idx < len(appt_secs) and appt_secs[idx] < slot_secs + CLASH_SECONDS:
+        return appt_ids[idx]
+    return None
+
+
+def _appointments_by_day(conn, doctor_ids, first_day, last_day):
+    # every appointment counts, like in the on-the-fly search
+    stmt = (select(Appointment.doctor_id, Appointment.date, Appointment.time, Appointment.id)
+            .where(Appointment.date >= first_day, Appointment.date <= last_day)
+            .order_by(Appointment.doctor_id, Appointment.date, Appointment.time))
+    if doctor_ids is not None:
+        stmt = stmt.where(Appointment.doctor_id.in_(doctor_ids))
+    by_day = {}
+    for doctor_id, appt_date, appt_time, appt_id in conn.execute(stmt):
+        secs, ids = by_day.setdefault((doctor_id, appt_date), ([], []))
+        secs.append(time_to_seconds(appt_time))
+        ids.append(appt_id)
+    return by_day
+
+
+def _materialize(conn, doctor_ids, first_day, last_day):
+    """
+    Inserts the slot rows of [first_day, last_day] for the given doctors
+    (None = all). Returns the number of rows written.
+    """
+    if first_day > last_day:
+        return 0
+    stmt = (select(DoctorAvailability.doctor_id, DoctorAvailability.day_of_week,
+                   DoctorAvailability.start_time, DoctorAvailability.end_time)
+            .order_by(DoctorAvailability.doctor_id, DoctorAvailability.id))
+    if doctor_ids is not None:
+        stmt = stmt.where(DoctorAvailability.doctor_id.in_(doctor_ids))
+    weekly = {}
+    for doctor_id, dow, start_t, end_t in conn.execute(stmt):
+        weekly.setdefault(doctor_id, {}).setdefault(dow, []).append((start_t, end_t))
+    if not weekly:
+        return 0
+    booked = _appointments_by_day(conn, list(weekly) if doctor_ids is not None else None, first_day, last_day)
+
+    pending = []
+    written = 0
+    for doctor_id, week in weekly.items():
+        day = first_day
+        while day <= last_day:
+            windows = week.get(day.weekday())
+            if windows:
+                appt_secs, appt_ids = booked.get((doctor_id, day), ((), ()))
+                # overlapping windows would list a time twice
+                for slot_time in dict.fromkeys(free_slots(windows, [], day, SLOT_MINUTES)):
+                    pending.append({'doctor_id': doctor_id, 'date': day, 'time': slot_time,
+                                    'appointment_id': _blocker(appt_secs, appt_ids, time_to_seconds(slot_time))})
+            day += timedelta(days=1)
+            if len(pending) >= INSERT_CHUNK:
+                conn.execute(insert(DoctorSlot), pending)
+                written += len(pending)
+                pending = []
+    if pending:
+        conn.execute(insert(DoctorSlot), pending)
+        written += len(pending)
+    return written
+
+
+def rebuild_slots(conn=None, days=None):
+    """
+    Recreates doctor_slots for today and the next `days` - 1 days. Returns the row count.
+    """
+    conn = conn if conn is not None else db.session.connection()
+    first_day = date.today()
+    last_day = first_day + timedelta(days=(days or _state['days']) - 1)
+    conn.execute(delete(DoctorSlot))
+    written = _materialize(conn, None, first_day, last_day)
+    _set_horizon(conn, first_day, last_day)
+    return written
+
+
+def extend_horizon(conn=None):
+    """
+    Drops past days and materializes the days that came into the horizon
+    since the last run. Returns the number of new rows.
+    """
+    conn = conn if conn is not None else db.session.connection()
+    horizon = get_horizon(conn)
+    today = date.today()
+    if horizon is None or horizon[1] < today:
+        return rebuild_slots(conn)
+    last_day = today + timedelta(days=_state['days'] - 1)
+    if horizon[0] < today:
+        conn.execute(delete(DoctorSlot).where(DoctorSlot.date < today))
+    written = _materialize(conn, None, horizon[1] + timedelta(days=1), last_day)
+    _set_horizon(conn, today, max(last_day, horizon[1]))
+    return written
+
+
+def rebuild_doctor_slots(doctor_id, conn=None):
+    """
+    Regenerates one doctor's rows after their weekly availability changed.
+    """
+    conn = conn if conn is not None else db.session.connection()
+    horizon = get_horizon(conn)
+    if horizon is None:
+        return 0
+    conn.execute(delete(DoctorSlot).where(DoctorSlot.doctor_id == doctor_id))
+    return _materialize(conn, [doctor_id], horizon[0], horizon[1])
+
+
+def _refresh_day(conn, doctor_id, day):
+    slots = conn.execute(select(DoctorSlot.time, DoctorSlot.appointment_id)
+                         .where(DoctorSlot.doctor_id == doctor_id, DoctorSlot.date == day)).all()
+    if not slots:
+        return
+    appt_secs, appt_ids = _appointments_by_day(conn, [doctor_id], day, day).get((doctor_id, day), ((), ()))
+    changes = []
+    for slot_time, current in slots:
+        blocker = _blocker(appt_secs, appt_ids, time_to_seconds(slot_time))
+        if blocker != current:
+            changes.append({'b_doctor': doctor_id, 'b_date': day, 'b_time': slot_time, 'b_appt': blocker})
+    if changes:
+        table = DoctorSlot.__table__
+        conn.execute(update(table)
+                     .where(table.c.doctor_id == bindparam('b_doctor'), table.c.date == bindparam('b_date'),
+                            table.c.time == bindparam('b_time'))
+                     .values(appointment_id=bindparam('b_appt')), changes)
+
+
+def _previous(obj, name):
+    history = inspect(obj).attrs[name].history
+    return history.deleted[0] if history.deleted else getattr(obj, name)
+
+
+def _moves(obj):
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in SLOT_FIELDS)
+
+
+@event.listens_for(Session, 'before_flush')
+def _drop_deleted_doctor_slots(session, flush_context, instances):
+    doctor_ids = [obj.id for obj in session.deleted if isinstance(obj, Doctor) and obj.id]
+    if doctor_ids:
+        session.connection().execute(delete(DoctorSlot).where(DoctorSlot.doctor_id.in_(doctor_ids)))
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_doctor_slots(session, flush_context):
+    # the slot rows of every touched doctor/day are recomputed in the same transaction
+    days = set()
+    for obj in session.new:
+        if isinstance(obj, Appointment):
+            days.add((obj.doctor_id, obj.date))
+    for obj in session.deleted:
+        if isinstance(obj, Appointment):
+            days.add((_previous(obj, 'doctor_id'), _previous(obj, 'date')))
+    for obj in session.dirty:
+        if isinstance(obj, Appointment) and _moves(obj):
+            days.add((obj.doctor_id, obj.date))
+            days.add((_previous(obj, 'doctor_id'), _previous(obj, 'date')))
+    if not days:
+        return
+    conn = session.connection()
+    horizon = get_horizon(conn)
+    for doctor_id, day in days:
+        if _covers(horizon, day):
+            _refresh_day(conn, doctor_id, day)
+
+
+def slot_state(doctor_id, day, slot_time):
+    """
+    'free', 'taken' or 'missing' (no such slot) from one primary-key lookup;
+    None when the day lies outside the materialized horizon.
+    """
+    if not _covers(_cached_horizon(), day):
+        return None
+    row = (db.session.query(DoctorSlot.appointment_id)
+           .filter(DoctorSlot.doctor_id == doctor_id, DoctorSlot.date == day, DoctorSlot.time == slot_time)
+           .first())
+    if row is None:
+        return 'missing'
+    return 'free' if row.appointment_id is None else 'taken'
+
+
+def booking_problem(doctor, day, slot_time, exclude_appt_id=None):
+    """
+    The booking rule of every route: inside one of the doctor's weekly windows
+    and not less than 5 minutes from another appointment. None when the time
+    can be booked, else 'unavailable' or 'conflict'. A grid slot inside the
+    horizon is answered by its doctor_slots row; off-grid times and days past
+    the horizon are checked against the windows and appointments, with the same result.
+    """
+    state = slot_state(doctor.id, day, slot_time)
+    if state == 'free':
+        return None
+    if state == 'taken' and exclude_appt_id is None:
+        return 'conflict'
+    # off the grid, past the horizon, or maybe blocked by the appointment being moved
+    if not doctor_is_available(doctor, day, slot_time):
+        return 'unavailable'
+    if doctor_has_conflict(doctor.id, day, slot_time, exclude_appt_id=exclude_appt_id):
+        return 'conflict'
+    return None
+
+
+def _free_rows(doctor_ids, first_day, last_day):
+    return (db.session.query(DoctorSlot.doctor_id, DoctorSlot.date, DoctorSlot.time)
+            .filter(DoctorSlot.date >= first_day, DoctorSlot.date <= last_day,
+                    DoctorSlot.doctor_id.in_(doctor_ids), DoctorSlot.appointment_id.is_(None))
+            .order_by(DoctorSlot.date, DoctorSlot.doctor_id, DoctorSlot.time)
+            .all())
+
+
+def available_slots_bulk(doctors, appt_date, slot_minutes=SLOT_MINUTES):
+    """
+    Same result as scheduling.get_available_slots_bulk, read from doctor_slots
+    with one indexed range query when the date is materialized.
+    """
+    if slot_minutes != SLOT_MINUTES or not _covers(_cached_horizon(), appt_date):
+        return get_available_slots_bulk(doctors, appt_date, slot_minutes)
+    doctor_ids = [doc.id for doc in doctors]
+    slots_data = {}
+    for start in range(0, len(doctor_ids), ID_CHUNK):
+        for doctor_id, _, slot_time in _free_rows(doctor_ids[start:start + ID_CHUNK], appt_date, appt_date):
+            slots_data.setdefault(doctor_id, []).append(slot_time)
+    return slots_data
+
+
+def get_available_slots(doctor, appt_date, slot_minutes=30):
+    """
+    Returns available time slots
+    Uses DoctorAvailability entries and excludes already-booked appointment times.
+    """
+    return available_slots_bulk([doctor], appt_date, slot_minutes).get(doctor.id, [])
+
+
+def available_slots_range(doctor_id, from_date, to_date, slot_minutes=SLOT_MINUTES):
+    """
+    Same result as scheduling.slots_for_range, from doctor_slots when the range is materialized.
+    """
+    if slot_minutes != SLOT_MINUTES or not _covers(_cached_horizon(), from_date, to_date):
+        return slots_for_range(doctor_id, from_date, to_date, slot_minutes)
+    by_day = {from_date + timedelta(days=n): [] for n in range((to_date - from_date).days + 1)}
+    for _, day, slot_time in _free_rows([doctor_id], from_date, to_date):
+        by_day[day].append(slot_time)
+    return by_day
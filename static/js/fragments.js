@@ -0,0 +1,58 @@
+// Loads the lazy sections of a page (see patient_dashboard.html):
+//   <div data-fragment="/url">placeholder</div> is replaced by the HTML at /url once it
+//   becomes visible (collapsed rows load when opened);
+//   <a data-fragment-link href="/url"> inside a loaded section reloads that section from /url.
+(function () {
+  function load(container, url) {
+    container.setAttribute('aria-busy', 'true');
+    fetch(url, { credentials: 'same-origin', headers: { 'X-Requested-With': 'fetch' } })
+      .then(function (resp) {
+        if (resp.status === 401) {
+          // session expired: the full page redirects to the login form
+          window.location.reload();
+          return null;
+        }
+        if (!resp.ok) throw new Error(resp.status);
+        return resp.text();
+      })
+      .then(function (html) {
+        if (html === null) return;
+        container.innerHTML = html;
+        container.dataset.loaded = '1';
+        watch(container);
+      })
+      .catch(function () {
+        container.innerHTML = '<div class="small text-danger">Could not load this section. ' +
+          '<a href="' + url + '" data-fragment-link>Retry</a></div>';
+      })
+      .finally(function () {
+        container.removeAttribute('aria-busy');
+      });
+  }
+
+  const observer = window.IntersectionObserver ? new IntersectionObserver(function (entries) {
+    entries.forEach(function (entry) {
+      if (!entry.isIntersecting) return;
+      observer.unobserve(entry.target);
+      load(entry.target, entry.target.dataset.fragment);
+    });
+  }) : null;
+
+  function watch(root) {
+    root.querySelectorAll('[data-fragment]:not([data-loaded])').forEach(function (el) {
+      if (observer) observer.observe(el);
+      else load(el, el.dataset.fragment);
+    });
+  }
+
+  document.addEventListener('click', function (event) {
+    const link = event.target.closest('a[data-fragment-link]');
+    if (!link) return;
+    const container = link.closest('[data-fragment]');
+    if (!container) return;
+    event.preventDefault();
+    load(container, link.getAttribute('href'));
+  });
+
+  watch(document);
+})();
@@ -0,0 +1,106 @@
+// Keeps a dashboard appointment table current from /events/appointments (see events.py).
+// When the server has no stream to spare (503, see SSE_MAX_CONNECTIONS) it polls data-poll-url instead.
+// The table carries its settings as data attributes:
+//   data-stream-url, data-poll-url, data-row-url (with appointment id 0), data-order ('asc' | 'desc'),
+//   data-doctor-id (doctor dashboard only), data-has-previous / data-has-next ('1' | '0').
+(function () {
+  const table = document.querySelector('table[data-live-appointments]');
+  if (!table) return;
+  const body = table.tBodies[0];
+  const opts = table.dataset;
+  const BADGES = { Booked: 'bg-primary', Completed: 'bg-success' };
+
+  function findRow(id) {
+    return body.querySelector('tr[data-appt-id="' + id + '"]');
+  }
+
+  function badge(status) {
+    const span = document.createElement('span');
+    span.className = 'badge ' + (BADGES[status] || 'bg-danger');
+    span.textContent = status;
+    return span;
+  }
+
+  function comesBefore(a, b) {
+    return opts.order === 'desc' ? a > b : a < b;
+  }
+
+  // moves/inserts a row to its sorted position, or drops it when it belongs to another page
+  function place(row) {
+    const when = row.dataset.when;
+    const rows = Array.from(body.querySelectorAll('tr[data-appt-id]')).filter(r => r !== row);
+    const next = rows.find(r => comesBefore(when, r.dataset.when));
+    if ((next && next === rows[0] && opts.hasPrevious === '1') || (!next && rows.length && opts.hasNext === '1')) {
+      row.remove();
+      return;
+    }
+    body.insertBefore(row, next || null);
+    const empty = body.querySelector('tr:not([data-appt-id])');
+    if (empty) empty.remove();
+    row.classList.add('table-warning');
+    setTimeout(() => row.classList.remove('table-warning'), 3000);
+  }
+
+  function patch(row, ev) {
+    row.querySelector('[data-field="date"]').textContent = ev.date;
+    row.querySelector('[data-field="time"]').textContent = ev.time;
+    row.querySelector('[data-field="status"]').replaceChildren(badge(ev.status));
+    const doctorCell = row.querySelector('[data-field="doctor_name"]');
+    if (doctorCell && ev.doctor_name) doctorCell.textContent = ev.doctor_name;
+    row.dataset.when = ev.date + 'T' + ev.time;
+    place(row);
+  }
+
+  function insert(id) {
+    fetch(opts.rowUrl.replace('/0/', '/' + id + '/'), { credentials: 'same-origin' })
+      .then(resp => (resp.ok ? resp.text() : null))
+      .then(html => {
+        if (!html || findRow(id)) return;
+        const tpl = document.createElement('template');
+        tpl.innerHTML = html.trim();
+        if (tpl.content.firstElementChild) place(tpl.content.firstElementChild);
+      });
+  }
+
+  function apply(ev) {
+    const row = findRow(ev.id);
+    const ours = !opts.doctorId || String(ev.doctor_id) === opts.doctorId;
+    if (ev.type === 'deleted' || !ours) {
+      if (row) row.remove();
+    } else if (row) {
+      // polls repeat a few seconds of changes; leave rows that are already current alone
+      const status = row.querySelector('[data-field="status"]');
+      if (row.dataset.when !== ev.date + 'T' + ev.time || !status || status.textContent.trim() !== ev.status) {
+        patch(row, ev);
+      }
+    } else {
+      insert(ev.id);
+    }
+  }
+
+  function poll(since) {
+    const url = opts.pollUrl + (since ? '?since=' + encodeURIComponent(since) : '');
+    fetch(url, { credentials: 'same-origin' })
+      .then(resp => (resp.ok ? resp.json() : null))
+      .then(data => {
+        if (!data) return setTimeout(() => poll(since), 15000);
+        if (data.resync) return window.location.reload();
+        data.events.forEach(apply);
+        setTimeout(() => poll(data.since), data.poll_seconds * 1000);
+      })
+      .catch(() => setTimeout(() => poll(since), 15000));
+  }
+
+  if (!window.EventSource) {
+    poll(null);
+    return;
+  }
+  const source = new EventSource(opts.streamUrl);
+  source.addEventListener('appointment', msg => apply(JSON.parse(msg.data)));
+  // the server dropped events for this page: start over from a fresh render
+  source.addEventListener('resync', () => window.location.reload());
+  // a refused stream (503) is not retried by the browser: poll from here on
+  source.addEventListener('error', () => {
+    if (source.readyState === EventSource.CLOSED && opts.pollUrl) poll(null);
+  });
+})();
@@ -0,0 +1,197 @@
+import threading
+import time
+from datetime import date
+
+from sqlalchemy import delete, event, func, inspect, insert, literal, select, union_all, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from models import db, Doctor, Patient, Appointment, ArchivedAppointment, StatCounter, StatDelta
+
+APPOINTMENT_STATUSES = ('Booked', 'Completed', 'Cancelled')
+# "upcoming" depends on today's date, so it is cached instead of counted incrementally
+UPCOMING_TTL_SECONDS = 60
+# the dashboard folds stat_deltas into stat_counters once this many rows are pending
+FOLD_AFTER_DELTAS = 1000
+
+COUNTED_MODELS = {Doctor: 'doctors', Patient: 'patients', Appointment: 'appointments'}
+
+_upcoming_cache = {'value': None, 'day': None, 'at': 0.0}
+_cache_lock = threading.Lock()
+
+
+def status_counter(status):
+    return f'appointments_status_{status}'
+
+
+def counter_names():
+    return list(COUNTED_MODELS.values()) + [status_counter(s) for s in APPOINTMENT_STATUSES]
+
+
+def invalidate_upcoming():
+    with _cache_lock:
+        _upcoming_cache['value'] = None
+
+
+def _count_deltas(session):
+    deltas = {}
+
+    def bump(name, amount):
+        deltas[name] = deltas.get(name, 0) + amount
+
+    for obj in session.new:
+        name = COUNTED_MODELS.get(type(obj))
+        if name:
+            bump(name, 1)
+        if isinstance(obj, Appointment) and obj.status:
+            bump(status_counter(obj.status), 1)
+
+    for obj in session.deleted:
+        name = COUNTED_MODELS.get(type(obj))
+        if name:
+            bump(name, -1)
+        if isinstance(obj, Appointment):
+            # the status as loaded from the database
+            old_status = inspect(obj).attrs.status.history.deleted or [obj.status]
+            if old_status[0]:
+                bump(status_counter(old_status[0]), -1)
+
+    for obj in session.dirty:
+        if not isinstance(obj, Appointment):
+            continue
+        history = inspect(obj).attrs.status.history
+        if history.deleted and history.added and history.deleted[0] != history.added[0]:
+            bump(status_counter(history.deleted[0]), -1)
+            bump(status_counter(history.added[0]), 1)
+    return {name: amount for name, amount in deltas.items() if amount}
+
+
+def _moves_upcoming(session):
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Appointment):
+            return True
+    for obj in session.dirty:
+        if isinstance(obj, Appointment) and inspect(obj).attrs.date.history.has_changes():
+            return True
+    return False
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_counter_deltas(session, flush_context):
+    # runs inside the flushing transaction, so deltas commit/roll back with the rows;
+    # only inserts, so concurrent bookings do not queue up on the counter rows
+    if _moves_upcoming(session):
+        invalidate_upcoming()
+    deltas = _count_deltas(session)
+    if not deltas:
+        return
+    session.connection().execute(insert(StatDelta), [{'name': name, 'amount': amount}
+                                                     for name, amount in deltas.items()])
+
+
+def fold_deltas(conn):
+    """
+    Adds the pending stat_deltas to stat_counters and deletes them. Returns the
+    number of rows folded, or None if a concurrent fold took some of them first
+    (the caller must roll back then).
+    """
+    upto = conn.execute(select(func.max(StatDelta.id))).scalar()
+    if upto is None:
+        return 0
+    sums = conn.execute(select(StatDelta.name, func.sum(StatDelta.amount), func.count())
+                        .where(StatDelta.id <= upto).group_by(StatDelta.name)).all()
+    pending = sum(rows for _, _, rows in sums)
+    if conn.execute(delete(StatDelta).where(StatDelta.id <= upto)).rowcount != pending:
+        return None
+    for name, amount, _ in sums:
+        if amount:
+            conn.execute(update(StatCounter).where(StatCounter.name == name)
+                         .values(value=StatCounter.value + amount))
+    return pending
+
+
+def recompute_counters(conn=None):
+    """
+    Recounts every counter with COUNT(*) and stores the result.
+    Returns {name: (stored_before, actual)} so callers can report drift.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = db.session.connection()
+
+    actual = {name: conn.execute(select(func.count()).select_from(model)).scalar()
+              for model, name in COUNTED_MODELS.items()}
+    by_status = {}
+    # archived appointments (archive.py) still count towards the totals
+    for model in (Appointment, ArchivedAppointment):
+        for status, count in conn.execute(select(model.status, func.count()).group_by(model.status)):
+            by_status[status] = by_status.get(status, 0) + count
+    actual['appointments'] += conn.execute(select(func.count()).select_from(ArchivedAppointment)).scalar()
+    for status in APPOINTMENT_STATUSES:
+        actual[status_counter(status)] = by_status.get(status, 0)
+
+    stored = dict(conn.execute(select(StatCounter.name, StatCounter.value)).all())
+    report = {}
+    for name, value in actual.items():
+        report[name] = (stored.get(name), value)
+        if name in stored:
+            conn.execute(update(StatCounter).where(StatCounter.name == name).values(value=value))
+        else:
+            conn.execute(StatCounter.__table__.insert().values(name=name, value=value))
+    # the recount already contains whatever the deltas recorded
+    conn.execute(delete(StatDelta))
+
+    if own_conn:
+        db.session.commit()
+    invalidate_upcoming()
+    return report
+
+
+def upcoming_count():
+    today = date.today()
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _upcoming_cache['value']
+        if cached is not None and _upcoming_cache['day'] == today \
+                and now - _upcoming_cache['at'] < UPCOMING_TTL_SECONDS:
+            return cached
+    value = Appointment.query.filter(Appointment.date >= today).count()
+    with _cache_lock:
+        _upcoming_cache.update(value=value, day=today, at=now)
+    return value
+
+
+def _fold_pending():
+    try:
+        if fold_deltas(db.session.connection()) is None:
+            db.session.rollback()
+        else:
+            db.session.commit()
+    except OperationalError:
+        # locked by a writer; the next dashboard load tries again
+        db.session.rollback()
+
+
+def admin_stats():
+    """
+    Dashboard totals: counters plus pending deltas (one query) and the cached
+    upcoming count. Folds the deltas once FOLD_AFTER_DELTAS have piled up.
+    """
+    rows = union_all(
+        select(StatCounter.name, StatCounter.value.label('amount'), literal(0).label('pending')),
+        select(StatDelta.name, StatDelta.amount, literal(1)),
+    ).subquery()
+    stored, pending = {}, 0
+    for name, amount, deltas in db.session.execute(
+            select(rows.c.name, func.sum(rows.c.amount), func.sum(rows.c.pending)).group_by(rows.c.name)):
+        stored[name] = amount
+        pending += deltas
+    if pending >= FOLD_AFTER_DELTAS:
+        _fold_pending()
+    return {
+        'doctors': stored.get('doctors', 0),
+        'patients': stored.get('patients', 0),
+        'appointments': stored.get('appointments', 0),
+        'upcoming': upcoming_count(),
+        'by_status': {s: stored.get(status_counter(s), 0) for s in APPOINTMENT_STATUSES},
+    }
@@ -0,0 +1,18 @@
+import pytest
+
+from models import db
+from tests.support import scratch_app
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = scratch_app(str(tmp_path))
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,67 @@
+"""
+Parallel bookings of contested slots, for test_reservations.py and the
+stress-bookings command.
+"""
+import threading
+from datetime import date, time as dtime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, Appointment
+from reservations import CLAIM_MINUTES, _sync_slot_claims
+from tests.support import add_doctor, add_patient, log_in
+
+
+def clashes(doctor_id):
+    """(active appointments, pairs less than CLASH_SECONDS apart) of one doctor."""
+    rows = (db.session.query(Appointment.date, Appointment.time)
+            .filter(Appointment.doctor_id == doctor_id, Appointment.status != 'Cancelled')
+            .order_by(Appointment.date, Appointment.time).all())
+    pairs = 0
+    for (d1, t1), (d2, t2) in zip(rows, rows[1:]):
+        if d1 == d2 and (t2.hour * 60 + t2.minute) - (t1.hour * 60 + t1.minute) < CLAIM_MINUTES:
+            pairs += 1
+    return len(rows), pairs
+
+
+def stress_bookings(app, threads=16, rounds=20, with_claims=True):
+    """
+    Lets `threads` patients book times 0-5 minutes apart of one doctor at the
+    same moment, `rounds` times, through the booking route. Use a scratch app.
+    Returns (attempts, booked, double bookings).
+    """
+    with app.app_context():
+        doctor_id = add_doctor('stress-doc', start=dtime(0, 0), end=dtime(23, 59)).id
+        patient_ids = [add_patient(f'stress-pat-{n}').id for n in range(threads)]
+        db.session.commit()
+
+    if not with_claims:
+        event.remove(Session, 'after_flush', _sync_slot_claims)
+    try:
+        barrier = threading.Barrier(threads)
+        first_day = date.today() + timedelta(days=365)
+
+        def patient(idx):
+            client = app.test_client()
+            log_in(client, patient_id=patient_ids[idx])
+            for rnd in range(rounds):
+                # every thread aims at 09:00 .. 09:05, so some pairs are exactly 5 minutes apart
+                barrier.wait()
+                client.post('/patient/appointment/book', data={
+                    'doctor_id': doctor_id, 'date': (first_day + timedelta(days=rnd)).isoformat(),
+                    'time': f'09:0{idx % (CLAIM_MINUTES + 1)}',
+                })
+
+        workers = [threading.Thread(target=patient, args=(idx,)) for idx in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        if not with_claims:
+            event.listen(Session, 'after_flush', _sync_slot_claims)
+
+    with app.app_context():
+        booked, pairs = clashes(doctor_id)
+    return threads * rounds, booked, pairs
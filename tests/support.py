@@ -0,0 +1,76 @@
+"""
+Scratch apps and rows for the tests (and the stress-bookings command):
+every app gets its own SQLite file and upload folder in a throwaway directory.
+"""
+import contextlib
+import io
+import os
+from datetime import time as dtime
+
+import directory
+import slot_table
+import stats
+from app import create_app
+from models import db, init_db, Admin, Doctor, DoctorAvailability, Patient
+
+
+def reset_caches():
+    # per-process snapshots keyed by versions that restart at 0 in every new database
+    directory._cache['directory'] = None
+    slot_table._horizon_cache.update(value=None, expires=0.0)
+    stats.invalidate_upcoming()
+
+
+def scratch_app(scratch_dir, **config):
+    """
+    The app on scratch_dir/scratch.db with the full schema (migrations, search
+    tables, the default admin) and uploads in scratch_dir/uploads.
+    """
+    settings = {
+        'TESTING': True,
+        'DATABASE_URL': 'sqlite:///' + os.path.join(scratch_dir, 'scratch.db'),
+        'UPLOAD_FOLDER': os.path.join(scratch_dir, 'uploads'),
+        'SLOT_REFRESH_SECONDS': 0,
+        # fast hashes; the cost is not what these tests look at
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    }
+    settings.update(config)
+    reset_caches()
+    scratch = create_app(settings)
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db(scratch)
+    return scratch
+
+
+def add_doctor(username, start=dtime(9, 0), end=dtime(12, 0), specialization='General'):
+    """A doctor available start..end on every weekday; call inside an app context."""
+    doctor = Doctor(name=f'Dr {username}', specialization=specialization, username=username, password_hash='!')
+    db.session.add(doctor)
+    db.session.flush()
+    for dow in range(7):
+        db.session.add(DoctorAvailability(doctor_id=doctor.id, day_of_week=dow, start_time=start, end_time=end))
+    db.session.flush()
+    return doctor
+
+
+def add_patient(username):
+    patient = Patient(name=f'Patient {username}', username=username, password_hash='!')
+    db.session.add(patient)
+    db.session.flush()
+    return patient
+
+
+def admin_id():
+    return Admin.query.first().id
+
+
+def log_in(client, **ids):
+    # e.g. log_in(client, patient_id=3): what the login forms put in the session
+    with client.session_transaction() as sess:
+        sess.clear()
+        sess.update(ids)
+
+
+def flashes(client):
+    with client.session_transaction() as sess:
+        return [message for _, message in sess.pop('_flashes', [])]
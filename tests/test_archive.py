@@ -0,0 +1,31 @@
+from datetime import date, time as dtime, timedelta
+
+from archive import archive_appointments
+from models import db, Appointment, ArchivedAppointment, Treatment
+from tests.support import add_doctor, add_patient
+
+
+def _completed(doctor_id, patient_id, hour):
+    appt = Appointment(patient_id=patient_id, doctor_id=doctor_id, date=date.today() - timedelta(days=30),
+                       time=dtime(hour, 0), status='Completed')
+    db.session.add(appt)
+    db.session.flush()
+    treatment = Treatment(appointment_id=appt.id, diagnosis='archive check')
+    db.session.add(treatment)
+    db.session.commit()
+    return appt.id, treatment.id
+
+
+def test_archived_ids_are_never_handed_out_again(app):
+    # the newest rows leave the hot tables; without AUTOINCREMENT SQLite would reuse their ids
+    with app.app_context():
+        doctor_id, patient_id = add_doctor('archive-doc').id, add_patient('archive-pat').id
+        db.session.commit()
+        first = _completed(doctor_id, patient_id, 9)
+        archive_appointments(older_than_days=1)
+        second = _completed(doctor_id, patient_id, 10)
+        assert second[0] > first[0]
+        assert second[1] > first[1]
+        # a reused id would collide with its archived copy here
+        archive_appointments(older_than_days=1)
+        assert ArchivedAppointment.query.count() == 2
@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+import pytest
+
+from models import db
+from slot_table import get_horizon, rebuild_slots
+from tests.support import add_doctor, add_patient, flashes, log_in
+
+# (time, expected outcome) booked in this order on one day; 09:00-12:00 is the doctor's window
+BOOKING_RULE_CASES = (
+    ('09:10', 'booked'),       # off the 30-minute grid
+    ('09:30', 'booked'),
+    ('09:33', 'conflict'),     # 3 minutes after 09:30
+    ('09:35', 'booked'),       # exactly 5 minutes after 09:30
+    ('09:00', 'booked'),       # grid slot 10 minutes before the off-grid 09:10
+    ('09:07', 'conflict'),     # off the grid, 3 minutes before 09:10
+    ('12:10', 'unavailable'),  # outside the window
+)
+
+
+def _outcome(messages):
+    text = ' '.join(messages)
+    if 'successfully' in text:
+        return 'booked'
+    if 'not available' in text:
+        return 'unavailable'
+    if 'another appointment' in text:
+        return 'conflict'
+    return text or 'no answer'
+
+
+@pytest.mark.parametrize('days_past_horizon', [0, 1], ids=['inside the horizon', 'past the horizon'])
+def test_one_booking_rule_on_both_sides_of_the_horizon(app, client, days_past_horizon):
+    # doctor_slots answers inside the horizon, the weekly windows past it
+    with app.app_context():
+        doctor_id, patient_id = add_doctor('rule-doc').id, add_patient('rule-pat').id
+        rebuild_slots(days=3)
+        db.session.commit()
+        day = get_horizon()[1] + timedelta(days=days_past_horizon)
+    log_in(client, patient_id=patient_id)
+    outcomes = []
+    for slot_time, _ in BOOKING_RULE_CASES:
+        client.post('/patient/appointment/book', data={
+            'doctor_id': doctor_id, 'date': day.isoformat(), 'time': slot_time,
+        })
+        outcomes.append((slot_time, _outcome(flashes(client))))
+    assert outcomes == [(slot_time, expected) for slot_time, expected in BOOKING_RULE_CASES]
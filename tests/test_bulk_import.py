@@ -0,0 +1,34 @@
+from datetime import date, time as dtime, timedelta
+
+from bulk_import import import_appointments
+from models import db, Appointment
+from scheduling import doctor_has_conflict
+from tests.support import add_doctor, add_patient
+
+DAY = date.today() + timedelta(days=3)
+
+
+def _csv(tmp_path, rows):
+    path = tmp_path / 'appointments.csv'
+    path.write_text('doctor_username,patient_username,date,time,status\n'
+                    + ''.join(f'imp-doc,imp-pat,{DAY},{at},{status}\n' for at, status in rows))
+    return str(path)
+
+
+def test_cancelled_appointments_block_like_booking(app, tmp_path):
+    with app.app_context():
+        doctor, patient = add_doctor('imp-doc'), add_patient('imp-pat')
+        db.session.add(Appointment(patient_id=patient.id, doctor_id=doctor.id, date=DAY, time=dtime(9, 0),
+                                   status='Cancelled'))
+        db.session.commit()
+        # the booking check refuses 09:02 next to the cancelled 09:00 ...
+        assert doctor_has_conflict(doctor.id, DAY, dtime(9, 2))
+        report = import_appointments(_csv(tmp_path, [
+            ('09:02', 'Booked'),      # ... and so does the import
+            ('10:00', 'Cancelled'),   # needs no free slot
+            ('10:03', 'Completed'),   # but blocks the rows after it, like booking
+            ('10:05', 'Booked'),      # exactly 5 minutes after 10:00
+        ]))
+        assert (report.imported, report.errors) == (2, 2)
+        imported = {appt.time for appt in Appointment.query.filter(Appointment.time > dtime(9, 0))}
+        assert imported == {dtime(10, 0), dtime(10, 5)}
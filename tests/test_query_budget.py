@@ -0,0 +1,47 @@
+from datetime import date, time as dtime, timedelta
+
+import pytest
+
+from models import db, Appointment, PatientRecord, Treatment
+from querycount import assert_query_budget
+from tests.support import add_doctor, add_patient, admin_id, log_in
+
+# statements per request on a cold worker, as measured; none of them may grow with the rows
+BUDGETS = [
+    ('admin_id', '/admin/dashboard', 8),
+    ('doctor_id', '/doctor/dashboard', 3),
+    ('patient_id', '/patient/dashboard', 4),
+    ('patient_id', '/patient/dashboard/search', 2),
+    ('patient_id', '/patient/dashboard/upcoming', 1),
+    ('patient_id', '/patient/dashboard/history', 1),
+    ('patient_id', '/patient/dashboard/records', 1),
+    ('patient_id', '/patient/dashboard/treatments', 1),
+]
+
+
+@pytest.fixture
+def users(app):
+    # enough doctors, appointments, treatments and records that an N+1 would show
+    with app.app_context():
+        doctors = [add_doctor(f'budget-doc-{n}') for n in range(5)]
+        patient = add_patient('budget-pat')
+        for n, doctor in enumerate(doctors):
+            for days in (-14, -7, 7, 14):
+                appt = Appointment(patient_id=patient.id, doctor_id=doctor.id,
+                                   date=date.today() + timedelta(days=days), time=dtime(9, 5 * n),
+                                   status='Completed' if days < 0 else 'Booked')
+                db.session.add(appt)
+                db.session.flush()
+                if days < 0:
+                    db.session.add(Treatment(appointment_id=appt.id, diagnosis=f'visit {n}'))
+            db.session.add(PatientRecord(patient_id=patient.id, filename=f'budget-{n}.pdf',
+                                         original_name=f'scan {n}.pdf'))
+        db.session.commit()
+        return {'admin_id': admin_id(), 'doctor_id': doctors[0].id, 'patient_id': patient.id}
+
+
+@pytest.mark.parametrize('role, url, budget', BUDGETS)
+def test_query_budget(client, users, role, url, budget):
+    log_in(client, **{role: users[role]})
+    with assert_query_budget(budget, max_repeats=1):
+        assert client.get(url).status_code == 200
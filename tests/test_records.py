@@ -0,0 +1,110 @@
+import io
+import os
+import uuid
+from datetime import date, timedelta
+
+import pytest
+
+import record_store
+from models import db, PatientRecord, RecordBlob
+from tests.support import add_doctor, add_patient, flashes, log_in
+
+BYPASS_URLS = (
+    '/static/uploads/{path}',
+    '/static/./uploads/{path}',
+    '/static/js/../uploads/{path}',
+    '/static/js/..%2Fuploads/{path}',
+    '/static/js/%2E%2E/uploads/{path}',
+)
+
+
+@pytest.fixture
+def record(app, client):
+    with app.app_context():
+        doctor_id, patient_id = add_doctor('rec-doc').id, add_patient('rec-pat').id
+        db.session.commit()
+    log_in(client, patient_id=patient_id)
+    client.post('/patient/appointment/book', data={
+        'doctor_id': doctor_id, 'date': (date.today() + timedelta(days=1)).isoformat(), 'time': '09:00',
+        'record': (io.BytesIO(b'%PDF-1.4 scan'), 'scan.pdf'),
+    }, content_type='multipart/form-data')
+    with app.app_context():
+        rec = PatientRecord.query.filter_by(patient_id=patient_id).one()
+        return rec.id, rec.filename, patient_id
+
+
+def test_uploads_live_outside_static(app, record):
+    _, filename, _ = record
+    upload_root = os.path.realpath(app.config['UPLOAD_FOLDER'])
+    assert os.path.isfile(os.path.join(upload_root, filename))
+    assert not upload_root.startswith(os.path.realpath(app.static_folder) + os.sep)
+
+
+def test_owner_downloads_through_the_route(client, record):
+    record_id, _, patient_id = record
+    resp = client.get(f'/records/{record_id}/download')
+    assert resp.status_code == 200
+    assert resp.data == b'%PDF-1.4 scan'
+
+
+def test_anonymous_and_other_patients_are_refused(app, client, record):
+    record_id, _, _ = record
+    log_in(client)
+    assert client.get(f'/records/{record_id}/download').status_code == 302
+    with app.app_context():
+        other = add_patient('rec-other').id
+        db.session.commit()
+    log_in(client, patient_id=other)
+    assert client.get(f'/records/{record_id}/download').status_code == 403
+
+
+@pytest.mark.parametrize('url', BYPASS_URLS)
+def test_static_urls_never_reach_records(client, record, url):
+    _, filename, _ = record
+    log_in(client)
+    assert client.get(url.format(path=filename)).status_code == 404
+
+
+@pytest.mark.parametrize('url', BYPASS_URLS)
+def test_legacy_files_under_static_stay_hidden(app, client, url):
+    # files of deploys from before UPLOAD_FOLDER left static/, until init-db moves them
+    name = f'legacy-{uuid.uuid4().hex}.pdf'
+    legacy_dir = os.path.join(app.static_folder, 'uploads')
+    os.makedirs(legacy_dir, exist_ok=True)
+    path = os.path.join(legacy_dir, name)
+    with open(path, 'wb') as fh:
+        fh.write(b'%PDF-1.4 legacy')
+    try:
+        assert client.get(url.format(path=name)).status_code == 404
+    finally:
+        os.unlink(path)
+
+
+def test_same_file_registered_concurrently(app, client, monkeypatch):
+    # another request registers the blob between our lookup and our commit
+    with app.app_context():
+        doctor_id, patient_id = add_doctor('race-doc').id, add_patient('race-pat').id
+        db.session.commit()
+    blob_relpath = record_store.blob_relpath
+
+    def register_first(digest, ext):
+        relpath = blob_relpath(digest, ext)
+        if not calls:
+            with db.engine.begin() as conn:
+                conn.execute(RecordBlob.__table__.insert().values(digest=digest, filename=relpath, size=13,
+                                                                  ref_count=0))
+        calls.append(digest)
+        return relpath
+
+    calls = []
+    monkeypatch.setattr(record_store, 'blob_relpath', register_first)
+    log_in(client, patient_id=patient_id)
+    client.post('/patient/appointment/book', data={
+        'doctor_id': doctor_id, 'date': (date.today() + timedelta(days=1)).isoformat(), 'time': '09:00',
+        'record': (io.BytesIO(b'%PDF-1.4 scan'), 'scan.pdf'),
+    }, content_type='multipart/form-data')
+    assert flashes(client) == ['Appointment booked successfully.']
+    with app.app_context():
+        blob = RecordBlob.query.one()
+        assert blob.ref_count == 1
+        assert PatientRecord.query.filter_by(patient_id=patient_id).one().blob_digest == blob.digest
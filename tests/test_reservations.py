@@ -0,0 +1,37 @@
+from datetime import date, time as dtime, timedelta
+
+import pytest
+
+from models import db, Appointment
+from reservations import CLAIM_MINUTES, SlotTaken, reserve
+from scheduling import doctor_has_conflict
+from tests.stress import stress_bookings
+from tests.support import add_doctor, add_patient
+
+
+def _book(doctor_id, patient_id, day, at):
+    reserve(lambda: db.session.add(Appointment(patient_id=patient_id, doctor_id=doctor_id, date=day,
+                                               time=at, status='Booked')))
+
+
+@pytest.mark.parametrize('offset', [CLAIM_MINUTES - 1, CLAIM_MINUTES, CLAIM_MINUTES + 1])
+def test_claims_agree_with_precheck(app, offset):
+    # straight through reserve(), so only the claims can refuse the second booking
+    day, second = date.today() + timedelta(days=1), dtime(9, offset)
+    with app.app_context():
+        doctor_id, patient_id = add_doctor('claims-doc').id, add_patient('claims-pat').id
+        db.session.commit()
+        _book(doctor_id, patient_id, day, dtime(9, 0))
+        precheck_clash = doctor_has_conflict(doctor_id, day, second)
+        try:
+            _book(doctor_id, patient_id, day, second)
+            claim_clash = False
+        except SlotTaken:
+            claim_clash = True
+    assert claim_clash == precheck_clash == (offset < CLAIM_MINUTES)
+
+
+def test_parallel_bookings_never_double_book(app):
+    attempts, booked, clashes = stress_bookings(app, threads=8, rounds=3)
+    assert clashes == 0
+    assert 0 < booked < attempts
@@ -0,0 +1,60 @@
+from datetime import date, time as dtime, timedelta
+
+import pytest
+
+import dbconfig
+from models import db, Appointment, SlotClaim
+from tests.support import add_doctor, add_patient, admin_id, flashes, log_in
+
+
+@pytest.fixture
+def enforced_fks(app):
+    # as on PostgreSQL / MySQL: every new connection checks foreign keys
+    dbconfig._pragmas['foreign_keys'] = 'ON'
+    with app.app_context():
+        db.engine.dispose()
+    yield
+    dbconfig._pragmas.pop('foreign_keys', None)
+    with app.app_context():
+        db.engine.dispose()
+
+
+def _booked(app):
+    with app.app_context():
+        doctor, patient = add_doctor('claim-doc'), add_patient('claim-pat')
+        appt = Appointment(patient_id=patient.id, doctor_id=doctor.id, date=date.today() + timedelta(days=1),
+                           time=dtime(9, 0), status='Booked')
+        db.session.add(appt)
+        db.session.commit()
+        assert SlotClaim.query.filter_by(appointment_id=appt.id).count() > 0
+        return appt.id
+
+
+def _admin(app):
+    with app.app_context():
+        return admin_id()
+
+
+def test_admin_deletes_booked_appointment_with_enforced_fks(app, client, enforced_fks):
+    with app.app_context():
+        assert db.session.execute(db.text('PRAGMA foreign_keys')).scalar() == 1
+    appt_id = _booked(app)
+    log_in(client, admin_id=_admin(app))
+    client.post(f'/admin/appointment/delete/{appt_id}')
+    assert flashes(client) == ['Appointment deleted.']
+    with app.app_context():
+        assert db.session.get(Appointment, appt_id) is None
+        assert SlotClaim.query.filter_by(appointment_id=appt_id).count() == 0
+
+
+def test_deleted_appointment_frees_its_slot(app):
+    appt_id = _booked(app)
+    with app.app_context():
+        appt = db.session.get(Appointment, appt_id)
+        doctor_id, day = appt.doctor_id, appt.date
+        db.session.delete(appt)
+        db.session.commit()
+        db.session.add(Appointment(patient_id=add_patient('claim-next').id, doctor_id=doctor_id, date=day,
+                                   time=dtime(9, 0), status='Booked'))
+        db.session.commit()
+        assert SlotClaim.query.filter_by(doctor_id=doctor_id, date=day).count() > 0
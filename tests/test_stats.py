@@ -0,0 +1,68 @@
+from datetime import date, time as dtime, timedelta
+
+from sqlalchemy import event
+
+import stats
+from models import db, Appointment, StatDelta
+from stats import admin_stats, recompute_counters
+from tests.support import add_doctor, add_patient
+
+
+def _book(doctor, patient, minute):
+    appt = Appointment(patient_id=patient.id, doctor_id=doctor.id, date=date.today() + timedelta(days=1),
+                       time=dtime(9, minute), status='Booked')
+    db.session.add(appt)
+    db.session.commit()
+    # loaded again, as the views do, so the status history is known
+    return db.session.get(Appointment, appt.id)
+
+
+def test_writes_append_deltas_instead_of_updating_counters(app):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        doctor, patient = add_doctor('stat-doc'), add_patient('stat-pat')
+        db.session.commit()
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            appt = _book(doctor, patient, 0)
+            appt.status = 'Cancelled'
+            db.session.commit()
+            db.session.delete(db.session.get(Appointment, appt.id))
+            db.session.commit()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+    assert not [s for s in statements if s.startswith('UPDATE stat_counters')]
+    assert len([s for s in statements if s.startswith('INSERT INTO stat_deltas')]) == 3
+
+
+def test_dashboard_totals_include_pending_deltas(app):
+    with app.app_context():
+        doctor, patient = add_doctor('stat-doc'), add_patient('stat-pat')
+        db.session.commit()
+        _book(doctor, patient, 30)
+        done = _book(doctor, patient, 0)
+        done.status = 'Completed'
+        db.session.commit()
+        totals = admin_stats()
+        assert (totals['doctors'], totals['patients'], totals['appointments']) == (1, 1, 2)
+        assert totals['by_status'] == {'Booked': 1, 'Completed': 1, 'Cancelled': 0}
+        assert StatDelta.query.count() > 0
+
+
+def test_fold_keeps_totals(app, monkeypatch):
+    with app.app_context():
+        doctor, patient = add_doctor('stat-doc'), add_patient('stat-pat')
+        db.session.commit()
+        for minute in (0, 10, 20):
+            _book(doctor, patient, minute)
+        before = admin_stats()
+        monkeypatch.setattr(stats, 'FOLD_AFTER_DELTAS', 1)
+        assert admin_stats() == before
+        assert StatDelta.query.count() == 0
+        assert admin_stats() == before
+        report = recompute_counters()
+        assert all(stored == actual for stored, actual in report.values())
@@ -0,0 +1,238 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy import event, insert, inspect, literal, select, union_all, update
+from sqlalchemy.orm import Session
+
+from models import (
+    db, Appointment, ArchivedAppointment, ArchivedTreatment, Doctor, TimelineVersion, Treatment
+)
+
+PENDING_KEY = 'timeline_changes'
+# a change to one of these moves the treatment to another date/doctor/patient in the timeline
+MOVING_FIELDS = ('patient_id', 'doctor_id', 'date', 'time')
+
+TimelineEntry = namedtuple('TimelineEntry', 'treatment_id appointment_id date time doctor_id doctor_name '
+                                            'diagnosis prescription notes archived')
+
+
+def _order(entry):
+    return entry.date, entry.time, entry.treatment_id
+
+
+class TimelineCache:
+    """
+    Per-patient treatment timelines, least recently used dropped first.
+    Every entry carries the patient's timeline version it was built at.
+    """
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.stale = self.evictions = self.updates = self.invalidations = 0
+
+    def get(self, patient_id, version):
+        with self._lock:
+            cached = self._entries.get(patient_id)
+            if cached is None:
+                self.misses += 1
+                return None
+            if cached[0] != version:
+                # changed by another process since it was cached
+                self.stale += 1
+                del self._entries[patient_id]
+                return None
+            self._entries.move_to_end(patient_id)
+            self.hits += 1
+            return cached[1]
+
+    def put(self, patient_id, version, timeline):
+        with self._lock:
+            self._entries[patient_id] = (version, timeline)
+            self._entries.move_to_end(patient_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def apply(self, patient_id, old_version, new_version, entry):
+        """
+        Puts one new/changed treatment into a cached timeline that was current
+        before the change; anything else just drops the cached timeline.
+        """
+        with self._lock:
+            cached = self._entries.get(patient_id)
+            if cached is None:
+                return
+            if entry is None or cached[0] != old_version:
+                del self._entries[patient_id]
+                self.invalidations += 1
+                return
+            timeline = [e for e in cached[1] if e.treatment_id != entry.treatment_id]
+            timeline.append(entry)
+            timeline.sort(key=_order, reverse=True)
+            self._entries[patient_id] = (new_version, tuple(timeline))
+            self.updates += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'incremental_updates': self.updates,
+                'invalidations': self.invalidations,
+            }
+
+
+_state = {'cache': TimelineCache()}
+
+
+def init_timeline_cache(app):
+    _state['cache'] = TimelineCache(int(app.config.get('TIMELINE_CACHE_SIZE', 1000)))
+
+
+def get_cache():
+    return _state['cache']
+
+
+def timeline_version(patient_id, conn=None):
+    conn = conn if conn is not None else db.session.connection()
+    return conn.execute(select(TimelineVersion.version)
+                        .where(TimelineVersion.patient_id == patient_id)).scalar() or 0
+
+
+def bump_timelines(conn, patient_ids):
+    """
+    Marks the timelines of these patients as changed, in the caller's
+    transaction. Returns {patient_id: (old_version, new_version)}.
+    """
+    versions = {}
+    for patient_id in set(patient_ids):
+        # update first: concurrent bumps queue on the row lock and then see each other
+        if conn.execute(update(TimelineVersion).where(TimelineVersion.patient_id == patient_id)
+                        .values(version=TimelineVersion.version + 1)).rowcount:
+            new_version = timeline_version(patient_id, conn)
+        else:
+            conn.execute(insert(TimelineVersion).values(patient_id=patient_id, version=1))
+            new_version = 1
+        versions[patient_id] = (new_version - 1, new_version)
+    return versions
+
+
+def patients_of_doctor(conn, doctor_id):
+    hot = select(Appointment.patient_id).where(Appointment.doctor_id == doctor_id)
+    archived = select(ArchivedAppointment.patient_id).where(ArchivedAppointment.doctor_id == doctor_id)
+    return set(conn.execute(hot.union(archived)).scalars())
+
+
+def _timeline_select(appointment, treatment, patient_id, archived):
+    return (select(treatment.id, appointment.id, appointment.date, appointment.time, appointment.doctor_id,
+                   Doctor.name, treatment.diagnosis, treatment.prescription, treatment.notes,
+                   literal(archived))
+            .select_from(treatment)
+            .join(appointment, appointment.id == treatment.appointment_id)
+            .outerjoin(Doctor, Doctor.id == appointment.doctor_id)
+            .where(appointment.patient_id == patient_id))
+
+
+def build_timeline(patient_id):
+    """
+    All treatments of a patient, hot and archived, newest first, in one query.
+    """
+    stmt = union_all(_timeline_select(Appointment, Treatment, patient_id, False),
+                     _timeline_select(ArchivedAppointment, ArchivedTreatment, patient_id, True))
+    timeline = [TimelineEntry(*row) for row in db.session.execute(stmt)]
+    timeline.sort(key=_order, reverse=True)
+    return tuple(timeline)
+
+
+def get_timeline(patient_id):
+    """
+    The cached timeline, checked against the patient's version (one primary-key read).
+    """
+    version = timeline_version(patient_id)
+    cache = get_cache()
+    timeline = cache.get(patient_id, version)
+    if timeline is None:
+        timeline = build_timeline(patient_id)
+        cache.put(patient_id, version, timeline)
+    return timeline
+
+
+def _entry(session, treatment):
+    appt = session.get(Appointment, treatment.appointment_id)
+    if appt is None:
+        return None, None
+    doctor = session.get(Doctor, appt.doctor_id)
+    return appt.patient_id, TimelineEntry(treatment.id, appt.id, appt.date, appt.time, appt.doctor_id,
+                                          doctor.name if doctor else None, treatment.diagnosis,
+                                          treatment.prescription, treatment.notes, False)
+
+
+def _previous(obj, name):
+    history = inspect(obj).attrs[name].history
+    return history.deleted[0] if history.deleted else getattr(obj, name)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_timeline_changes(session, flush_context):
+    # saved/edited treatments become incremental updates, everything else an invalidation
+    entries = {}
+    dropped = set()
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Treatment) and (obj in session.new or session.is_modified(obj)):
+            patient_id, entry = _entry(session, obj)
+            if patient_id is not None:
+                entries.setdefault(patient_id, []).append(entry)
+    for obj in session.deleted:
+        if isinstance(obj, Treatment):
+            appt = session.get(Appointment, obj.appointment_id)
+            if appt is not None:
+                dropped.add(appt.patient_id)
+        elif isinstance(obj, Appointment):
+            dropped.add(_previous(obj, 'patient_id'))
+    for obj in session.dirty:
+        if isinstance(obj, Appointment):
+            state = inspect(obj)
+            if (any(state.attrs[name].history.has_changes() for name in MOVING_FIELDS)
+                    and obj.treatment is not None):
+                dropped.update({obj.patient_id, _previous(obj, 'patient_id')})
+        elif isinstance(obj, Doctor) and inspect(obj).attrs.name.history.has_changes():
+            # renames are rare; every timeline showing the doctor is rebuilt
+            dropped.update(patients_of_doctor(session.connection(), obj.id))
+    if not (entries or dropped):
+        return
+
+    versions = bump_timelines(session.connection(), set(entries) | dropped)
+    pending = session.info.setdefault(PENDING_KEY, [])
+    for patient_id, (old_version, new_version) in versions.items():
+        changed = entries.get(patient_id, [])
+        if patient_id in dropped or len(changed) != 1:
+            pending.append((patient_id, old_version, new_version, None))
+        else:
+            pending.append((patient_id, old_version, new_version, changed[0]))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_timeline_changes(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+    cache = get_cache()
+    for patient_id, old_version, new_version, entry in pending:
+        cache.apply(patient_id, old_version, new_version, entry)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_timeline_changes(session):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,31 @@
+"""
+WSGI entry point: gunicorn --preload -k gthread --threads 32 -w 4 wsgi:app
+
+create_app() opens no connections and starts no threads, so with --preload the
+master builds the app once and every worker is a fork of it. Run
+`flask --app app init-db` once per deploy before starting the server.
+
+Use threaded (gthread) or gevent workers: every open dashboard keeps a live
+event stream (/events/appointments) and with it one worker thread. Each process
+holds at most SSE_MAX_CONNECTIONS streams, well below --threads, and further
+dashboards poll instead; with sync workers set SSE_MAX_CONNECTIONS=0.
+"""
+import os
+
+from app import create_app
+from models import db
+
+app = application = create_app()
+
+with app.app_context():
+    _engines = list(db.engines.values())
+
+
+def _reset_pools():
+    # a forked worker must not reuse connections the parent may have opened
+    for engine in _engines:
+        engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pools)